@@ -0,0 +1,92 @@
+"""Compare the memory and the time of the aggregation of the users with a dict of lists.
+
+The results of the repositories are generated in memory, so only the aggregation is
+measured, without any request.
+
+    $ python -m benchmarks.bench_aggregation --repos 10000 --users 50000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from report.aggregation import Aggregation
+from report.tests.server import LANGUAGES
+
+
+def dict_of_lists(data) -> dict:
+    # The aggregation before the interning, with the languages of the first repository.
+    results = dict()
+    for result in data:
+        for user in result["users"]:
+            if user["id"] in results:
+                results[user["id"]]["repos"].append(result["repo"])
+            else:
+                results[user["id"]] = {
+                    "user": user,
+                    "repos": [result["repo"]],
+                    "languages": result["languages"],
+                }
+    return results
+
+
+def aggregation(data) -> Aggregation:
+    return Aggregation().extend(data)
+
+
+def merged_aggregation(data, workers=4) -> Aggregation:
+    partials = [
+        Aggregation().extend(data[worker::workers]) for worker in range(workers)
+    ]
+    result = partials[0]
+    for partial in partials[1:]:
+        result.merge(partial)
+    return result
+
+
+def generate(repos, users, contributors, languages, seed=0):
+    rng = random.Random(seed)
+    user_dicts = [
+        {"id": 1000 + index, "login": f"user{index}"} for index in range(users)
+    ]
+    return [
+        {
+            "repo": f"repo-{index}",
+            "users": rng.sample(user_dicts, rng.randint(1, contributors * 2)),
+            "languages": rng.sample(LANGUAGES, rng.randint(1, languages)),
+        }
+        for index in range(repos)
+    ]
+
+
+def measure(func, data):
+    start = time.perf_counter()
+    func(data)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--contributors", type=int, default=20)
+    parser.add_argument("--languages", type=int, default=4)
+    args = parser.parse_args()
+
+    data = generate(args.repos, args.users, args.contributors, args.languages)
+    memberships = sum(len(result["users"]) for result in data)
+    print(f"{args.repos} repositories, {args.users} users, {memberships} memberships")
+    for name, func in (
+        ("dict of lists", dict_of_lists),
+        ("aggregation", aggregation),
+        ("merged aggregation", merged_aggregation),
+    ):
+        seconds, peak = measure(func, data)
+        print(f"{name}: {seconds:.2f}s, {peak / 2 ** 20:.1f} MiB peak")
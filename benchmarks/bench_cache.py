@@ -0,0 +1,41 @@
+"""Count the Redis commands and round trips of a report with a cold and a warm cache.
+
+The report runs against the local fake Github and an in-memory Redis that counts every
+command, so the numbers don't depend on the machine.
+
+    $ python -m benchmarks.bench_cache --repos 200 --contributors 10
+"""
+
+import argparse
+from unittest.mock import patch
+
+from report.cache import RedisCache
+from report.github import GithubContributorsReport
+from report.tests.objects import Redis
+from report.tests.server import FakeGithub, FakeGithubServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=100)
+    parser.add_argument("--contributors", type=int, default=5)
+    args = parser.parse_args()
+
+    redis = Redis()
+    github = FakeGithub(repos=args.repos, contributors=args.contributors)
+    with FakeGithubServer(github) as server, patch(
+        "report.conf._cache", RedisCache(redis)
+    ):
+        for run in ("cold", "warm"):
+            redis.commands = redis.round_trips = 0
+            server.calls.clear()
+            GithubContributorsReport(
+                "AUTH_KEY",
+                github.organization,
+                "/tmp/",
+                engine="async",
+                base_url=server.url,
+            )._run()
+            print(
+                f"{run}: {redis.commands} Redis commands in {redis.round_trips} round trips, "
+                f"{sum(server.calls.values())} Github requests"
+            )
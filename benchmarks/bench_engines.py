@@ -0,0 +1,46 @@
+"""Compare the wall time of the pool and async engines against a local fake Github.
+
+Every run starts with an empty in-memory cache so it does the same number of requests,
+and each request waits for `--latency` seconds like a real round trip to Github would.
+
+    $ python -m benchmarks.bench_engines --repos 200 --latency 0.05
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+from report.cache import MemoryCache
+from report.github import GithubContributorsReport
+from report.tests.server import FakeGithub, FakeGithubServer
+
+
+def run(engine, concurrency, server):
+    report = GithubContributorsReport(
+        "AUTH_KEY",
+        server.github.organization,
+        "/tmp/",
+        engine=engine,
+        concurrency=concurrency,
+        base_url=server.url,
+    )
+    server.calls.clear()
+    start = time.perf_counter()
+    report._run()
+    return time.perf_counter() - start, sum(server.calls.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=100)
+    parser.add_argument("--contributors", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    github = FakeGithub(repos=args.repos, contributors=args.contributors)
+    with FakeGithubServer(github, latency=args.latency) as server:
+        for engine in ("pool", "async"):
+            with patch("report.conf._cache", MemoryCache()):
+                elapsed, calls = run(engine, args.concurrency, server)
+            print(f"{engine:>6}: {elapsed:.2f}s for {calls} requests")
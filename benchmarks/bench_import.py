@@ -0,0 +1,61 @@
+"""Measure the startup time of the report, the import of its modules and `--help`.
+
+Every run starts a new interpreter, so nothing is imported yet, and the best of the runs is
+reported. `-X importtime` lists the slowest modules imported by the report, to find which
+import made the startup slow again.
+
+    $ python -m benchmarks.bench_import --runs 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = {
+    "import report.github": [sys.executable, "-c", "import report.github"],
+    "import report.batch": [sys.executable, "-c", "import report.batch"],
+    "report.py --help": [sys.executable, "report.py", "--help"],
+}
+
+
+def best_time(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def slowest_imports(module, count):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines()[1:]:
+        _, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = best_time([sys.executable, "-c", "pass"], args.runs)
+    print(f"{'command':<24} {'best ms':>8} {'over python ms':>15}")
+    for name, command in COMMANDS.items():
+        seconds = best_time(command, args.runs)
+        print(f"{name:<24} {seconds * 1000:>8.1f} {(seconds - baseline) * 1000:>15.1f}")
+    print("\nSlowest imports of report.github (cumulative ms):")
+    for cumulative_us, name in slowest_imports("report.github", args.top):
+        print(f"{cumulative_us / 1000:>8.1f} {name}")
@@ -0,0 +1,261 @@
+"""Run the whole report end to end against a local fake Github and record its results.
+
+The organization is synthetic, with a configurable size, or recorded into a fixture. The
+run reports the wall time, the Github requests, the Redis commands and the peak RSS, and
+appends them with the current commit to a JSON lines file to compare the runs across
+commits.
+
+    $ python -m benchmarks.bench_report --repos 500 --contributors 20 --latency 0.05
+    $ python -m benchmarks.bench_report --repos 500 --contributors 20 --latency 0.05 --compare
+
+The Redis commands are counted by an in-memory Redis, so only the commands of the main
+process are counted with the pool engine, unless a real Redis is used with `--redis-url`.
+The fake Github runs in the same process, so the peak RSS includes it.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import redis
+
+from report import conf
+from report.cache import LRUCache, RedisCache
+from report.client import DEFAULT_PER_PAGE
+from report.github import GithubContributorsReport
+from report.retry import DEFAULT_RETRIES
+from report.tests.objects import Redis
+from report.tests.server import FakeGithub, FakeGithubServer
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(__file__), "results.jsonl")
+# The calls recorded by the fake Github that only mark other calls.
+MARKERS = (
+    "rate_limited",
+    "secondary_limited",
+    "not_modified",
+    "stats_computing",
+    "unauthorized",
+    "injected_error",
+    "injected_reset",
+    "injected_slow",
+)
+# The arguments that define a scenario, the runs are only compared to the same scenario.
+SCENARIO = (
+    "fixture",
+    "repos",
+    "contributors",
+    "users",
+    "languages",
+    "page_size",
+    "latency",
+    "rate_limit",
+    "window",
+    "secondary_limit_every",
+    "error_every",
+    "reset_every",
+    "slow_every",
+    "slow_latency",
+    "engine",
+    "concurrency",
+    "api",
+    "cache",
+    "long_format",
+    "retries",
+    "hedge_percentile",
+)
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_rss():
+    # In KB on Linux, the children are the workers of the pool engine.
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class RedisCounter:
+    """Count the commands sent to a real Redis server from its stats."""
+
+    def __init__(self, redis_conn):
+        self.redis_conn = redis_conn
+
+    @property
+    def commands(self):
+        stats = self.redis_conn.info("commandstats")
+        return sum(stat["calls"] for stat in stats.values())
+
+
+def run(args, server, redis_counter, cache):
+    with tempfile.TemporaryDirectory(prefix="bench_report_") as report_path:
+        report = GithubContributorsReport(
+            "AUTH_KEY",
+            server.github.organization,
+            report_path,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            api=args.api,
+            incremental=args.cache == "warm",
+            long_format=args.long_format,
+            base_url=server.url,
+            retries=args.retries,
+            hedge_percentile=args.hedge_percentile,
+        )
+        report.github_object.per_page = args.page_size
+        server.calls.clear()
+        commands = redis_counter.commands
+        start = time.perf_counter()
+        with patch("builtins.print"):
+            report.generate_report()
+        wall_time = round(time.perf_counter() - start, 3)
+    return {
+        "wall_time": wall_time,
+        "api_calls": sum(
+            count for endpoint, count in server.calls.items() if endpoint not in MARKERS
+        ),
+        "not_modified": server.calls["not_modified"],
+        "rate_limited": server.calls["rate_limited"]
+        + server.calls["secondary_limited"],
+        "redis_commands": redis_counter.commands - commands,
+        "cache_hit_ratio": round(getattr(cache, "hit_ratio", 0.0), 3),
+        "injected_faults": sum(
+            server.calls[f"injected_{fault}"] for fault in ("error", "reset", "slow")
+        ),
+    }
+
+
+def compare(results_path, scenario):
+    if not os.path.exists(results_path):
+        print(f"No results in {results_path}")
+        return
+    with open(results_path) as results_file:
+        rows = [json.loads(line) for line in results_file if line.strip()]
+    # The arguments added since a run was stored had their default.
+    rows = [
+        row
+        for row in rows
+        if all(
+            row["scenario"].get(key, scenario[key]) == scenario[key] for key in scenario
+        )
+    ]
+    print(
+        f"{'commit':<10} {'date':<20} {'wall':>8} {'api':>8} {'redis':>8} {'rss MB':>8}"
+    )
+    for row in rows:
+        print(
+            f"{row['commit']:<10} {row['date']:<20} {row['wall_time']:>8} "
+            f"{row['api_calls']:>8} {row['redis_commands']:>8} {row['peak_rss'] / 1024:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", help="JSON fixture of an organization to serve")
+    parser.add_argument(
+        "--record", help="Record the synthetic organization into a fixture"
+    )
+    parser.add_argument("--repos", type=int, default=100)
+    parser.add_argument("--contributors", type=int, default=5)
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--languages", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PER_PAGE)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=3600)
+    parser.add_argument("--secondary-limit-every", type=int, default=None)
+    parser.add_argument("--error-every", type=int, default=None)
+    parser.add_argument("--reset-every", type=int, default=None)
+    parser.add_argument("--slow-every", type=int, default=None)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--engine", choices=["pool", "async"], default="async")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--api", choices=["rest", "graphql"], default="rest")
+    parser.add_argument(
+        "--cache",
+        choices=["cold", "warm"],
+        default="cold",
+        help="Run with an empty cache, or with the cache of a first run",
+    )
+    parser.add_argument("--long-format", action="store_true")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--hedge-percentile", type=float, default=None)
+    parser.add_argument("--redis-url", help="Count the commands of a real Redis")
+    parser.add_argument("--results", default=DEFAULT_RESULTS)
+    parser.add_argument(
+        "--compare", action="store_true", help="Print the stored runs of the scenario"
+    )
+    args = parser.parse_args()
+    scenario = {key: getattr(args, key) for key in SCENARIO}
+
+    if args.compare:
+        compare(args.results, scenario)
+        raise SystemExit
+
+    if args.fixture:
+        github = FakeGithub.load(args.fixture)
+    else:
+        github = FakeGithub(
+            repos=args.repos,
+            contributors=args.contributors,
+            users=args.users,
+            languages=args.languages,
+        )
+    if args.record:
+        github.save(args.record)
+
+    if args.redis_url:
+        redis_conn = redis.Redis.from_url(args.redis_url, decode_responses=True)
+        redis_conn.flushdb()
+        redis_counter = RedisCounter(redis_conn)
+    else:
+        redis_conn = redis_counter = Redis()
+    cache = RedisCache(redis_conn, conf.settings["CACHE_TTLS"])
+    if conf.settings["CACHE_LRU_SIZE"]:
+        cache = LRUCache(cache, conf.settings["CACHE_LRU_SIZE"])
+
+    with FakeGithubServer(
+        github,
+        page_size=args.page_size,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        window=args.window,
+        secondary_limit_every=args.secondary_limit_every,
+        error_every=args.error_every,
+        reset_every=args.reset_every,
+        slow_every=args.slow_every,
+        slow_latency=args.slow_latency,
+    ) as server, patch("report.conf._cache", cache):
+        if args.cache == "warm":
+            run(args, server, redis_counter, cache)
+            if isinstance(cache, LRUCache):
+                cache.data.clear()
+                cache.hits = cache.misses = 0
+        result = run(args, server, redis_counter, cache)
+
+    result.update(
+        commit=commit(),
+        date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        scenario=scenario,
+        peak_rss=peak_rss(),
+    )
+    print(json.dumps(result, indent=2))
+    with open(args.results, "a") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+    print(f"Appended the results to {args.results}")
@@ -0,0 +1,73 @@
+"""Compare the time of the stats of the contributors with NumPy and with plain arrays.
+
+The results of the repositories are generated in memory and added once, then the totals,
+the ranking and the shares of the languages are computed with both implementations.
+
+    $ python -m benchmarks.bench_stats --repos 50000 --users 200000 --contributors 20
+"""
+
+import argparse
+import random
+import time
+from unittest.mock import patch
+
+from report.stats import ContributionStats, import_numpy
+from report.tests.server import LANGUAGES
+
+
+def generate(repos, users, contributors, languages, seed=0):
+    rng = random.Random(seed)
+    for index in range(repos):
+        repo_users = rng.sample(range(users), rng.randint(1, contributors * 2))
+        repo_languages = rng.sample(LANGUAGES, rng.randint(1, languages))
+        yield {
+            "repo": f"repo-{index}",
+            "users": [
+                {
+                    "id": 1000 + user,
+                    "login": f"user{user}",
+                    "contributions": rng.randint(1, 500),
+                }
+                for user in repo_users
+            ],
+            "languages": repo_languages,
+            "language_bytes": [rng.randint(1, 10**6) for _ in repo_languages],
+        }
+
+
+def measure(stats, top):
+    start = time.perf_counter()
+    results = stats.to_dict(top=top)
+    return time.perf_counter() - start, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--contributors", type=int, default=20)
+    parser.add_argument("--languages", type=int, default=4)
+    parser.add_argument(
+        "--top", type=int, default=100, help="Number of users ranked, 0 for all of them"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = ContributionStats().extend(
+        generate(args.repos, args.users, args.contributors, args.languages)
+    )
+    print(
+        f"{args.repos} repositories, {len(stats)} users, {len(stats.row_users)} rows, "
+        f"added in {time.perf_counter() - start:.2f}s"
+    )
+    if import_numpy() is not None:
+        seconds, expected = measure(stats, args.top or None)
+        print(f"numpy: {seconds:.2f}s")
+    else:
+        expected = None
+        print("numpy: not installed")
+    with patch("report.stats.import_numpy", return_value=None):
+        seconds, results = measure(stats, args.top or None)
+    print(f"arrays: {seconds:.2f}s")
+    if expected is not None and list(expected) != list(results):
+        print("The rankings of numpy and arrays differ!")
@@ -1,24 +1,345 @@
 import argparse
 
-from report.github import GithubContributorsReport
-
+from report import conf
+from report.batch import DEFAULT_ORGANIZATION_CONCURRENCY, BatchContributorsReport
+from report.client import DEFAULT_TIMEOUT
+from report.daemon import DEFAULT_HOST, DEFAULT_PORT, ReportDaemon
+from report.distributed import Worker, WorkQueue
+from report.filters import REPOSITORY_TYPES, VISIBILITIES, RepositoryFilter
+from report.github import STATS_DEADLINE, GithubContributorsReport
+from report.retry import DEFAULT_RETRIES
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Generate a report of the organization's repositories contributions"
     )
     parser.add_argument(
-        "--organization", type=str, required=True, help="The name of the organization"
+        "--organization",
+        type=str,
+        nargs="+",
+        default=[],
+        help="The name of the organization, many organizations are reported in a batch",
+    )
+    parser.add_argument(
+        "--organizations-file",
+        type=str,
+        help="File with the name of an organization on every line, reported in a batch",
     )
     parser.add_argument(
-        "--auth-key", type=str, required=True, help="Access Token of Github account"
+        "--organization-concurrency",
+        type=int,
+        default=DEFAULT_ORGANIZATION_CONCURRENCY,
+        help=f"Maximum number of organizations in flight in a batch (Default: {DEFAULT_ORGANIZATION_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--auth-key",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Access Token of Github account, or installation token of a Github App, the requests are spread across many tokens",
+    )
+    parser.add_argument(
+        "--auth-keys-file",
+        type=str,
+        help="File with a token on every line, added to --auth-key",
     )
     parser.add_argument(
         "--file-path", type=str, nargs="?", help="Path of the report", default="/tmp/"
     )
 
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["pool", "async", "distributed"],
+        default="pool",
+        help="Run the requests in a multiprocessing pool, an asyncio event loop, or in the workers of the work queue in Redis (rest only)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Maximum number of repositories in flight (Default: number of CPUs for pool, 16 for async and the workers)",
+    )
+    parser.add_argument(
+        "--api",
+        type=str,
+        choices=["rest", "graphql"],
+        default="rest",
+        help="Fetch the repositories through the REST API or in batches through the GraphQL API",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Fetch all repositories again, even if they were not pushed to since the last run",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["csv", "ndjson", "parquet"],
+        default="csv",
+        help="Format of the report, parquet requires pyarrow (Default: csv)",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=["gzip", "zstd"],
+        help="Compress the report, zstd requires zstandard for csv and ndjson (Default: no compression, snappy for parquet)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the last report from its checkpoint, only the missing or failed repositories are fetched",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Stop when the rate limit of Github is exceeded instead of waiting until it resets",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"Seconds to wait for every response of Github (Default: {DEFAULT_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Maximum number of retries of a request after an error of the network or a server error of Github, with a jittered exponential backoff (Default: {DEFAULT_RETRIES})",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        help="Send a GET again when it's slower than this percentile of the latencies of its endpoint, e.g. 0.95 (Default: no hedging)",
+    )
+    parser.add_argument(
+        "--include",
+        type=str,
+        nargs="+",
+        help="Glob patterns of the names of the repositories to report, e.g. 'api-*' (Default: all of them)",
+    )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        nargs="+",
+        help="Glob patterns of the names of the repositories to leave out",
+    )
+    parser.add_argument(
+        "--skip-forks",
+        action="store_true",
+        help="Leave out the forks",
+    )
+    parser.add_argument(
+        "--skip-archived",
+        action="store_true",
+        help="Leave out the archived repositories",
+    )
+    parser.add_argument(
+        "--skip-empty",
+        action="store_true",
+        help="Leave out the empty repositories",
+    )
+    parser.add_argument(
+        "--pushed-since",
+        type=str,
+        help="Leave out the repositories not pushed to since the date, e.g. 2021-01-01",
+    )
+    parser.add_argument(
+        "--topic",
+        type=str,
+        nargs="+",
+        help="Report the repositories with any of the topics only",
+    )
+    parser.add_argument(
+        "--visibility",
+        type=str,
+        choices=VISIBILITIES,
+        help="Report the repositories with the visibility only",
+    )
+    parser.add_argument(
+        "--type",
+        type=str,
+        choices=REPOSITORY_TYPES,
+        help="The type of the repositories listed by Github (rest only) (Default: chosen from the other filters)",
+    )
+    parser.add_argument(
+        "--long-format",
+        action="store_true",
+        help="Write a row for every contributor of every repository as soon as the repository completes",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Write the commits of every contributor and the shares of its languages, ranked by commits (rest only)",
+    )
+    parser.add_argument(
+        "--line-stats",
+        action="store_true",
+        help="Write the additions and deletions of every contributor with the stats, one more request per repository (rest only)",
+    )
+    parser.add_argument(
+        "--stats-deadline",
+        type=float,
+        default=STATS_DEADLINE,
+        help=f"Seconds to retry a repository whose statistics are computed by Github from its first 202, then it is reported incomplete (Default: {STATS_DEADLINE})",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        help="Number of contributors of the ranking of the stats (Default: all of them)",
+    )
+    parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        help="Don't collect the metrics of the run nor write them into a JSON profile next to the report",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run the report in cProfile and write its stats next to the report",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Crawl the repositories of the work queue in Redis for the reports of --engine distributed, until stopped",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Crawl the organization once, then answer the queries of an HTTP API and apply the webhook events of the organization until stopped (rest only)",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_HOST,
+        help=f"Address of the HTTP API of --serve (Default: {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port of the HTTP API of --serve (Default: {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        choices=["redis", "memory"],
+        help="Backend of the cache, memory when no Redis is available (Default: redis)",
+    )
+    parser.add_argument(
+        "--redis-url",
+        type=str,
+        help="URL of Redis server (Default: redis://localhost:6379/0)",
+    )
+
     args = parser.parse_args()
 
-    GithubContributorsReport(
-        args.auth_key, args.organization, args.file_path
-    ).generate_report()
+    auth_keys = list(args.auth_key)
+    if args.auth_keys_file:
+        with open(args.auth_keys_file) as auth_keys_file:
+            auth_keys.extend(line.strip() for line in auth_keys_file)
+    auth_keys = [auth_key for auth_key in auth_keys if auth_key]
+    if not auth_keys:
+        parser.error("--auth-key or --auth-keys-file is required")
+
+    if args.cache:
+        conf.configure(CACHE_BACKEND=args.cache)
+    if args.redis_url:
+        conf.configure(REDIS_URL=args.redis_url)
+
+    if args.hedge_percentile is not None and not 0 < args.hedge_percentile < 1:
+        parser.error("--hedge-percentile must be between 0 and 1")
+    client_options = dict(
+        timeout=args.timeout,
+        retries=args.retries,
+        hedge_percentile=args.hedge_percentile,
+    )
+
+    if args.worker:
+        Worker(
+            auth_keys,
+            WorkQueue(conf.get_redis()),
+            concurrency=args.concurrency,
+            wait=not args.no_wait,
+            client_options=client_options,
+        ).run()
+        raise SystemExit
+
+    organizations = list(args.organization)
+    if args.organizations_file:
+        with open(args.organizations_file) as organizations_file:
+            organizations.extend(line.strip() for line in organizations_file)
+    organizations = [organization for organization in organizations if organization]
+    if not organizations:
+        parser.error("--organization or --organizations-file is required")
+    if (args.stats or args.line_stats) and len(organizations) > 1:
+        parser.error("--stats can only be written for one organization")
+    if args.long_format and len(organizations) > 1:
+        parser.error("--long-format can only be written for one organization")
+    if args.profile and len(organizations) > 1:
+        parser.error("--profile can only be written for one organization")
+    if (args.stats or args.line_stats) and args.api == "graphql":
+        parser.error("--stats is only available with the rest api")
+    if args.engine == "distributed" and args.api == "graphql":
+        parser.error("--engine distributed is only available with the rest api")
+    if args.serve and len(organizations) > 1:
+        parser.error("--serve can only index one organization")
+    if args.serve and args.api == "graphql":
+        parser.error("--serve is only available with the rest api")
+
+    try:
+        repo_filter = RepositoryFilter(
+            include=args.include,
+            exclude=args.exclude,
+            skip_forks=args.skip_forks,
+            skip_archived=args.skip_archived,
+            skip_empty=args.skip_empty,
+            pushed_since=args.pushed_since,
+            topics=args.topic,
+            visibility=args.visibility,
+            type=args.type,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    kwargs = dict(
+        engine=args.engine,
+        concurrency=args.concurrency,
+        api=args.api,
+        incremental=not args.full,
+        wait=not args.no_wait,
+        long_format=args.long_format,
+        resume=args.resume,
+        output_format=args.format,
+        compression=args.compression,
+        instrument=not args.no_metrics,
+        repo_filter=repo_filter,
+        **client_options,
+    )
+    if args.serve:
+        ReportDaemon(
+            GithubContributorsReport(
+                auth_keys, organizations[0], args.file_path, **kwargs
+            ),
+            host=args.host,
+            port=args.port,
+        ).serve()
+    elif len(organizations) > 1:
+        BatchContributorsReport(
+            auth_keys,
+            organizations,
+            args.file_path,
+            organization_concurrency=args.organization_concurrency,
+            **kwargs,
+        ).generate_report()
+    else:
+        GithubContributorsReport(
+            auth_keys,
+            organizations[0],
+            args.file_path,
+            profile=args.profile,
+            stats=args.stats,
+            line_stats=args.line_stats,
+            top=args.top,
+            stats_deadline=args.stats_deadline,
+            **kwargs,
+        ).generate_report()
@@ -0,0 +1,142 @@
+from array import array
+
+
+def iter_bits(mask: int):
+    """Yield the indexes of the bits set in the mask, from the lowest."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class Interner:
+    """Map every distinct name to a small integer id, in the order they are first seen."""
+
+    def __init__(self) -> None:
+        self.ids = dict()
+        self.names = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self.ids
+
+    def intern(self, name) -> int:
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+class Aggregation:
+    """Aggregate the repositories and the languages of the contributors of an organization.
+
+    The names of the repositories and the languages are interned to integer ids, so every
+    user only keeps an array of the ids of its repositories and a bitmap of the languages of
+    all of them, instead of a list of strings per user. Partial aggregations of different
+    workers are combined with `merge`.
+    """
+
+    def __init__(self) -> None:
+        self.repos = Interner()
+        self.languages = Interner()
+        self.users = Interner()
+        # By the index of the user.
+        self.user_data = []
+        self.user_repos = []
+        self.user_languages = []
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _languages_mask(self, languages) -> int:
+        mask = 0
+        for language in languages:
+            mask |= 1 << self.languages.intern(language)
+        return mask
+
+    def _user_index(self, user: dict) -> int:
+        index = self.users.intern(user["id"])
+        if index == len(self.user_data):
+            self.user_data.append(user)
+            self.user_repos.append(array("I"))
+            self.user_languages.append(0)
+        return index
+
+    def add(self, result: dict) -> None:
+        """Add the contributors of a repository, a repository is only added once.
+
+        Args:
+            - result(dict): The repository with its contributors and languages.
+        """
+        if result["repo"] in self.repos:
+            return
+        repo_index = self.repos.intern(result["repo"])
+        languages_mask = self._languages_mask(result["languages"])
+        for user in result["users"]:
+            index = self._user_index(user)
+            self.user_repos[index].append(repo_index)
+            self.user_languages[index] |= languages_mask
+
+    def extend(self, results) -> "Aggregation":
+        for result in results:
+            self.add(result)
+        return self
+
+    def merge(self, other: "Aggregation") -> "Aggregation":
+        """Add the repositories of another aggregation, the repositories already added
+        are skipped.
+
+        Args:
+            - other(Aggregation): The aggregation to be merged into this one.
+
+        Returns:
+            Aggregation: This aggregation.
+        """
+        repo_ids = []
+        for name in other.repos.names:
+            # None for the repositories already added to this aggregation.
+            repo_ids.append(None if name in self.repos else self.repos.intern(name))
+        language_ids = [self.languages.intern(name) for name in other.languages.names]
+        # Few distinct sets of languages are shared by many users.
+        masks = {0: 0}
+
+        for other_index, user in enumerate(other.user_data):
+            repos = array(
+                "I",
+                (
+                    repo_ids[repo_index]
+                    for repo_index in other.user_repos[other_index]
+                    if repo_ids[repo_index] is not None
+                ),
+            )
+            if not repos:
+                continue
+            mask = other.user_languages[other_index]
+            if mask not in masks:
+                masks[mask] = sum(1 << language_ids[bit] for bit in iter_bits(mask))
+            index = self._user_index(user)
+            self.user_repos[index].extend(repos)
+            self.user_languages[index] |= masks[mask]
+        return self
+
+    def to_dict(self) -> dict:
+        """Return the aggregation like the results of the report.
+
+        Returns:
+            dict: for contributors with its repositories and languages.
+        """
+        repos = self.repos.names
+        languages = self.languages.names
+        return {
+            user_id: {
+                "user": self.user_data[index],
+                "repos": [repos[repo_index] for repo_index in self.user_repos[index]],
+                "languages": [
+                    languages[bit] for bit in iter_bits(self.user_languages[index])
+                ],
+            }
+            for index, user_id in enumerate(self.users.names)
+        }
@@ -0,0 +1,243 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from report import exceptions
+from report.client import DEFAULT_BASE_URL, DEFAULT_TIMEOUT, GithubClient
+from report.engines import ENGINES
+from report.github import GithubContributorsReport
+from report.metrics import metrics
+from report.ratelimit import RateLimitGovernor
+from report.retry import DEFAULT_RETRIES, print_retries
+from report.services import SERVICES
+from report.writers import WRITERS
+
+DEFAULT_ORGANIZATION_CONCURRENCY = 4
+# The columns of the rollup of all organizations and their types.
+ROLLUP_COLUMNS = [
+    ("Login", str),
+    ("Name", str),
+    ("Email", str),
+    ("Organizations", list),
+    ("Repositories", list),
+    ("Languages", list),
+]
+
+
+class BatchContributorsReport:
+    """Generate the reports of many organizations concurrently, with one client and one
+    service shared by all of them, so they share the connection pool, the budget of the
+    rate limit and the users already resolved through the cache. Every organization gets its
+    own report in its own directory, and the users of all organizations are rolled up into
+    one report.
+
+    The organizations run in threads, and forking a multiprocessing pool from a process
+    with other threads can deadlock its workers on a lock held by another thread, so the
+    pool engine runs as the async engine. Only the contributors of every organization are
+    written, the long format, the stats and the profile are rejected.
+
+    Args:
+        - auth_key(str or list): Access Token of Github account, or many tokens to spread
+            the requests across.
+        - organizations(list): The names of the organizations.
+        - report_path(str): The directory of the reports.
+        - organization_concurrency(int): Maximum number of organizations in flight.
+        - kwargs: The arguments of every GithubContributorsReport.
+    """
+
+    def __init__(
+        self,
+        auth_key,
+        organizations: list,
+        report_path: str,
+        engine: str = "pool",
+        concurrency: int = None,
+        api: str = "rest",
+        wait: bool = True,
+        instrument: bool = True,
+        organization_concurrency: int = DEFAULT_ORGANIZATION_CONCURRENCY,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        hedge_percentile: float = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        unsupported = [
+            name
+            for name in ("long_format", "stats", "line_stats", "profile")
+            if kwargs.get(name)
+        ]
+        if unsupported:
+            raise ValueError(
+                f"{', '.join(unsupported)} can only be written for one organization"
+            )
+        if engine == "pool":
+            print("The organizations of a batch are reported with the async engine")
+            engine = "async"
+        # Duplicated organizations are reported once.
+        self.organizations = list(dict.fromkeys(organizations))
+        self.report_path = report_path
+        self.engine = engine
+        self.concurrency = ENGINES[engine](concurrency).concurrency
+        self.organization_concurrency = organization_concurrency
+        self.github_object = GithubClient(
+            auth_key,
+            base_url=base_url,
+            pool_size=self.concurrency * organization_concurrency,
+            timeout=timeout,
+            governor=RateLimitGovernor(wait=wait),
+            retries=retries,
+            hedge_percentile=hedge_percentile,
+        )
+        self.service = SERVICES[api](self.github_object, concurrency=self.concurrency)
+        self.output_format = kwargs.get("output_format", "csv")
+        self.compression = kwargs.get("compression")
+        self.kwargs = kwargs
+        metrics.enable(instrument)
+        # The organizations that failed with their errors.
+        self.failures = dict()
+
+    def _get_report(self, organization: str) -> GithubContributorsReport:
+        return GithubContributorsReport(
+            None,
+            organization,
+            os.path.join(self.report_path, organization),
+            engine=self.engine,
+            concurrency=self.concurrency,
+            instrument=None,
+            github_object=self.github_object,
+            service=self.service,
+            **self.kwargs,
+        )
+
+    def _run_organization(self, organization: str) -> dict:
+        """Generate the report of an organization, a failure is kept with its error
+        instead of stopping the other organizations.
+
+        Args:
+            - organization(str): The name of the organization.
+
+        Returns:
+            dict: for contributors with its repositories and languages, None if the
+                organization failed.
+        """
+        report = self._get_report(organization)
+        try:
+            results = report._run()
+        except exceptions.BaseException as e:
+            print(f"Failed to generate the report of {organization}: {e}")
+            self.failures[organization] = str(e)
+            return None
+        report._write_report(results)
+        return results
+
+    def _rollup(self, results: dict) -> dict:
+        """Merge the users of all organizations, the repositories are prefixed with the
+        name of their organization.
+
+        Args:
+            - results(dict): of the organization and the results of its report.
+
+        Returns:
+            dict: for contributors with its organizations, repositories and languages.
+        """
+        rollup = dict()
+        for organization, users in results.items():
+            for user_id, data in users.items():
+                if user_id not in rollup:
+                    rollup[user_id] = {
+                        "user": data["user"],
+                        "organizations": [],
+                        "repos": [],
+                        # Keep the order of the languages without duplicates.
+                        "languages": dict(),
+                    }
+                user_data = rollup[user_id]
+                user_data["organizations"].append(organization)
+                user_data["repos"].extend(
+                    f"{organization}/{repo}" for repo in data["repos"]
+                )
+                user_data["languages"].update(dict.fromkeys(data["languages"]))
+        for data in rollup.values():
+            data["languages"] = list(data["languages"])
+        return rollup
+
+    def _run(self) -> dict:
+        """Generate the reports of all organizations concurrently.
+
+        Returns:
+            dict: of the organization and the results of its report.
+        """
+        with ThreadPoolExecutor(max_workers=self.organization_concurrency) as executor:
+            results = dict(
+                zip(
+                    self.organizations,
+                    executor.map(self._run_organization, self.organizations),
+                )
+            )
+        if self.failures:
+            print(
+                f"{len(self.failures)} organizations failed: "
+                + ", ".join(self.failures)
+            )
+        return {
+            organization: users
+            for organization, users in results.items()
+            if users is not None
+        }
+
+    @property
+    def filename(self):
+        if not os.path.exists(self.report_path):
+            os.makedirs(self.report_path)
+        time_now = datetime.now().strftime("%m_%d_%Y_%H_%M")
+        return os.path.join(self.report_path, f"rollup_{time_now}")
+
+    def _write_rollup(self, rollup: dict, filename: str) -> None:
+        with WRITERS[self.output_format](
+            filename, ROLLUP_COLUMNS, compression=self.compression
+        ) as writer:
+            for data in rollup.values():
+                user_dict = data["user"]
+                writer.write(
+                    [
+                        user_dict["login"],
+                        user_dict["name"],
+                        user_dict["email"],
+                        data["organizations"],
+                        data["repos"],
+                        data["languages"],
+                    ]
+                )
+        print(f"Created {self.output_format} file successfully: {writer.path}")
+
+    def _write_profile(self, filename: str, seconds: float) -> None:
+        if not metrics.enabled:
+            return
+        profile = {
+            "organizations": self.organizations,
+            "engine": self.engine,
+            "concurrency": self.concurrency,
+            "organization_concurrency": self.organization_concurrency,
+            "wall_time": round(seconds, 6),
+            "failures": self.failures,
+            "tokens": self.github_object.tokens.to_dict(),
+            **metrics.to_dict(),
+        }
+        with open(f"{filename}.profile.json", mode="w") as profile_file:
+            json.dump(profile, profile_file, indent=2, sort_keys=True)
+        print(f"Created profile file successfully: {filename}.profile.json")
+
+    def generate_report(self) -> None:
+        """Start point for this class, will write the report of every organization and
+        the rollup of all of them.
+        """
+        filename = self.filename
+        start = time.perf_counter()
+        self._write_rollup(self._rollup(self._run()), filename)
+        self._write_profile(filename, time.perf_counter() - start)
+        self.github_object.tokens.print_usage()
+        print_retries(self.github_object.retry_policy, self.github_object.hedger)
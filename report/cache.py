@@ -0,0 +1,165 @@
+import time
+from collections import OrderedDict
+
+
+def encode(data: dict) -> dict:
+    # Redis stores the fields of a hash as strings, every backend does the same so the
+    # results don't depend on the backend.
+    return {str(key): str(value) for key, value in data.items()}
+
+
+class BaseCache:
+    """Interface of the cache backends, every value is a dict like a Redis hash.
+
+    Args:
+        - ttls(dict): Seconds to keep the keys of every family, the families are the
+            templates of the cache keys in `report.constants`. None to never expire.
+    """
+
+    def __init__(self, ttls: dict = None, *args, **kwargs) -> None:
+        self.ttls = ttls or dict()
+
+    def get_ttl(self, cache_key: str):
+        for template, ttl in self.ttls.items():
+            prefix = template.split("{", 1)[0]
+            suffix = template.rsplit("}", 1)[-1]
+            if cache_key.startswith(prefix) and cache_key.endswith(suffix):
+                return ttl
+
+    def get_many(self, cache_keys: list) -> list:
+        raise NotImplementedError
+
+    def set_many(self, data: dict) -> None:
+        raise NotImplementedError
+
+    def get(self, cache_key: str) -> dict:
+        return self.get_many([cache_key])[0]
+
+    def after_fork(self) -> None:
+        """Called in a forked worker before it uses the cache inherited from the parent."""
+
+    def set(self, cache_key: str, data: dict) -> None:
+        self.set_many({cache_key: data})
+
+
+class MemoryCache(BaseCache):
+    """Keep the keys in the memory of the process, for when no Redis is available."""
+
+    def __init__(self, ttls: dict = None, *args, **kwargs) -> None:
+        super().__init__(ttls, *args, **kwargs)
+        # The key and a tuple of the expiry time and the value.
+        self.data = dict()
+
+    def get_many(self, cache_keys: list) -> list:
+        now = time.monotonic()
+        results = []
+        for cache_key in cache_keys:
+            expires_at, value = self.data.get(cache_key, (None, {}))
+            if expires_at is not None and expires_at <= now:
+                del self.data[cache_key]
+                value = {}
+            results.append(dict(value))
+        return results
+
+    def set_many(self, data: dict) -> None:
+        now = time.monotonic()
+        for cache_key, value in data.items():
+            ttl = self.get_ttl(cache_key)
+            expires_at = now + ttl if ttl else None
+            self.data[cache_key] = (expires_at, encode(value))
+
+
+class RedisCache(BaseCache):
+    """Keep the keys in Redis as hashes, every key expires after the TTL of its family."""
+
+    def __init__(self, redis_conn, ttls: dict = None, *args, **kwargs) -> None:
+        super().__init__(ttls, *args, **kwargs)
+        self.redis_conn = redis_conn
+
+    def after_fork(self) -> None:
+        # The sockets of the parent can't be shared by the workers, so every worker opens
+        # its own connections, the ones of the parent are closed without shutting them down.
+        connection_pool = getattr(self.redis_conn, "connection_pool", None)
+        if connection_pool is not None:
+            connection_pool.reset()
+
+    def get_many(self, cache_keys: list) -> list:
+        if len(cache_keys) == 1:
+            return [self.redis_conn.hgetall(cache_keys[0])]
+        pipeline = self.redis_conn.pipeline(transaction=False)
+        for cache_key in cache_keys:
+            pipeline.hgetall(cache_key)
+        return pipeline.execute()
+
+    def set_many(self, data: dict) -> None:
+        pipeline = self.redis_conn.pipeline(transaction=False)
+        for cache_key, value in data.items():
+            pipeline.hset(cache_key, mapping=value)
+            ttl = self.get_ttl(cache_key)
+            if ttl:
+                pipeline.expire(cache_key, ttl)
+        pipeline.execute()
+
+
+class LRUCache(BaseCache):
+    """Keep the most recently used keys in the memory of the process in front of another
+    backend, so the same key is not requested twice from the backend. The keys expire from
+    the memory after the TTL of their family like from the backend, so a long running
+    process doesn't serve stale names and emails.
+
+    Args:
+        - backend(BaseCache): The backend of the keys missing from the memory.
+        - max_size(int): Maximum number of keys in the memory.
+    """
+
+    def __init__(self, backend: BaseCache, max_size: int = 10000, *args, **kwargs):
+        super().__init__(backend.ttls, *args, **kwargs)
+        self.backend = backend
+        self.max_size = max_size
+        # The key and a tuple of the expiry time and the value.
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, cache_key: str, value: dict) -> None:
+        ttl = self.get_ttl(cache_key)
+        expires_at = time.monotonic() + ttl if ttl else None
+        self.data[cache_key] = (expires_at, value)
+        self.data.move_to_end(cache_key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def get_many(self, cache_keys: list) -> list:
+        now = time.monotonic()
+        results = dict()
+        for cache_key in cache_keys:
+            if cache_key not in self.data:
+                continue
+            expires_at, value = self.data[cache_key]
+            if expires_at is not None and expires_at <= now:
+                del self.data[cache_key]
+                continue
+            self.data.move_to_end(cache_key)
+            results[cache_key] = dict(value)
+        self.hits += len(results)
+        missing = [cache_key for cache_key in cache_keys if cache_key not in results]
+        self.misses += len(missing)
+        if missing:
+            for cache_key, value in zip(missing, self.backend.get_many(missing)):
+                if value:
+                    self._remember(cache_key, value)
+                results[cache_key] = value
+        return [results[cache_key] for cache_key in cache_keys]
+
+    def after_fork(self) -> None:
+        self.backend.after_fork()
+
+    def set_many(self, data: dict) -> None:
+        self.backend.set_many(data)
+        for cache_key, value in data.items():
+            self._remember(cache_key, encode(value))
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,100 @@
+import json
+import os
+
+
+class CheckpointJournal:
+    """An append-only JSON lines journal of the repositories finished by a report, so a
+    crawl that stops halfway can be resumed without fetching them again.
+
+    Every line is the result of a repository or the error it failed with, the last line of
+    a repository wins. The file is flushed after every line, and a line cut by a crash is
+    ignored when the journal is loaded.
+
+    Args:
+        - path(str): The path of the journal file.
+    """
+
+    def __init__(self, path: str, *args, **kwargs) -> None:
+        self.path = path
+        self._file = None
+
+    def __getstate__(self):
+        # Files can't be pickled into the workers of the multiprocessing pool.
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+    def load(self) -> tuple:
+        """Read the journal of a previous run.
+
+        Returns:
+            tuple: of dicts of the repository id and its result, and of the repository
+                id and its error.
+        """
+        results, errors = dict(), dict()
+        if not os.path.exists(self.path):
+            return results, errors
+        with open(self.path) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                results.pop(entry["id"], None)
+                errors.pop(entry["id"], None)
+                if "error" in entry:
+                    errors[entry["id"]] = entry
+                else:
+                    results[entry["id"]] = entry["result"]
+        return results, errors
+
+    def open(self, resume: bool = False) -> "CheckpointJournal":
+        """Open the journal to record the repositories, it starts empty unless the
+        previous run is resumed.
+
+        Args:
+            - resume(bool): Keep the repositories recorded by the previous run.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(self.path, mode="a" if resume else "w")
+        if resume and self._file.tell():
+            with open(self.path, "rb") as journal_file:
+                journal_file.seek(-1, os.SEEK_END)
+                cut = journal_file.read() != b"\n"
+            if cut:
+                # Don't append the next line to the line cut by a crash.
+                self._file.write("\n")
+        return self
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def record(self, result: dict) -> None:
+        """Record the result of a finished repository.
+
+        Args:
+            - result(dict): The repository with its contributors and languages.
+        """
+        self._write({"id": result["id"], "repo": result["repo"], "result": result})
+
+    def record_failure(self, failure: dict) -> None:
+        """Record the error of a failed repository, to be fetched again on resume.
+
+        Args:
+            - failure(dict): The id and name of the repository with its error.
+        """
+        self._write(failure)
@@ -0,0 +1,620 @@
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from .constants import CONDITIONAL_CACHE_KEY
+from .metrics import metrics
+from .mixins import CacheMixin
+from .ratelimit import RateLimitGovernor, TokenPool
+from .retry import DEFAULT_RETRIES, Hedger, RetryPolicy
+
+DEFAULT_BASE_URL = "https://api.github.com"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 15
+# The maximum number of items per page allowed by Github, the listings take the fewest
+# requests with it.
+MAX_PER_PAGE = 100
+DEFAULT_PER_PAGE = MAX_PER_PAGE
+
+# The data of a response, the URL of its next page, whether it was modified (200) or
+# served from the cache (304) and the number of the last page if it's paginated.
+Page = namedtuple("Page", ["data", "next", "modified", "last"])
+
+
+def endpoint(url: str) -> str:
+    """Return the name of the endpoint of a URL for the metrics, without the names of the
+    organization, the repository or the user, e.g. `repos/contributors`.
+    """
+    segments = urlparse(url).path.strip("/").split("/")
+    if len(segments) > 2:
+        return f"{segments[0]}/{segments[-1]}"
+    return segments[0]
+
+
+def decode(response):
+    """Return the JSON of a response, None if it has no content, like the 204 of the
+    contributors of an empty repository or the 202 of the statistics being computed.
+    """
+    if response.status_code == 204 or not response.content.strip():
+        return None
+    return response.json()
+
+
+def error_message(response) -> str:
+    """Return the message of a rejected request, empty for the other responses."""
+    if response.status_code not in (403, 429):
+        return ""
+    try:
+        return response.json().get("message") or ""
+    except (ValueError, AttributeError):
+        return response.text
+
+
+def github_exception(status: int, data: dict, headers: dict) -> Exception:
+    # PyGithub is slow to import, and only its exception is used.
+    from github import GithubException
+
+    return GithubException(status, data, headers)
+
+
+class GithubClient(CacheMixin):
+    """A thread-safe drop-in for `github.Github` covering the calls used by the report.
+
+    PyGithub keeps one connection object per client and mutates it on every request, so it
+    can't be shared between threads. This client keeps a single `requests.Session` whose
+    connection pool is shared by every request made through it, and it can be pickled into
+    the multiprocessing workers as well.
+
+    The rate limit is tracked from the headers of the responses by the governor, which waits
+    when the budget runs out instead of failing the request. With many tokens, every token
+    has its own governor and every request is sent with the token with the most budget.
+
+    The errors of the network and the server errors of Github are retried with a jittered
+    exponential backoff. With `hedge_percentile`, a GET slower than the percentile of the
+    latencies of its endpoint is sent again, and the first response of both is used.
+
+    When `conditional` is enabled, the ETag and Last-Modified of every response are cached
+    with its payload and sent back on the next request of the same URL, so unchanged data is
+    served from the cache after a 304, which doesn't count against the rate limit.
+    """
+
+    def __init__(
+        self,
+        auth_key,
+        base_url: str = DEFAULT_BASE_URL,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: int = DEFAULT_TIMEOUT,
+        per_page: int = DEFAULT_PER_PAGE,
+        conditional: bool = True,
+        governor: RateLimitGovernor = None,
+        retries: int = DEFAULT_RETRIES,
+        hedge_percentile: float = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.conditional = conditional
+        # A single token or a list of tokens.
+        keys = [auth_key] if isinstance(auth_key, str) or not auth_key else auth_key
+        self.tokens = TokenPool(keys, governor)
+        self.timeout = timeout
+        self.per_page = per_page
+        self.retry_policy = RetryPolicy(retries)
+        self.hedger = Hedger(hedge_percentile) if hedge_percentile else None
+        # The threads of the hedged requests, created on the first one.
+        self._executor = None
+        self._pool_size = pool_size
+        import requests
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/vnd.github.v3+json",
+                "User-Agent": "contributions-report",
+            }
+        )
+
+    def __getstate__(self):
+        # Threads can't be pickled into the workers of the multiprocessing pool.
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        return state
+
+    def share(self, context) -> None:
+        """Share the state of the client with the workers of a multiprocessing pool forked
+        after it, instead of every worker counting on its own copy.
+
+        Args:
+            - context(module): `multiprocessing` or one of its contexts.
+        """
+        self.tokens.share(context)
+        self.retry_policy.share(context)
+        if self.hedger is not None:
+            self.hedger.share(context)
+
+    @property
+    def governor(self) -> RateLimitGovernor:
+        return self.tokens.governor
+
+    def _url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}{path}"
+
+    def request(self, path: str, params: dict = None, headers: dict = None):
+        """Send a GET request to the Github API.
+
+        Args:
+            - path(str): The path of the endpoint or an absolute URL (pagination links).
+            - params(dict): Query string parameters.
+            - headers(dict): Headers of the request.
+
+        Returns:
+            requests.Response: The response of a successful request.
+
+        Raises:
+            GithubException: If Github replies with an error status.
+        """
+        return self._send("GET", path, params=params, headers=headers)
+
+    def _attempt(self, method: str, path: str, name: str, headers: dict, **kwargs):
+        """Send a request once with the next token.
+
+        Returns:
+            tuple: of the token and the response.
+        """
+        token = self.tokens.acquire()
+        start = time.perf_counter()
+        with metrics.timer(name):
+            response = self.session.request(
+                method,
+                self._url(path),
+                headers=dict(headers or {}, **token.headers),
+                timeout=self.timeout,
+                **kwargs,
+            )
+        if self.hedger is not None:
+            self.hedger.observe(endpoint(path), time.perf_counter() - start)
+        token.governor.update(response.headers)
+        if metrics.enabled:
+            self._instrument(name, response, token)
+        return token, response
+
+    def _hedged_attempt(
+        self, method: str, path: str, name: str, headers: dict, **kwargs
+    ):
+        """Send a GET once, and once more if the first attempt is slower than the
+        percentile of its endpoint, the first attempt to complete wins.
+
+        Returns:
+            tuple: of the token and the response.
+        """
+        delay = self.hedger.delay(endpoint(path))
+        if delay is None:
+            return self._attempt(method, path, name, headers, **kwargs)
+        if self._executor is None:
+            # Two threads per connection, so a hedge never waits for a thread.
+            self._executor = ThreadPoolExecutor(max_workers=2 * self._pool_size)
+        args = (method, path, name, headers)
+        futures = [self._executor.submit(self._attempt, *args, **kwargs)]
+        done, _ = wait(futures, timeout=delay)
+        if not done and self.hedger.take():
+            metrics.count("api.hedges")
+            futures.append(self._executor.submit(self._attempt, *args, **kwargs))
+        error = None
+        # The slower attempt completes in its thread and is dropped.
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if future is not futures[0]:
+                self.hedger.increment("won")
+                metrics.count("api.hedges.won")
+            return result
+        raise error
+
+    def _send(self, method: str, path: str, headers: dict = None, **kwargs):
+        import requests
+
+        name = f"api.{endpoint(path)}" if metrics.enabled else None
+        # Only the GETs are idempotent, so only they are hedged.
+        send = (
+            self._hedged_attempt
+            if self.hedger is not None and method == "GET"
+            else self._attempt
+        )
+        attempt = 0
+        while True:
+            try:
+                token, response = send(method, path, name, headers, **kwargs)
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                if not self.retry_policy.should_retry(attempt):
+                    raise
+                self.retry_policy.increment("network")
+                metrics.count("api.retries.network")
+                self.retry_policy.wait(attempt)
+                attempt += 1
+                continue
+            # Send the request again with another token, or after waiting for the rate
+            # limit to reset.
+            if self.tokens.should_retry(
+                token, response.status_code, response.headers, error_message(response)
+            ):
+                self.retry_policy.increment("rate_limit")
+                metrics.count("api.retries")
+                continue
+            if response.status_code >= 500 and self.retry_policy.should_retry(
+                attempt, response.status_code
+            ):
+                self.retry_policy.increment("server")
+                metrics.count("api.retries.server")
+                self.retry_policy.wait(attempt)
+                attempt += 1
+                continue
+            break
+        if response.status_code >= 400:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {"message": response.text}
+            raise github_exception(response.status_code, data, dict(response.headers))
+        return response
+
+    def _instrument(self, name: str, response, token) -> None:
+        metrics.count(name)
+        metrics.count("api.calls")
+        metrics.count(f"api.status.{response.status_code}")
+        metrics.count("api.bytes", len(response.content))
+        if len(self.tokens) > 1:
+            metrics.count(f"api.tokens.{token.name}")
+        elif token.governor.remaining is not None:
+            # The budgets of many tokens don't add up to one gauge.
+            metrics.gauge("rate_limit.remaining", token.governor.remaining)
+
+    def get(self, path: str, params: dict = None) -> Page:
+        """Send a GET request, conditional on the validators of the cached response of the
+        same URL if there is one.
+
+        Args:
+            - path(str): The path of the endpoint or an absolute URL (pagination links).
+            - params(dict): Query string parameters.
+
+        Returns:
+            Page: with the data of the response and the URL of the next page.
+        """
+        if not self.conditional:
+            response = self.request(path, params)
+            return Page(
+                decode(response), self._next(response), True, self._last(response)
+            )
+
+        url = self._url(path)
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        cache_key = CONDITIONAL_CACHE_KEY.format(url=url)
+        cached = self.get_from_cache(cache_key) or dict()
+        headers = dict()
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.request(url, headers=headers)
+        if response.status_code == 304:
+            return Page(
+                json.loads(cached["payload"]),
+                cached["next"] or None,
+                False,
+                int(cached.get("last") or 0) or None,
+            )
+
+        page = Page(decode(response), self._next(response), True, self._last(response))
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.set_into_cache(
+                cache_key,
+                {
+                    "etag": etag or "",
+                    "last_modified": last_modified or "",
+                    "payload": json.dumps(page.data),
+                    "next": page.next or "",
+                    "last": page.last or "",
+                },
+            )
+        return page
+
+    def _next(self, response) -> str:
+        return response.links.get("next", {}).get("url")
+
+    def _last(self, response) -> int:
+        url = response.links.get("last", {}).get("url")
+        if not url:
+            return None
+        return int(parse_qs(urlparse(url).query).get("page", ["0"])[0]) or None
+
+    def request_json(self, path: str, params: dict = None):
+        return self.get(path, params).data
+
+    def pages(self, path: str, params: dict = None):
+        """Iterate over all the pages of a paginated endpoint, following the `Link` header.
+
+        Args:
+            - path(str): The path of the endpoint.
+            - params(dict): Query string parameters.
+
+        Returns:
+            generator: of Page of every page.
+        """
+        params = dict(params or {}, per_page=self.per_page)
+        url = path
+        while url:
+            page = self.get(url, params)
+            yield page
+            # The next link already contains the query string of the first request.
+            url = page.next
+            params = None
+
+    def pages_concurrently(
+        self,
+        path: str,
+        params: dict = None,
+        concurrency: int = DEFAULT_POOL_SIZE,
+        per_page: int = None,
+    ):
+        """Iterate over all the pages of a paginated endpoint, the number of pages is read
+        from the `last` link of the first page and the other pages are fetched concurrently.
+
+        Args:
+            - path(str): The path of the endpoint.
+            - params(dict): Query string parameters.
+            - concurrency(int): Maximum number of pages in flight.
+            - per_page(int): Number of items per page, the default of the client if None.
+
+        Returns:
+            generator: of Page of every page, in the order they land.
+        """
+        params = dict(params or {}, per_page=per_page or self.per_page)
+        first = self.get(path, params)
+        yield first
+        if not first.last:
+            # Without the number of pages, they can only be followed one by one.
+            url = first.next
+            while url:
+                page = self.get(url)
+                yield page
+                url = page.next
+            return
+        if first.last < 2:
+            return
+        with ThreadPoolExecutor(
+            max_workers=min(concurrency, first.last - 1)
+        ) as executor:
+            futures = [
+                executor.submit(self.get, path, dict(params, page=number))
+                for number in range(2, first.last + 1)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def paginate(self, path: str, params: dict = None):
+        """Iterate over all the items of a paginated endpoint.
+
+        Args:
+            - path(str): The path of the endpoint.
+            - params(dict): Query string parameters.
+
+        Returns:
+            generator: of the items of all pages.
+        """
+        for page in self.pages(path, params):
+            yield from page.data or []
+
+    def graphql(self, query: str, variables: dict = None) -> dict:
+        """Send a query to the Github GraphQL API.
+
+        Args:
+            - query(str): The GraphQL query.
+            - variables(dict): The variables of the query.
+
+        Returns:
+            dict: The data of the response.
+
+        Raises:
+            GithubException: If Github replies with an error status or the query has errors.
+        """
+        response = self._send(
+            "POST", "/graphql", json={"query": query, "variables": variables or {}}
+        )
+        data = response.json()
+        if data.get("errors"):
+            # Github replies with 200 even if the query fails.
+            raise github_exception(
+                response.status_code,
+                {"message": data["errors"][0]["message"]},
+                dict(response.headers),
+            )
+        return data["data"]
+
+    def get_organization(self, organization: str):
+        return Organization(self, self.request_json(f"/orgs/{organization}"))
+
+    def get_user(self, login: str):
+        return NamedUser(self, self.request_json(f"/users/{login}"), completed=True)
+
+
+class GithubObject:
+    def __init__(self, client, raw_data):
+        self._client = client
+        self.raw_data = raw_data
+
+    def __getstate__(self):
+        # The objects are sent to the workers of the multiprocessing pool with every task,
+        # without their client, the workers attach their own with `attach`.
+        state = self.__dict__.copy()
+        state["_client"] = None
+        return state
+
+    def attach(self, client) -> None:
+        """Attach the client of the process to an object received without it."""
+        if self._client is None:
+            self._client = client
+
+    @property
+    def id(self):
+        return self.raw_data["id"]
+
+
+class Organization(GithubObject):
+    @property
+    def login(self):
+        return self.raw_data["login"]
+
+    @property
+    def name(self):
+        return self.raw_data.get("name")
+
+    def get_repos(self):
+        return [repo for repos in self.get_repo_pages() for repo in repos]
+
+    def get_repo_pages(self, concurrency: int = DEFAULT_POOL_SIZE, params: dict = None):
+        """Iterate over the repositories page by page, as soon as every page lands.
+
+        Args:
+            - concurrency(int): Maximum number of pages in flight.
+            - params(dict): Query string parameters of the listing, e.g. its `type`.
+
+        Returns:
+            generator: of lists of Repository of every page.
+        """
+        for page in self._client.pages_concurrently(
+            f"/orgs/{self.login}/repos", params, concurrency=concurrency
+        ):
+            yield [Repository(self._client, data) for data in page.data or []]
+
+
+class Repository(GithubObject):
+    def __init__(self, client, raw_data):
+        super().__init__(client, raw_data)
+        # Whether any response about the repository was modified since the last run.
+        self.modified = False
+
+    def _get(self, path):
+        page = self._client.get(path)
+        self.modified = self.modified or page.modified
+        return page.data
+
+    @property
+    def name(self):
+        return self.raw_data["name"]
+
+    @property
+    def full_name(self):
+        return self.raw_data["full_name"]
+
+    @property
+    def pushed_at(self):
+        return self.raw_data.get("pushed_at")
+
+    @property
+    def size(self):
+        return self.raw_data.get("size") or 0
+
+    @property
+    def fork(self):
+        return bool(self.raw_data.get("fork"))
+
+    @property
+    def archived(self):
+        return bool(self.raw_data.get("archived"))
+
+    @property
+    def topics(self):
+        return self.raw_data.get("topics") or []
+
+    @property
+    def visibility(self):
+        # Older versions of Github Enterprise only tell if it's private.
+        visibility = self.raw_data.get("visibility")
+        if visibility:
+            return visibility
+        return "private" if self.raw_data.get("private") else "public"
+
+    def get_contributors(self):
+        # The largest repositories have thousands of contributors, so the pages are as
+        # big as possible and fetched concurrently, as many as the connections of the
+        # client.
+        contributors = []
+        for page in self._client.pages_concurrently(
+            f"/repos/{self.full_name}/contributors",
+            concurrency=self._client._pool_size,
+            per_page=MAX_PER_PAGE,
+        ):
+            self.modified = self.modified or page.modified
+            # Github replies with 204 and no content for an empty repository.
+            contributors.extend(
+                NamedUser(self._client, data) for data in page.data or []
+            )
+        return contributors
+
+    def get_languages(self):
+        return self._get(f"/repos/{self.full_name}/languages") or {}
+
+    def get_stats_contributors(self):
+        """Return the weekly additions, deletions and commits of every contributor.
+
+        Returns:
+            list: of the contributors with their weeks, None while Github computes them.
+        """
+        data = self._get(f"/repos/{self.full_name}/stats/contributors")
+        # Github replies with 202 and an empty body until the statistics are computed.
+        return data if isinstance(data, list) else None
+
+
+class NamedUser(GithubObject):
+    """Contributors are listed without their name and email, so like PyGithub they are
+    fetched lazily from `/users/{login}` the first time they are read.
+    """
+
+    def __init__(self, client, raw_data, completed=False):
+        super().__init__(client, raw_data)
+        self._completed = completed
+
+    def _complete(self):
+        if not self._completed:
+            self.raw_data = dict(
+                self.raw_data, **self._client.request_json(f"/users/{self.login}")
+            )
+            self._completed = True
+
+    @property
+    def login(self):
+        return self.raw_data["login"]
+
+    @property
+    def contributions(self):
+        # Only the contributors of a repository have their number of commits.
+        return self.raw_data.get("contributions", 0)
+
+    @property
+    def name(self):
+        self._complete()
+        return self.raw_data.get("name")
+
+    @property
+    def email(self):
+        self._complete()
+        return self.raw_data.get("email")
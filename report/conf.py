@@ -1,3 +1,95 @@
-import redis
+import os
 
-redis_conn = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+from .cache import LRUCache, MemoryCache, RedisCache
+from .constants import (
+    CONDITIONAL_CACHE_KEY,
+    CONTRIBUTOR_CACHE_KEY,
+    REPO_LANGUAGES_CACHE_KEY,
+    REPO_SNAPSHOT_CACHE_KEY,
+)
+
+# All settings can be overridden with environment variables or `configure`.
+settings = {
+    # Backend of the cache: "redis" or "memory" when no Redis is available.
+    "CACHE_BACKEND": os.environ.get("REPORT_CACHE_BACKEND", "redis"),
+    "REDIS_URL": os.environ.get("REPORT_REDIS_URL", "redis://localhost:6379/0"),
+    # Maximum number of keys in the in-process LRU in front of the backend, 0 to disable it.
+    "CACHE_LRU_SIZE": int(os.environ.get("REPORT_CACHE_LRU_SIZE", 10000)),
+    # Prefix of the keys of the work queue shared by the coordinator and the workers.
+    "QUEUE_PREFIX": os.environ.get("REPORT_QUEUE_PREFIX", "report:queue"),
+    # Seconds a worker holds a repository before it's delivered to another worker.
+    "QUEUE_LEASE": int(os.environ.get("REPORT_QUEUE_LEASE", 300)),
+    # Number of times a repository is delivered before it's reported as failed.
+    "QUEUE_DELIVERIES": int(os.environ.get("REPORT_QUEUE_DELIVERIES", 3)),
+    # The secret of the webhooks of the organization, the deliveries of the daemon are
+    # rejected unless they are signed with it, if it's set.
+    "WEBHOOK_SECRET": os.environ.get("REPORT_WEBHOOK_SECRET"),
+    # Seconds to keep every family of keys, so the names and emails don't get stale.
+    "CACHE_TTLS": {
+        CONTRIBUTOR_CACHE_KEY: int(os.environ.get("REPORT_CACHE_USER_TTL", 86400)),
+        REPO_LANGUAGES_CACHE_KEY: int(
+            os.environ.get("REPORT_CACHE_LANGUAGES_TTL", 86400)
+        ),
+        # Validators are only sent back to Github, so they can't get stale.
+        CONDITIONAL_CACHE_KEY: int(
+            os.environ.get("REPORT_CACHE_CONDITIONAL_TTL", 604800)
+        ),
+        # Snapshots are replaced as soon as the repository is pushed to.
+        REPO_SNAPSHOT_CACHE_KEY: int(
+            os.environ.get("REPORT_CACHE_SNAPSHOT_TTL", 2592000)
+        ),
+    },
+}
+
+_cache = None
+
+
+def configure(**kwargs) -> None:
+    """Override the settings, the cache will be created again with the new settings.
+
+    Args:
+        - kwargs: The names of the settings and their values.
+    """
+    global _cache
+    settings.update(kwargs)
+    _cache = None
+
+
+def get_redis():
+    """Return a new client of the Redis server of the settings.
+
+    Return:
+        - redis.Redis: The client, its connections are opened on the first command.
+    """
+    # Imported on the first use, it's slow to import and the memory cache and the
+    # commands that don't run a report don't need it.
+    import redis
+
+    return redis.Redis.from_url(settings["REDIS_URL"], decode_responses=True)
+
+
+def get_cache():
+    """Return the cache of the process, created on the first call from the settings.
+
+    Return:
+        - BaseCache: The cache backend.
+    """
+    global _cache
+    if _cache is None:
+        if settings["CACHE_BACKEND"] == "memory":
+            backend = MemoryCache(settings["CACHE_TTLS"])
+        else:
+            backend = RedisCache(get_redis(), settings["CACHE_TTLS"])
+        if settings["CACHE_LRU_SIZE"]:
+            backend = LRUCache(backend, settings["CACHE_LRU_SIZE"])
+        _cache = backend
+    return _cache
+
+
+def _after_fork() -> None:
+    if _cache is not None:
+        _cache.after_fork()
+
+
+# The workers of the multiprocessing pool are forked with the cache of the parent.
+os.register_at_fork(after_in_child=_after_fork)
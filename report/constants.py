@@ -2,3 +2,7 @@
 CONTRIBUTOR_CACHE_KEY = "user-{id}"
 # User this key to store the value of the repository's languages in the cache.
 REPO_LANGUAGES_CACHE_KEY = "repo-{id}-languages"
+# User this key to store the validators (ETag, Last-Modified) and the payload of a response.
+CONDITIONAL_CACHE_KEY = "conditional-{url}"
+# User this key to store the results of a repository with its last push time.
+REPO_SNAPSHOT_CACHE_KEY = "repo-{id}-snapshot"
@@ -0,0 +1,392 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from report import conf
+from report.client import Repository
+from report.github import GithubContributorsReport
+from report.index import ContributorsIndex
+from report.services import GraphQLGithubService
+from report.writers import WRITERS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+# The events of the webhooks that update the index, the others are acknowledged only.
+WEBHOOK_EVENTS = ("push", "repository", "member")
+# The actions of the repository events that remove the repository from the organization.
+REMOVED_ACTIONS = ("deleted", "transferred")
+# The actions of the repository events that only change the metadata of the repository,
+# its contributors and languages are fetched again only if it wasn't indexed.
+METADATA_ACTIONS = ("edited", "archived", "unarchived", "publicized", "privatized")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def to_repository_data(data: dict) -> dict:
+    """Return the repository of a webhook event like the listing of the repositories, the
+    push events have their dates as timestamps.
+    """
+    pushed_at = data.get("pushed_at")
+    if isinstance(pushed_at, (int, float)):
+        pushed_at = datetime.fromtimestamp(pushed_at, timezone.utc)
+        data = dict(data, pushed_at=pushed_at.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return data
+
+
+class ReportDaemon:
+    """Crawl an organization once and keep its contributors indexed in memory, answer the
+    queries of a local HTTP API from the index and apply the webhook events of the
+    organization to the repositories they affect, instead of crawling everything again.
+
+    The HTTP API starts before the crawl, so the webhook events delivered while crawling are
+    queued and applied in order after it, by a single thread. The queries are answered
+    once the index is built.
+
+    Args:
+        - report(GithubContributorsReport): The report of the organization, its service
+            fetches the repositories and its filter selects them.
+        - host(str): The address of the HTTP API.
+        - port(int): The port of the HTTP API, 0 for any free port.
+        - secret(str): The secret of the webhooks, the deliveries without its signature
+            are rejected, if it's set.
+    """
+
+    def __init__(
+        self,
+        report: GithubContributorsReport,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        secret: str = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        # A repository is fetched again alone, which the GraphQL query can't do.
+        if isinstance(report.service, GraphQLGithubService):
+            raise ValueError("The daemon is only available with the rest api")
+        self.report = report
+        self.host = host
+        self.port = port
+        self.secret = secret if secret is not None else conf.settings["WEBHOOK_SECRET"]
+        self.index = ContributorsIndex()
+        self.ready = threading.Event()
+        self.crawled_at = None
+        self.events = queue.Queue()
+        # Number of events applied, by the name of the event.
+        self.applied = Counter()
+        self.server = None
+        self._threads = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReportDaemon":
+        """Start the HTTP API and the thread of the webhook events, in the background."""
+        self.server = ThreadingHTTPServer((self.host, self.port), DaemonHandler)
+        self.server.daemon_threads = True
+        self.server.report_daemon = self
+        self._threads = [
+            threading.Thread(target=self.server.serve_forever, daemon=True),
+            threading.Thread(target=self._apply_events, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        # Wakes up the thread of the events, even if the index was never built.
+        self.ready.set()
+        self.events.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def crawl(self) -> None:
+        """Crawl the whole organization and replace the index, the users are resolved once
+        for all the repositories like in the report.
+        """
+        start = time.perf_counter()
+        results = list(self.report._iter_repositories())
+        users = self.report.service.get_users(
+            user for result in results for user in result["users"]
+        )
+        index = ContributorsIndex()
+        for result in results:
+            index.add(result, users)
+        self.index = index
+        self.crawled_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.ready.set()
+        print(
+            f"Indexed {len(index)} repositories of {self.report.organization} in {time.perf_counter() - start:.1f}s"
+        )
+
+    def serve(self, stopped: threading.Event = None) -> None:
+        """Start point for this class, crawl the organization and serve the HTTP API until
+        stopped.
+
+        Args:
+            - stopped(Event): Stop the daemon when set, it runs until interrupted if None.
+        """
+        stopped = stopped or threading.Event()
+        self.start()
+        print(f"Serving the contributors of {self.report.organization} on {self.url}")
+        try:
+            self.crawl()
+            stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def join(self) -> None:
+        """Wait until the events received so far are applied."""
+        self.events.join()
+
+    def verify(self, body: bytes, signature: str) -> bool:
+        """Check the signature of a webhook delivery, the `X-Hub-Signature-256` header.
+
+        Args:
+            - body(bytes): The payload of the delivery.
+            - signature(str): The signature of the delivery, None if it's not signed.
+
+        Returns:
+            bool: True if the delivery is signed with the secret or no secret is set.
+        """
+        if not self.secret:
+            return True
+        digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(f"sha256={digest}", signature or "")
+
+    def receive(self, event: str, payload: dict) -> str:
+        """Queue a webhook event if it affects a repository of the index.
+
+        Args:
+            - event(str): The name of the event, the `X-GitHub-Event` header.
+            - payload(dict): The payload of the event.
+
+        Returns:
+            str: Why the event was ignored, None if it was queued.
+        """
+        if event not in WEBHOOK_EVENTS:
+            return f"The {event} events are ignored"
+        repository = payload.get("repository") or {}
+        owner = (repository.get("owner") or {}).get("login", "")
+        if owner.lower() != self.report.organization.lower():
+            return f"The repository isn't of {self.report.organization}"
+        default_branch = repository.get("default_branch")
+        if (
+            event == "push"
+            and default_branch
+            and payload.get("ref") != f"refs/heads/{default_branch}"
+        ):
+            # The contributors are counted on the default branch.
+            return "The push isn't to the default branch"
+        self.events.put((event, payload))
+        return None
+
+    def _apply_events(self) -> None:
+        self.ready.wait()
+        while True:
+            item = self.events.get()
+            try:
+                if item is None:
+                    return
+                self.apply(*item)
+            except Exception as e:
+                print(f"Failed to apply a {item[0]} event: {e}")
+            finally:
+                self.events.task_done()
+
+    def apply(self, event: str, payload: dict) -> None:
+        """Update the repository of a webhook event in the index.
+
+        A push or a change of the members of a repository fetches the repository again. A
+        deleted or transferred repository is removed, a renamed repository keeps its
+        contributors and the other changes of a repository only select it again with the
+        filter of the report.
+
+        Args:
+            - event(str): The name of the event.
+            - payload(dict): The payload of the event.
+        """
+        repo = Repository(
+            self.report.github_object, to_repository_data(payload["repository"])
+        )
+        action = payload.get("action")
+        if event == "repository" and action in REMOVED_ACTIONS:
+            if self.index.remove(repo.id):
+                print(f"{repo.name} was removed from the index.")
+        elif event == "repository" and action == "renamed":
+            self.index.rename(repo.id, repo.name)
+            self.update(repo, fetch=False)
+        elif event == "repository" and action in METADATA_ACTIONS:
+            self.update(repo, fetch=False)
+        else:
+            self.update(repo)
+        self.applied[event] += 1
+
+    def update(self, repo: Repository, fetch: bool = True) -> None:
+        """Fetch a repository again and replace it in the index, or remove it if the filter
+        of the report leaves it out now.
+
+        Args:
+            - repo(Repository): The repository.
+            - fetch(bool): Fetch the repository only if it's not indexed yet.
+        """
+        repo_filter = self.report.repo_filter
+        if repo_filter is not None and not repo_filter.match(repo):
+            if self.index.remove(repo.id):
+                print(f"{repo.name} was filtered out of the index.")
+            return
+        if not fetch and repo.id in self.index:
+            return
+        # A push may change the languages too.
+        self.report.service.forget_languages(repo)
+        result = self.report._crawl_repository(repo)
+        if "error" in result:
+            # The index keeps the last contributors of the repository.
+            return
+        # The users are resolved from the cache, so they are fetched again once they
+        # expire from it.
+        users = self.report.service.get_users(result["users"])
+        self.index.add(result, users)
+        # The next crawl takes the repository from its snapshot, until it's pushed to again.
+        self.report.service.set_snapshots([repo], [result])
+        print(f"{repo.name} was updated in the index.")
+
+    def status(self) -> dict:
+        return {
+            "organization": self.report.organization,
+            "ready": self.ready.is_set(),
+            "crawled_at": self.crawled_at,
+            "events": dict(self.applied),
+            "pending_events": self.events.qsize(),
+            **self.index.stats(),
+        }
+
+    def export(self) -> tuple:
+        """Write the index into a file of the format of the report.
+
+        Returns:
+            tuple: of the name of the file and its content.
+        """
+        report = self.report
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, f"report_{report.organization}")
+            report._write_report(self.index.to_dict(), filename)
+            path = filename + WRITERS[report.output_format].get_extension(
+                report.compression
+            )
+            with open(path, mode="rb") as report_file:
+                return os.path.basename(path), report_file.read()
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """The HTTP API of the ReportDaemon, every response is JSON except the export."""
+
+    routes = [
+        ("status", re.compile(r"^/status$")),
+        ("user", re.compile(r"^/users/(?P<login>[^/]+)$")),
+        ("language", re.compile(r"^/languages/(?P<language>[^/]+)$")),
+        ("repo", re.compile(r"^/repos/(?P<name>[^/]+)$")),
+        ("report", re.compile(r"^/report$")),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def report_daemon(self) -> ReportDaemon:
+        return self.server.report_daemon
+
+    def reply(self, status, data, content_type="application/json", headers=None):
+        body = data if isinstance(data, bytes) else json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        for endpoint, pattern in self.routes:
+            match = pattern.match(path)
+            if match:
+                if endpoint != "status" and not self.report_daemon.ready.is_set():
+                    return self.reply(503, {"message": "The index is being built"})
+                params = {
+                    key: unquote(value) for key, value in match.groupdict().items()
+                }
+                return getattr(self, f"get_{endpoint}")(**params)
+        self.reply(404, {"message": "Not Found"})
+
+    def get_status(self):
+        self.reply(200, self.report_daemon.status())
+
+    def _reply_found(self, data, message):
+        if data is None:
+            return self.reply(404, {"message": message})
+        self.reply(200, data)
+
+    def get_user(self, login):
+        self._reply_found(
+            self.report_daemon.index.get_user(login), f"Unknown user: {login}"
+        )
+
+    def get_language(self, language):
+        self._reply_found(
+            self.report_daemon.index.get_language(language),
+            f"Unknown language: {language}",
+        )
+
+    def get_repo(self, name):
+        self._reply_found(
+            self.report_daemon.index.get_repo(name), f"Unknown repository: {name}"
+        )
+
+    def get_report(self):
+        report = self.report_daemon.report
+        filename, content = self.report_daemon.export()
+        content_type = CONTENT_TYPES[report.output_format]
+        if report.compression:
+            content_type = "application/octet-stream"
+        self.reply(
+            200,
+            content,
+            content_type,
+            {"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/webhook":
+            return self.reply(404, {"message": "Not Found"})
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.report_daemon.verify(body, self.headers.get("X-Hub-Signature-256")):
+            return self.reply(401, {"message": "Bad signature"})
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.reply(400, {"message": "The payload isn't JSON"})
+        event = self.headers.get("X-GitHub-Event", "")
+        ignored = self.report_daemon.receive(event, payload)
+        if ignored:
+            return self.reply(200, {"message": ignored})
+        self.reply(202, {"message": "Queued"})
@@ -0,0 +1,93 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeferredQueue:
+    """Park the items that are not ready yet, to be retried with an exponential backoff
+    while the other items proceed, until they are ready or the deadline passes.
+
+    The items handed over are tracked until they finish, so iterating over the queue
+    yields every parked item when it's due, and only ends when no item is parked nor in
+    flight anymore, as an item in flight may still be parked.
+
+    Args:
+        - delay(float): Seconds before the first retry of an item, doubled on every retry.
+        - max_delay(float): Maximum seconds between two retries of an item.
+        - deadline(float): Seconds from the first time an item is parked after which it
+            isn't parked anymore, so the items listed late get as long as the first ones.
+    """
+
+    def __init__(
+        self, delay: float = 2, max_delay: float = 60, deadline: float = 300
+    ) -> None:
+        self.delay = delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        # Tuples of the due time, a counter for the ties and the item.
+        self._parked = []
+        self._attempts = dict()
+        # The time after which every item isn't parked anymore, by key.
+        self._deadlines = dict()
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def start(self) -> None:
+        """Track an item handed over, it has to be finished or parked then finished."""
+        with self._condition:
+            self._in_flight += 1
+
+    def finish(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def park(self, key, item) -> bool:
+        """Park an item until its next retry.
+
+        Args:
+            - key: The key of the item, to count its retries.
+            - item: The item to be yielded again.
+
+        Returns:
+            bool: False if the next retry would be after the deadline of the item, then
+                the item isn't parked.
+        """
+        with self._condition:
+            now = time.monotonic()
+            deadline = self._deadlines.setdefault(key, now + self.deadline)
+            attempts = self._attempts.get(key, 0)
+            due = now + min(self.delay * 2**attempts, self.max_delay)
+            if due > deadline:
+                return False
+            self._attempts[key] = attempts + 1
+            heapq.heappush(self._parked, (due, next(self._counter), item))
+            self._condition.notify_all()
+            return True
+
+    def attempts(self, key) -> int:
+        """Return the number of times an item was parked."""
+        return self._attempts.get(key, 0)
+
+    def _next(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._parked and self._parked[0][0] <= now:
+                    self._in_flight += 1
+                    return heapq.heappop(self._parked)[2]
+                if not self._parked and not self._in_flight:
+                    raise StopIteration
+                timeout = self._parked[0][0] - now if self._parked else None
+                self._condition.wait(timeout)
+
+    def __iter__(self):
+        # The lock isn't held while the consumer handles the item.
+        while True:
+            try:
+                item = self._next()
+            except StopIteration:
+                return
+            yield item
@@ -0,0 +1,384 @@
+import itertools
+import json
+import tempfile
+import threading
+import time
+import uuid
+
+from report import conf
+from report.client import GithubClient, Repository
+from report.engines import DEFAULT_CONCURRENCY
+from report.github import GithubContributorsReport
+from report.ratelimit import RateLimitGovernor
+from report.services import GithubService
+
+# Seconds to wait for a task or a result before checking again.
+POLL_TIMEOUT = 1
+# Seconds between two reaps of the expired leases by the coordinator.
+REAP_INTERVAL = 5
+# Seconds to keep the options and the results of a job whose coordinator died.
+JOB_TTL = 86400
+# Number of jobs whose reports are kept by a worker.
+MAX_JOBS = 16
+
+
+class WorkQueue:
+    """A queue of repositories in Redis, shared by the coordinators of the reports and any
+    number of workers on any host.
+
+    A worker moves a task from the pending list into the processing list and leases it
+    until a deadline, when it completes the task its result is pushed to the results of
+    the job and the task is removed. The tasks whose lease expired, because their worker
+    died, are moved back to the pending list by the coordinator and delivered to another
+    worker, so a task may complete more than once and every task has a sequence number for
+    the coordinator to keep its first result only. A task whose lease expired `deliveries`
+    times is completed with an error instead, so a task that kills its workers doesn't hold
+    its job forever.
+
+    Keys:
+        - {prefix}:pending: List of the tasks waiting for a worker.
+        - {prefix}:processing: List of the tasks taken by a worker.
+        - {prefix}:leases: Sorted set of the taken tasks by the deadline of their lease.
+        - {prefix}:deliveries: Hash of the number of expired leases of the tasks.
+        - {prefix}:job:{id}: The options of a job, to build its report in the workers.
+        - {prefix}:results:{id}: List of the results of the tasks of a job.
+
+    Args:
+        - redis_conn(Redis): The client of the Redis server, with decoded responses.
+        - prefix(str): The prefix of the keys of the queue.
+        - lease(float): Seconds a worker holds a task before it's delivered again.
+        - deliveries(int): Number of times a task is delivered before it fails.
+    """
+
+    def __init__(
+        self,
+        redis_conn,
+        prefix: str = None,
+        lease: float = None,
+        deliveries: int = None,
+    ) -> None:
+        self.redis = redis_conn
+        self.prefix = prefix or conf.settings["QUEUE_PREFIX"]
+        self.lease = lease or conf.settings["QUEUE_LEASE"]
+        self.max_deliveries = deliveries or conf.settings["QUEUE_DELIVERIES"]
+        self.pending = f"{self.prefix}:pending"
+        self.processing = f"{self.prefix}:processing"
+        self.leases = f"{self.prefix}:leases"
+        self.deliveries = f"{self.prefix}:deliveries"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _results_key(self, job_id: str) -> str:
+        return f"{self.prefix}:results:{job_id}"
+
+    def now(self) -> float:
+        # The clock of the server, so the hosts agree on the deadlines of the leases.
+        seconds, microseconds = self.redis.time()
+        return seconds + microseconds / 1e6
+
+    def create_job(self, options: dict) -> str:
+        """Store the options of a new job.
+
+        Args:
+            - options(dict): The options to build the report of the job in the workers.
+
+        Returns:
+            str: The id of the job.
+        """
+        job_id = uuid.uuid4().hex
+        self.redis.set(self._job_key(job_id), json.dumps(options), ex=JOB_TTL)
+        return job_id
+
+    def get_job(self, job_id: str) -> dict:
+        """Return the options of a job, None if it was deleted."""
+        options = self.redis.get(self._job_key(job_id))
+        return None if options is None else json.loads(options)
+
+    def delete_job(self, job_id: str) -> None:
+        """Delete the options and the results of a job, its pending tasks are dropped by
+        the workers.
+        """
+        self.redis.delete(self._job_key(job_id), self._results_key(job_id))
+
+    def put(self, job_id: str, task_id: int, data: dict) -> None:
+        """Push a task behind the other pending tasks.
+
+        Args:
+            - job_id(str): The id of the job.
+            - task_id(int): The sequence number of the task in the job.
+            - data(dict): The raw data of the repository.
+        """
+        task = json.dumps({"job": job_id, "task": task_id, "repo": data})
+        self.redis.lpush(self.pending, task)
+
+    def take(self, timeout: float = POLL_TIMEOUT) -> str:
+        """Take the first pending task and lease it.
+
+        Args:
+            - timeout(float): Seconds to wait for a task, at least one.
+
+        Returns:
+            str: The task, None if no task was pending.
+        """
+        task = self.redis.brpoplpush(
+            self.pending, self.processing, max(1, int(timeout))
+        )
+        if task is not None:
+            self.redis.zadd(self.leases, {task: self.now() + self.lease})
+        return task
+
+    def complete(self, task: str, result: dict = None) -> None:
+        """Remove a task and push its result to its job.
+
+        Args:
+            - task(str): The task taken.
+            - result(dict): The result of the task, None to drop the task.
+        """
+        message = json.loads(task)
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.lrem(self.processing, 1, task)
+        pipeline.zrem(self.leases, task)
+        pipeline.hdel(self.deliveries, task)
+        if result is not None:
+            results_key = self._results_key(message["job"])
+            pipeline.rpush(
+                results_key, json.dumps({"task": message["task"], "result": result})
+            )
+            pipeline.expire(results_key, JOB_TTL)
+        pipeline.execute()
+
+    def get_result(self, job_id: str, timeout: float = POLL_TIMEOUT) -> tuple:
+        """Pop the first result of a job.
+
+        Args:
+            - job_id(str): The id of the job.
+            - timeout(float): Seconds to wait for a result, at least one.
+
+        Returns:
+            tuple: of the sequence number of the task and its result, None if no task
+                completed.
+        """
+        reply = self.redis.blpop([self._results_key(job_id)], max(1, int(timeout)))
+        if reply is None:
+            return None
+        message = json.loads(reply[1])
+        return message["task"], message["result"]
+
+    def reap(self) -> int:
+        """Move the tasks whose lease expired back to the pending list, they are delivered
+        first. The tasks taken by a worker that died before leasing them get a lease. The
+        tasks delivered too many times are completed with an error.
+
+        Returns:
+            int: Number of tasks delivered again.
+        """
+        now = self.now()
+        for task in self.redis.lrange(self.processing, 0, -1):
+            self.redis.zadd(self.leases, {task: now + self.lease}, nx=True)
+        delivered = 0
+        for task in self.redis.zrangebyscore(self.leases, "-inf", now):
+            # Only the reaper that removes the lease delivers the task again, and only
+            # if its worker didn't complete it in between.
+            if not (
+                self.redis.zrem(self.leases, task)
+                and self.redis.lrem(self.processing, 1, task)
+            ):
+                continue
+            deliveries = self.redis.hincrby(self.deliveries, task, 1)
+            if deliveries < self.max_deliveries:
+                self.redis.rpush(self.pending, task)
+                delivered += 1
+                continue
+            repo = json.loads(task)["repo"]
+            print(f"{repo['name']} was delivered {deliveries} times, it's failed.")
+            self.complete(
+                task,
+                {
+                    "id": repo["id"],
+                    "repo": repo["name"],
+                    "error": f"The lease expired {deliveries} times",
+                    "status_code": None,
+                },
+            )
+        return delivered
+
+    def imap(self, job_id: str, items):
+        """Push a task for every item and yield the first result of every task in the
+        order they complete, the expired leases are reaped while waiting.
+
+        Args:
+            - job_id(str): The id of the job.
+            - items(iterable): of the raw data of the repositories, taken in a thread as
+                they are produced.
+
+        Returns:
+            generator: of the results.
+        """
+        counter = itertools.count()
+        sent = []
+        done, stopped = threading.Event(), threading.Event()
+        errors = []
+
+        def feed():
+            try:
+                for data in items:
+                    if stopped.is_set():
+                        return
+                    task_id = next(counter)
+                    self.put(job_id, task_id, data)
+                    sent.append(task_id)
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                done.set()
+
+        threading.Thread(target=feed, daemon=True).start()
+        received = set()
+        reaped = time.monotonic()
+        try:
+            while True:
+                if errors:
+                    raise errors[0]
+                # Checked before the count, the count is final once the feed is done.
+                if done.is_set() and not errors and len(received) == len(sent):
+                    return
+                if time.monotonic() - reaped >= REAP_INTERVAL:
+                    delivered = self.reap()
+                    if delivered:
+                        print(f"{delivered} repositories were delivered again.")
+                    reaped = time.monotonic()
+                reply = self.get_result(job_id)
+                if reply is None or reply[0] in received:
+                    continue
+                received.add(reply[0])
+                yield reply[1]
+        finally:
+            stopped.set()
+
+
+class Worker:
+    """Take the repositories of the work queue and crawl them with the report of their job,
+    built from the options stored by its coordinator, in a number of threads until stopped.
+
+    The workers share their client and their service across the jobs, so the users and
+    the languages already fetched are reused, and use their own access token.
+
+    Args:
+        - auth_key(str or list): Access Token of Github account, or many tokens to spread
+            the requests across.
+        - queue(WorkQueue): The work queue.
+        - concurrency(int): Number of repositories in flight.
+        - wait(bool): Wait until the rate limit of Github resets instead of failing.
+        - client_options(dict): The options of the clients, the timeout, the retries and
+            the hedging.
+    """
+
+    def __init__(
+        self,
+        auth_key,
+        queue: WorkQueue,
+        concurrency: int = None,
+        wait: bool = True,
+        client_options: dict = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        self.auth_key = auth_key
+        self.queue = queue
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.wait = wait
+        self.client_options = client_options or dict()
+        # The clients and services by base URL, and the reports by job.
+        self.services = dict()
+        self.reports = dict()
+        self.lock = threading.Lock()
+        self.completed = 0
+
+    def _get_service(self, base_url: str) -> GithubService:
+        if base_url not in self.services:
+            github_object = GithubClient(
+                self.auth_key,
+                base_url=base_url,
+                pool_size=self.concurrency,
+                governor=RateLimitGovernor(wait=self.wait),
+                **self.client_options,
+            )
+            self.services[base_url] = GithubService(
+                github_object, concurrency=self.concurrency
+            )
+        return self.services[base_url]
+
+    def _get_report(self, job_id: str) -> GithubContributorsReport:
+        with self.lock:
+            if job_id in self.reports:
+                return self.reports[job_id]
+            options = self.queue.get_job(job_id)
+            if options is None:
+                return None
+            service = self._get_service(options["base_url"])
+            if len(self.reports) >= MAX_JOBS:
+                self.reports.clear()
+            self.reports[job_id] = GithubContributorsReport(
+                None,
+                options["organization"],
+                tempfile.gettempdir(),
+                engine="async",
+                concurrency=self.concurrency,
+                instrument=None,
+                github_object=service.github_object,
+                service=service,
+                stats=options["stats"],
+                line_stats=options["line_stats"],
+            )
+            return self.reports[job_id]
+
+    def run_once(self, timeout: float = POLL_TIMEOUT) -> bool:
+        """Crawl the next repository of the queue.
+
+        Args:
+            - timeout(float): Seconds to wait for a repository.
+
+        Returns:
+            bool: False if no repository was pending.
+        """
+        task = self.queue.take(timeout)
+        if task is None:
+            return False
+        message = json.loads(task)
+        report = self._get_report(message["job"])
+        if report is None:
+            # The coordinator is gone, the task is dropped.
+            self.queue.complete(task)
+            return True
+        repo = Repository(report.github_object, message["repo"])
+        self.queue.complete(task, report._crawl_repository(repo))
+        with self.lock:
+            self.completed += 1
+        return True
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                # The lease of the task expires and it's delivered again.
+                print(f"Failed to crawl a repository of the queue: {e}")
+                stopped.wait(POLL_TIMEOUT)
+
+    def run(self, stopped: threading.Event = None) -> None:
+        """Start point for this class, crawl the repositories of the queue until stopped.
+
+        Args:
+            - stopped(Event): Stop the threads when set, they run forever if None.
+        """
+        stopped = stopped or threading.Event()
+        threads = [
+            threading.Thread(target=self._run, args=(stopped,), daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        print(f"Worker started with {self.concurrency} threads on {self.queue.prefix}")
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 16
+
+
+# The function called by the workers of the pool, set once by `_init_worker`.
+_worker_func = None
+
+
+def _init_worker(func) -> None:
+    global _worker_func
+    _worker_func = func
+
+
+def _call(item):
+    return _worker_func(item)
+
+
+class PoolEngine:
+    """Call the function for every item in a multiprocessing pool.
+    Will initialize the Pool processes with the maximum number of CPUs by default.
+
+    The function is handed to every worker once when it starts, and only the items are sent
+    with the tasks. The function is the method of a report, pickling it with every task
+    would pickle the whole report, its client and its caches, once per repository. Handed
+    over at the start, the workers inherit the state the report shares with them as well.
+    """
+
+    def __init__(self, concurrency: int = None, *args, **kwargs) -> None:
+        self.concurrency = concurrency or os.cpu_count()
+
+    def _pool(self, func):
+        # The engines import their modules when they run, so only the engine in use pays
+        # for its import.
+        import multiprocessing as mp
+
+        # The method of a report shares the state of its client with the workers, like the
+        # usage of the tokens, instead of every worker counting on its own copy.
+        share = getattr(getattr(func, "__self__", None), "share", None)
+        if share is not None:
+            share(mp)
+        return mp.Pool(
+            processes=self.concurrency, initializer=_init_worker, initargs=(func,)
+        )
+
+    def map(self, func, iterable) -> list:
+        with self._pool(func) as pool:
+            return pool.map(_call, iterable)
+
+    def imap(self, func, iterable):
+        """Yield the results in the order they complete, not in the order of the items."""
+        with self._pool(func) as pool:
+            yield from pool.imap_unordered(_call, iterable)
+
+
+class AsyncEngine:
+    """Call the function for every item from an asyncio event loop.
+
+    The number of calls in flight is bounded by `concurrency`, independently of the number
+    of CPUs. The calls are blocking network I/O, so they run in a thread executor of the same
+    size and share the connection pool of the client instead of being pickled into processes.
+    """
+
+    def __init__(self, concurrency: int = None, *args, **kwargs) -> None:
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+
+    async def _map(self, func, iterable) -> list:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            async def call(item):
+                async with semaphore:
+                    return await loop.run_in_executor(executor, func, item)
+
+            return await asyncio.gather(*(call(item) for item in iterable))
+
+    def map(self, func, iterable) -> list:
+        import asyncio
+
+        return asyncio.run(self._map(func, iterable))
+
+    async def _imap(self, func, iterable, results: queue.Queue) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        items = iter(iterable)
+        done = object()
+
+        # One more thread to take the items, the iterable may block on network I/O too.
+        with ThreadPoolExecutor(max_workers=self.concurrency + 1) as executor:
+
+            async def call(item):
+                try:
+                    result = await loop.run_in_executor(executor, func, item)
+                finally:
+                    semaphore.release()
+                # Hand over every result as soon as it completes.
+                results.put((result, None))
+
+            calls = []
+            while True:
+                # The items are taken as they are produced, so the first calls start
+                # before the iterable is exhausted.
+                await semaphore.acquire()
+                item = await loop.run_in_executor(executor, next, items, done)
+                if item is done:
+                    semaphore.release()
+                    break
+                calls.append(asyncio.ensure_future(call(item)))
+            await asyncio.gather(*calls)
+
+    def imap(self, func, iterable):
+        """Yield the results in the order they complete, not in the order of the items.
+
+        The event loop runs in another thread and hands over the results through a queue,
+        so they are consumed while the other items are still in flight. The items are taken
+        from the iterable as they are produced as well.
+        """
+        import asyncio
+
+        results = queue.Queue()
+        done = object()
+
+        def run():
+            try:
+                asyncio.run(self._imap(func, iterable, results))
+            except BaseException as error:
+                results.put((None, error))
+            finally:
+                results.put((done, None))
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            result, error = results.get()
+            if error is not None:
+                raise error
+            if result is done:
+                return
+            yield result
+
+
+class DistributedEngine:
+    """Hand every item over to the workers of a work queue in Redis, `report.py --worker`
+    processes on any host, and yield their results as they complete.
+
+    The function isn't sent to the workers, it's the method of a report that crawls a
+    repository, and the workers call it on the same report built from the options of
+    `job_options()`. Only the repositories of the REST API can be handed over. The
+    concurrency is only the concurrency of the listing in this process.
+    """
+
+    def __init__(self, concurrency: int = None, *args, **kwargs) -> None:
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+
+    def map(self, func, iterable) -> list:
+        """Return the results in the order they complete, not in the order of the items."""
+        return list(self.imap(func, iterable))
+
+    def imap(self, func, iterable):
+        """Yield the results in the order they complete, not in the order of the items."""
+        from report import conf
+        from report.distributed import WorkQueue
+
+        work_queue = WorkQueue(conf.get_redis())
+        job_id = work_queue.create_job(func.__self__.job_options())
+        try:
+            yield from work_queue.imap(job_id, (item.raw_data for item in iterable))
+        finally:
+            work_queue.delete_job(job_id)
+
+
+ENGINES = {
+    "pool": PoolEngine,
+    "async": AsyncEngine,
+    "distributed": DistributedEngine,
+}
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+
+# The values of the `type` parameter of the listing of the repositories of an organization.
+# https://docs.github.com/en/rest/repos/repos#list-organization-repositories
+REPOSITORY_TYPES = ("all", "public", "private", "forks", "sources", "member")
+VISIBILITIES = ("public", "private", "internal")
+
+
+def parse_datetime(value: str) -> datetime:
+    """Parse a date or a datetime of Github, e.g. `2021-07-01` or `2021-07-01T00:00:00Z`,
+    into an aware datetime, in UTC when it has no timezone.
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class RepositoryFilter:
+    """Select the repositories of an organization from the metadata of the listing, so the
+    repositories left out never cost a request.
+
+    The filters that Github supports are pushed into the listing itself, the `type` of
+    the REST API and `isFork` and `privacy` of the GraphQL API, and all filters are applied
+    to the metadata of every repository of the listing as well.
+
+    Args:
+        - include(list): Glob patterns of the names of the repositories to keep, all of
+            them if empty.
+        - exclude(list): Glob patterns of the names of the repositories to leave out.
+        - skip_forks(bool): Leave out the forks.
+        - skip_archived(bool): Leave out the archived repositories.
+        - skip_empty(bool): Leave out the empty repositories, their size is 0.
+        - pushed_since(str): Leave out the repositories not pushed to since the date.
+        - topics(list): Keep the repositories with any of the topics, all of them if empty.
+        - visibility(str): Keep the `public`, `private` or `internal` repositories only.
+        - type(str): The `type` of the listing of the REST API, chosen from the other
+            filters if None.
+    """
+
+    def __init__(
+        self,
+        include: list = None,
+        exclude: list = None,
+        skip_forks: bool = False,
+        skip_archived: bool = False,
+        skip_empty: bool = False,
+        pushed_since: str = None,
+        topics: list = None,
+        visibility: str = None,
+        type: str = None,
+        *args,
+        **kwargs,
+    ) -> None:
+        if visibility is not None and visibility not in VISIBILITIES:
+            raise ValueError(f"Unknown visibility: {visibility}")
+        if type is not None and type not in REPOSITORY_TYPES:
+            raise ValueError(f"Unknown type of repositories: {type}")
+        # The names of the repositories are case insensitive.
+        self.include = [pattern.lower() for pattern in include or []]
+        self.exclude = [pattern.lower() for pattern in exclude or []]
+        self.skip_forks = skip_forks
+        self.skip_archived = skip_archived
+        self.skip_empty = skip_empty
+        self.pushed_since = parse_datetime(pushed_since) if pushed_since else None
+        self.topics = set(topics or [])
+        self.visibility = visibility
+        self.type = type
+
+    def params(self) -> dict:
+        """Return the parameters of the listing of the REST API, only one `type` can be
+        asked for, the other filters are applied to the listing.
+        """
+        if self.type:
+            return {"type": self.type}
+        if self.skip_forks:
+            return {"type": "sources"}
+        if self.visibility in ("public", "private"):
+            return {"type": self.visibility}
+        return dict()
+
+    def variables(self) -> dict:
+        """Return the arguments of the repositories of the GraphQL API."""
+        variables = dict()
+        if self.skip_forks:
+            variables["isFork"] = False
+        if self.visibility in ("public", "private"):
+            variables["privacy"] = self.visibility.upper()
+        return variables
+
+    def match(self, repo) -> bool:
+        """Check if a repository is kept, from the metadata of the listing.
+
+        Args:
+            - repo(obj): Instance of Repository or GraphQLRepository.
+
+        Returns:
+            bool: True if the repository is kept.
+        """
+        name = repo.name.lower()
+        if self.include and not any(
+            fnmatchcase(name, pattern) for pattern in self.include
+        ):
+            return False
+        if any(fnmatchcase(name, pattern) for pattern in self.exclude):
+            return False
+        if self.skip_forks and repo.fork:
+            return False
+        if self.skip_archived and repo.archived:
+            return False
+        if self.skip_empty and not repo.size:
+            return False
+        if self.pushed_since and (
+            not repo.pushed_at or parse_datetime(repo.pushed_at) < self.pushed_since
+        ):
+            return False
+        if self.topics and not self.topics.intersection(repo.topics):
+            return False
+        if self.visibility and repo.visibility != self.visibility:
+            return False
+        return True
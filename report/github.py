@@ -1,20 +1,164 @@
-import csv
-import multiprocessing as mp
+import heapq
+import itertools
+import json
 import os
+import time
+from collections import Counter, deque
 from datetime import datetime
 
-from github import Github
-from report.services import GithubService
+from report import exceptions
+from report.aggregation import Aggregation
+from report.checkpoint import CheckpointJournal
+from report.client import DEFAULT_BASE_URL, DEFAULT_TIMEOUT, GithubClient
+from report.deferred import DeferredQueue
+from report.engines import ENGINES
+from report.filters import RepositoryFilter
+from report.metrics import metrics
+from report.ratelimit import RateLimitGovernor
+from report.retry import DEFAULT_RETRIES, print_retries
+from report.services import SERVICES
+from report.stats import ContributionStats
+from report.writers import WRITERS
+
+# Number of repositories to cache their snapshots in one round trip.
+SNAPSHOTS_BATCH_SIZE = 100
+# Seconds before retrying a repository whose statistics are computed by Github, doubled
+# on every retry, and the seconds after its first retry a repository is left incomplete.
+STATS_RETRY_DELAY = 2
+STATS_RETRY_MAX_DELAY = 60
+STATS_DEADLINE = 300
+# The columns of the report and their types, lists stay lists in the columnar formats.
+REPORT_COLUMNS = [
+    ("Login", str),
+    ("Name", str),
+    ("Email", str),
+    ("Repositories", list),
+    ("Languages", list),
+]
+LONG_REPORT_COLUMNS = [
+    ("Repository", str),
+    ("Login", str),
+    ("Name", str),
+    ("Email", str),
+    ("Languages", list),
+]
+STATS_REPORT_COLUMNS = [
+    ("Rank", int),
+    ("Login", str),
+    ("Name", str),
+    ("Email", str),
+    ("Commits", int),
+    ("Repositories", int),
+    ("Languages", list),
+]
+LINE_STATS_COLUMNS = [
+    ("Additions", int),
+    ("Deletions", int),
+]
 
 
 class GithubContributorsReport:
     def __init__(
-        self, auth_key: str, organization: str, report_path: str, *args, **kwargs
+        self,
+        auth_key,
+        organization: str,
+        report_path: str,
+        engine: str = "pool",
+        concurrency: int = None,
+        api: str = "rest",
+        incremental: bool = True,
+        wait: bool = True,
+        long_format: bool = False,
+        resume: bool = False,
+        output_format: str = "csv",
+        compression: str = None,
+        instrument: bool = True,
+        profile: bool = False,
+        base_url: str = DEFAULT_BASE_URL,
+        github_object: GithubClient = None,
+        service=None,
+        stats: bool = False,
+        line_stats: bool = False,
+        top: int = None,
+        stats_deadline: float = STATS_DEADLINE,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        hedge_percentile: float = None,
+        repo_filter: RepositoryFilter = None,
+        *args,
+        **kwargs,
     ) -> None:
-        self.github_object = Github(auth_key)
+        if engine == "distributed" and api != "rest":
+            raise ValueError(
+                "The distributed engine is only available with the rest api"
+            )
+        # The commits of the graphql api are only the latest of the default branch, and it
+        # has no statistics of the contributors.
+        if (stats or line_stats) and api != "rest":
+            raise ValueError("The stats are only available with the rest api")
+        self.engine = ENGINES[engine](concurrency)
+        # The client and the service are shared by the reports of a batch.
+        self.github_object = github_object or GithubClient(
+            auth_key,
+            base_url=base_url,
+            pool_size=self.engine.concurrency,
+            timeout=timeout,
+            governor=RateLimitGovernor(wait=wait),
+            retries=retries,
+            hedge_percentile=hedge_percentile,
+        )
         self.organization = organization
+        # The repositories left out of the listing before any of their requests.
+        self.repo_filter = repo_filter
         self.report_path = report_path
-        self.service = GithubService(self.github_object)
+        self.incremental = incremental
+        self.long_format = long_format
+        self.resume = resume
+        self.profile = profile
+        self.output_format = output_format
+        self.compression = compression
+        # The additions and deletions are only written with the other stats.
+        self.stats = stats or line_stats
+        self.line_stats = line_stats
+        self.top = top
+        self.stats_deadline = stats_deadline
+        self.stats_retry_delay = STATS_RETRY_DELAY
+        # Number of stale repositories kept back to be fetched largest first, as many as
+        # the engine runs at once so it is never left waiting on the rest of the listing.
+        self.schedule_window = self.engine.concurrency
+        # The metrics of a batch are enabled once for all of its reports.
+        if instrument is not None:
+            metrics.enable(instrument)
+        self.journal = CheckpointJournal(
+            os.path.join(report_path, f"checkpoint_{organization}.jsonl")
+        )
+        # The repositories that failed in the last run, with their errors.
+        self.failures = []
+        # The repositories whose statistics were still computed by Github at the deadline.
+        self.incomplete = []
+        self.service = service or SERVICES[api](
+            self.github_object, concurrency=self.engine.concurrency
+        )
+
+    def job_options(self) -> dict:
+        """Return the options to build the same report in the workers of the distributed
+        engine.
+
+        Returns:
+            dict: of the options of the report.
+        """
+        return {
+            "organization": self.organization,
+            "base_url": self.github_object.base_url,
+            "stats": self.stats,
+            "line_stats": self.line_stats,
+        }
+
+    def share(self, context) -> None:
+        """Share the usage of the client with the workers of the pool engine, called by
+        the engine before it starts the pool.
+        """
+        self.github_object.share(context)
 
     def _get_repo_contributors_and_languages(self, repo) -> dict:
         """Get the contributors and languages for the repo
@@ -26,57 +170,289 @@ class GithubContributorsReport:
             dict: with all contributors and languages
         """
         print(f"start getting contributors and languages for {repo.name}")
-        languages = self.service.get_languages(repo)
-        contributors = self.service.get_contributors(repo)
-        return {
+        languages = self.service.get_languages(repo, sizes=self.stats)
+        # The users are resolved once for the whole report in `_resolve_users`.
+        contributors = self.service.get_contributors(repo, resolve=False)
+        result = {
+            "id": repo.id,
             "users": contributors,
             "repo": repo.name,
-            "languages": languages,
+            "languages": list(languages),
         }
+        if self.stats:
+            result["language_bytes"] = list(languages.values())
+        if self.line_stats:
+            result["lines"] = self.service.get_contributor_stats(repo)
+        # Repositories fetched without conditional requests are always refetched.
+        result["unchanged"] = not getattr(repo, "modified", True)
+        return result
 
-    def _aggregate_repositories_to_user(self, data: dict) -> dict:
-        """Group the repositories to the user, so each user will has a list of repositories.
+    def _is_complete(self, result: dict) -> bool:
+        """Check if the result of a previous run has everything the report needs, the
+        results of a run without stats are fetched again for the stats.
 
         Args:
-            - data (dict): Dict contains repositories with its contributors and languages.
+            - result (dict): The result of a repository from the checkpoint or a snapshot.
 
         Returns:
-            dict: for contributors with its repositories and languages
+            bool: True if the result can be used instead of fetching the repository.
         """
-        results = dict()
-        for result in data:
-            # result will be a list of users and repo object and repo's languages.
-            for user in result["users"]:
-                # check if we get this user on any repo before or not
-                # if found, we will append this repo to his list
-                if user["id"] in results:
-                    results[user["id"]]["repos"].append(result["repo"])
-                # if not found, will add the first repo for this user
-                else:
-                    results[user["id"]] = {
-                        "user": user,
-                        "repos": [result["repo"]],
-                        "languages": result["languages"],
-                    }
+        if self.stats and "language_bytes" not in result:
+            return False
+        return not self.line_stats or result.get("lines") is not None
+
+    def _resolve_users(self, results: dict) -> dict:
+        """Replace the users of the aggregated results with their full info, so the
+        distinct users of all repositories are fetched only once.
+
+        Args:
+            - results (dict): for contributors with its repositories and languages.
+
+        Returns:
+            dict: for contributors with their full info, repositories and languages.
+        """
+        users = self.service.get_users(data["user"] for data in results.values())
+        for user_id, data in results.items():
+            data["user"] = users[user_id]
         return results
 
+    def _aggregate_repositories_to_user(self, data) -> dict:
+        """Group the repositories to the user, so each user will has a list of repositories
+        and the languages of all of them. The repositories are consumed one by one, so they
+        don't need to be kept in memory.
+
+        Args:
+            - data (iterable): Repositories with its contributors and languages.
+
+        Returns:
+            dict: for contributors with its repositories and languages
+        """
+        return Aggregation().extend(data).to_dict()
+
+    def _crawl_repository(self, repo) -> dict:
+        """Get the contributors and languages for the repo, a failure is returned with its
+        error instead of stopping the whole report.
+
+        Args:
+            - repo (Repository[obj]): Github Repository object
+
+        Returns:
+            dict: with all contributors and languages, or with the error of the repo.
+        """
+        # The metrics inherited by a forked worker are dropped before it starts.
+        in_worker = metrics.enabled and metrics.in_worker()
+        if hasattr(repo, "attach"):
+            # The repositories are received by the workers of the pool without client.
+            repo.attach(self.github_object)
+        start = time.perf_counter()
+        try:
+            result = self._get_repo_contributors_and_languages(repo)
+        except exceptions.BaseException as e:
+            print(f"Failed to get contributors and languages for {repo.name}: {e}")
+            metrics.count("repository.failures")
+            result = {
+                "id": repo.id,
+                "repo": repo.name,
+                "error": str(e),
+                "status_code": e.status_code,
+            }
+        if metrics.enabled:
+            metrics.observe_repository(repo.name, time.perf_counter() - start)
+            if in_worker:
+                # The workers of the pool hand over their metrics with the results.
+                result["metrics"] = metrics.drain()
+        return result
+
+    def _iter_stale_repositories(self, checkpoint: dict, ready: deque, stats: Counter):
+        """Yield the repositories to be fetched as the pages of the listing land, the
+        largest first. Once a page is queued, the largest of the stale repositories listed
+        are yielded until only `schedule_window` of them are waiting, the others once the
+        listing is complete. The results of the other repositories are put in `ready`,
+        either from the checkpoint or from their snapshots.
+
+        Args:
+            - checkpoint (dict): of the repository id and its result of the previous run.
+            - ready (deque): Results of the repositories that don't need to be fetched.
+            - stats (Counter): Number of filtered, resumed, snapshot and stale
+                repositories.
+
+        Return:
+            generator: of the repositories to be fetched.
+        """
+        # The stale repositories waiting to be fetched, the largest on top.
+        waiting, counter = [], itertools.count()
+        for repos in self.service.iter_repositories(
+            self.organization, self.repo_filter
+        ):
+            if self.repo_filter is not None:
+                listed = len(repos)
+                repos = [repo for repo in repos if self.repo_filter.match(repo)]
+                stats.update(filtered=listed - len(repos))
+            resumed = [
+                repo
+                for repo in repos
+                if repo.id in checkpoint and self._is_complete(checkpoint[repo.id])
+            ]
+            ready.extend(checkpoint[repo.id] for repo in resumed)
+            resumed_ids = {repo.id for repo in resumed}
+            repos = [repo for repo in repos if repo.id not in resumed_ids]
+            # Only the repositories pushed to since the last run are fetched again.
+            snapshots = (
+                self.service.get_snapshots(repos) if self.incremental else dict()
+            )
+            snapshots = {
+                repo_id: snapshot
+                for repo_id, snapshot in snapshots.items()
+                if self._is_complete(snapshot)
+            }
+            ready.extend(snapshots.values())
+            stale_repos = [repo for repo in repos if repo.id not in snapshots]
+            self.service.prefetch_languages(stale_repos)
+            stats.update(
+                resumed=len(resumed), snapshots=len(snapshots), stale=len(stale_repos)
+            )
+            # The largest repositories are the long poles of the report, so they start first.
+            for repo in stale_repos:
+                size = getattr(repo, "size", 0) or 0
+                heapq.heappush(waiting, (-size, next(counter), repo))
+            while len(waiting) > self.schedule_window:
+                yield heapq.heappop(waiting)[2]
+        while waiting:
+            yield heapq.heappop(waiting)[2]
+
+    def _iter_repositories(self):
+        """Call all Github services for every repository through the selected engine,
+        either a multiprocessing pool or an asyncio event loop, and yield the results of
+        every repository as soon as it completes. The repositories that were not pushed
+        to since the last run are taken from their snapshots.
+
+        The repositories are handed to the engine as soon as every page of the listing
+        lands, so the listing and the fetching of the repositories overlap.
+
+        Every finished repository is recorded in the checkpoint journal, when the report
+        is resumed the repositories already recorded are taken from it and only the missing
+        or failed ones are fetched again.
+
+        Return:
+            generator: of the repositories with its contributors and languages
+        """
+        checkpoint = self.journal.load()[0] if self.resume else dict()
+        # The results taken from the checkpoint and the snapshots while listing.
+        ready, stats = deque(), Counter()
+        self.failures, self.incomplete = [], []
+        # The repositories handed to the engine until their result comes back.
+        stale_repos = dict()
+        # Github replies with 202 while it computes the statistics of a repository, so
+        # the repository is parked and retried later instead of holding a worker.
+        deferred = DeferredQueue(
+            self.stats_retry_delay, STATS_RETRY_MAX_DELAY, self.stats_deadline
+        )
+
+        def iter_stale_repositories():
+            for repo in self._iter_stale_repositories(checkpoint, ready, stats):
+                stale_repos[repo.id] = repo
+                deferred.start()
+                yield repo
+            # The parked repositories are retried when they are due, until none is left.
+            for repo in deferred:
+                stale_repos[repo.id] = repo
+                yield repo
+
+        with self.journal.open(resume=self.resume) as journal:
+
+            def iter_ready():
+                while ready:
+                    result = ready.popleft()
+                    journal.record(result)
+                    yield result
+
+            fetched, unchanged = [], 0
+            for result in self.engine.imap(
+                self._crawl_repository, iter_stale_repositories()
+            ):
+                if "metrics" in result:
+                    metrics.merge(result.pop("metrics"))
+                computing = (
+                    self.line_stats
+                    and "error" not in result
+                    and result.get("lines") is None
+                )
+                repo = stale_repos.pop(result["id"])
+                parked = computing and deferred.park(result["id"], repo)
+                # Parked before it's finished, so the retries don't stop in between.
+                deferred.finish()
+                if parked:
+                    metrics.count("stats.deferred")
+                    continue
+                if computing:
+                    self.incomplete.append(result["repo"])
+                yield from iter_ready()
+                if "error" in result:
+                    journal.record_failure(result)
+                    self.failures.append(result)
+                    continue
+                journal.record(result)
+                unchanged += result["unchanged"]
+                fetched.append((repo, result))
+                if len(fetched) == SNAPSHOTS_BATCH_SIZE:
+                    self._set_snapshots(fetched)
+                    fetched = []
+                yield result
+            yield from iter_ready()
+            self._set_snapshots(fetched)
+
+        if stats["filtered"]:
+            print(f"{stats['filtered']} repositories were filtered out.")
+            metrics.count("repository.filtered", stats["filtered"])
+        if stats["resumed"]:
+            print(f"{stats['resumed']} repositories were resumed from the checkpoint.")
+        unchanged += stats["snapshots"]
+        refetched = stats["snapshots"] + stats["stale"] - unchanged - len(self.failures)
+        print(
+            f"{unchanged} repositories were unchanged and {refetched} were refetched."
+        )
+        if self.failures:
+            print(
+                f"{len(self.failures)} repositories failed, run the report again with --resume to fetch them: "
+                + ", ".join(failure["repo"] for failure in self.failures)
+            )
+        if self.incomplete:
+            print(
+                f"{len(self.incomplete)} repositories are incomplete, Github was still computing their statistics: "
+                + ", ".join(self.incomplete)
+            )
+
+    def _set_snapshots(self, fetched: list) -> None:
+        # The repositories are cached with their results.
+        self.service.set_snapshots(
+            [repo for repo, _ in fetched], [result for _, result in fetched]
+        )
+
     def _run(self):
-        """Call all Github services in multiprocessing pool of requests.
-        Will initialize the Pool processes with the maximum number of CPUs.
+        """Aggregate the repositories to their users as they complete, then resolve the
+        users once for the whole report.
 
         Return:
             dict: for contributors with its repositories and languages
         """
-        organization_parser = self.service.get_organization(self.organization)
-        pool = mp.Pool(processes=mp.cpu_count())
-        results = pool.map(
-            self._get_repo_contributors_and_languages, organization_parser["repos"]
-        )
-        return self._aggregate_repositories_to_user(results)
+        results = self._aggregate_repositories_to_user(self._iter_repositories())
+        return self._resolve_users(results)
+
+    def _run_stats(self):
+        """Aggregate the contributions of the repositories to their users into columns as
+        they complete, then resolve the users of the ranking once.
+
+        Return:
+            dict: for contributors with its rank, totals and shares of the languages, in
+                the order of the ranking.
+        """
+        stats = ContributionStats().extend(self._iter_repositories())
+        return self._resolve_users(stats.to_dict(top=self.top))
 
     @property
     def filename(self):
-        """Generate the report filename in the directory.
+        """Generate the report filename in the directory, without the extension of the
+        format which is added by the writer.
         The directory will be created if it's not exists.
 
         Return:
@@ -86,36 +462,148 @@ class GithubContributorsReport:
         if not os.path.exists(self.report_path):
             os.makedirs(self.report_path)
         time_now = datetime.now().strftime("%m_%d_%Y_%H_%M")
-        filename = f"{self.report_path}/report_{time_now}.csv"
-        return os.path.join(self.report_path, filename)
+        return os.path.join(self.report_path, f"report_{time_now}")
+
+    def _get_writer(self, columns: list, filename: str = None):
+        return WRITERS[self.output_format](
+            filename or self.filename, columns, compression=self.compression
+        )
 
-    def _write_csv(self, results: dict) -> None:
-        """Write the results into a CSV file.
+    def _write_report(self, results: dict, filename: str = None) -> None:
+        """Write the results into a file of the selected format.
 
         Args:
             results (dict): dict for contributors with its repositories and languages
+            filename (str): The path of the file without extension, generated if None.
         """
-        with open(self.filename, mode="w+") as report_file:
-            employee_writer = csv.writer(report_file)
-            employee_writer.writerow(
-                ["Login", "Name", "Email", "Repositories", "Languages"]
-            )
+        with self._get_writer(REPORT_COLUMNS, filename) as writer:
             for data in results.values():
                 user_dict = data["user"]
-                employee_writer.writerow(
+                writer.write(
                     [
                         user_dict["login"],
                         user_dict["name"],
                         user_dict["email"],
-                        ", ".join(data["repos"]),
-                        ", ".join(data["languages"]),
+                        data["repos"],
+                        data["languages"],
                     ]
                 )
-            print(f"Created CSV file successfully: {self.filename}")
+        print(f"Created {self.output_format} file successfully: {writer.path}")
+
+    def _write_long_report(self, data, filename: str = None) -> None:
+        """Write a row for every contributor of every repository into a file of the
+        selected format, as soon as the repository completes, so the memory doesn't grow
+        with the organization.
+
+        Args:
+            data (iterable): Repositories with its contributors and languages.
+            filename (str): The path of the file without extension, generated if None.
+        """
+        with self._get_writer(LONG_REPORT_COLUMNS, filename) as writer:
+            for result in data:
+                # The users already resolved are taken from the cache.
+                users = self.service.get_users(result["users"])
+                for user in result["users"]:
+                    user_dict = users[user["id"]]
+                    writer.write(
+                        [
+                            result["repo"],
+                            user_dict["login"],
+                            user_dict["name"],
+                            user_dict["email"],
+                            result["languages"],
+                        ]
+                    )
+        print(f"Created {self.output_format} file successfully: {writer.path}")
+
+    def _write_stats_report(self, results: dict, filename: str = None) -> None:
+        """Write the stats of the contributors into a file of the selected format, in the
+        order of the ranking.
+
+        Args:
+            results (dict): for contributors with its rank, totals and shares of languages.
+            filename (str): The path of the file without extension, generated if None.
+        """
+        columns = STATS_REPORT_COLUMNS
+        if self.line_stats:
+            columns = columns[:-1] + LINE_STATS_COLUMNS + columns[-1:]
+        with self._get_writer(columns, filename) as writer:
+            for data in results.values():
+                user_dict = data["user"]
+                row = [
+                    data["rank"],
+                    user_dict["login"],
+                    user_dict["name"],
+                    user_dict["email"],
+                    data["commits"],
+                    data["repositories"],
+                ]
+                if self.line_stats:
+                    row += [data["additions"], data["deletions"]]
+                row.append(
+                    [f"{language} {share:.1%}" for language, share in data["languages"]]
+                )
+                writer.write(row)
+        print(f"Created {self.output_format} file successfully: {writer.path}")
+
+    def _write_profile(self, filename: str, seconds: float, profiler=None) -> None:
+        """Write the metrics of the run into a JSON file next to the CSV, and the stats of
+        cProfile if the run was profiled.
+
+        Args:
+            filename (str): The path of the report without extension.
+            seconds (float): The wall time of the run.
+            profiler (cProfile.Profile): The profiler of the run.
+        """
+        base = filename
+        if metrics.enabled:
+            profile = {
+                "organization": self.organization,
+                "engine": type(self.engine).__name__,
+                "concurrency": self.engine.concurrency,
+                "service": type(self.service).__name__,
+                "wall_time": round(seconds, 6),
+                "failures": [failure["repo"] for failure in self.failures],
+                "incomplete": self.incomplete,
+                "tokens": self.github_object.tokens.to_dict(),
+                **metrics.to_dict(),
+            }
+            with open(f"{base}.profile.json", mode="w") as profile_file:
+                json.dump(profile, profile_file, indent=2, sort_keys=True)
+            print(f"Created profile file successfully: {base}.profile.json")
+        if profiler is not None:
+            import pstats
+
+            profiler.dump_stats(f"{base}.prof")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+            print(f"Created cProfile stats successfully: {base}.prof")
 
     def generate_report(self) -> None:
         """Start point for this class, will call all services and write
         the results into a CSV.
         """
-        csv_data = self._run()
-        self._write_csv(csv_data)
+        filename = self.filename
+        # Only the main thread is profiled, the requests of the async engine run in
+        # threads and the pool engine in processes.
+        profiler = None
+        if self.profile:
+            import cProfile
+
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            if self.stats:
+                self._write_stats_report(self._run_stats(), filename)
+            elif self.long_format:
+                self._write_long_report(self._iter_repositories(), filename)
+            else:
+                csv_data = self._run()
+                self._write_report(csv_data, filename)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        self._write_profile(filename, time.perf_counter() - start, profiler)
+        self.github_object.tokens.print_usage()
+        print_retries(self.github_object.retry_policy, self.github_object.hedger)
@@ -0,0 +1,199 @@
+import threading
+from collections import Counter, defaultdict
+
+
+class ContributorsIndex:
+    """Keep the contributors of the repositories of an organization indexed in memory, by
+    user, by language and by repository, so the queries of the daemon are answered without
+    scanning the organization and a repository is updated without the others.
+
+    The repositories are kept by id, so a renamed repository keeps its contributors, and the
+    users and the languages are looked up case insensitively like Github does. The index is
+    shared by the threads of the daemon, so every method holds its lock.
+    """
+
+    def __init__(self) -> None:
+        # The results of the repositories, without the data of their users, by id.
+        self.repos = dict()
+        # The ids of the repositories by their name.
+        self.names = dict()
+        # The full info of the users by id, and their ids by login.
+        self.users = dict()
+        self.logins = dict()
+        # The ids of the repositories of every user.
+        self.user_repos = defaultdict(set)
+        # The number of repositories in the language of every user, by language, and the
+        # name of every language like Github spells it.
+        self.language_users = defaultdict(Counter)
+        self.languages = dict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.repos)
+
+    def __contains__(self, repo_id) -> bool:
+        return repo_id in self.repos
+
+    def add(self, result: dict, users: dict) -> None:
+        """Add a repository, or replace it with its new contributors and languages.
+
+        Args:
+            - result(dict): The repository with its contributors and languages.
+            - users(dict): of the user id and the full info of the user, for every
+                contributor of the repository.
+        """
+        with self._lock:
+            self.remove(result["id"])
+            user_ids = [user["id"] for user in result["users"]]
+            self.repos[result["id"]] = {
+                "repo": result["repo"],
+                "users": user_ids,
+                "languages": list(result["languages"]),
+            }
+            self.names[result["repo"].lower()] = result["id"]
+            for user_id in user_ids:
+                user = users[user_id]
+                previous = self.users.get(user_id)
+                if previous is not None:
+                    # The users can change their login.
+                    self.logins.pop(previous["login"].lower(), None)
+                self.users[user_id] = user
+                self.logins[user["login"].lower()] = user_id
+                self.user_repos[user_id].add(result["id"])
+            for language in result["languages"]:
+                self.languages[language.lower()] = language
+                self.language_users[language.lower()].update(user_ids)
+
+    def remove(self, repo_id: int) -> bool:
+        """Remove a repository, and the users and the languages left without repository.
+
+        Args:
+            - repo_id(int): The id of the repository.
+
+        Returns:
+            bool: False if the repository was not indexed.
+        """
+        with self._lock:
+            repo = self.repos.pop(repo_id, None)
+            if repo is None:
+                return False
+            del self.names[repo["repo"].lower()]
+            for language in repo["languages"]:
+                users = self.language_users[language.lower()]
+                users.subtract(repo["users"])
+                # Counter keeps the keys whose count dropped to 0.
+                for user_id in repo["users"]:
+                    if users[user_id] <= 0:
+                        del users[user_id]
+                if not users:
+                    del self.language_users[language.lower()]
+                    del self.languages[language.lower()]
+            for user_id in repo["users"]:
+                self.user_repos[user_id].discard(repo_id)
+                if not self.user_repos[user_id]:
+                    del self.user_repos[user_id]
+                    user = self.users.pop(user_id)
+                    self.logins.pop(user["login"].lower(), None)
+            return True
+
+    def rename(self, repo_id: int, name: str) -> bool:
+        """Rename a repository, its contributors and languages don't change.
+
+        Returns:
+            bool: False if the repository was not indexed.
+        """
+        with self._lock:
+            repo = self.repos.get(repo_id)
+            if repo is None:
+                return False
+            del self.names[repo["repo"].lower()]
+            repo["repo"] = name
+            self.names[name.lower()] = repo_id
+            return True
+
+    def _user_entry(self, user_id: int) -> dict:
+        repos = [self.repos[repo_id] for repo_id in self.user_repos[user_id]]
+        return {
+            "user": self.users[user_id],
+            "repos": sorted(repo["repo"] for repo in repos),
+            "languages": sorted(
+                {language for repo in repos for language in repo["languages"]}
+            ),
+        }
+
+    def get_user(self, login: str) -> dict:
+        """Return a user with its repositories and the languages of all of them.
+
+        Args:
+            - login(str): The login of the user.
+
+        Returns:
+            dict: with the user, its repositories and languages, None if the user doesn't
+                contribute to any repository.
+        """
+        with self._lock:
+            user_id = self.logins.get(login.lower())
+            return None if user_id is None else self._user_entry(user_id)
+
+    def get_language(self, language: str) -> dict:
+        """Return the users of a language with their number of repositories in it, the
+        users with the most repositories first.
+
+        Args:
+            - language(str): The name of the language.
+
+        Returns:
+            dict: with the language and its users, None if no repository has the language.
+        """
+        with self._lock:
+            users = self.language_users.get(language.lower())
+            if not users:
+                return None
+            return {
+                "language": self.languages[language.lower()],
+                "users": [
+                    dict(self.users[user_id], repos=count)
+                    for user_id, count in sorted(
+                        users.items(),
+                        key=lambda item: (-item[1], self.users[item[0]]["login"]),
+                    )
+                ],
+            }
+
+    def get_repo(self, name: str) -> dict:
+        """Return a repository with its contributors and languages.
+
+        Args:
+            - name(str): The name of the repository.
+
+        Returns:
+            dict: with the repository, its users and languages, None if it's not indexed.
+        """
+        with self._lock:
+            repo_id = self.names.get(name.lower())
+            if repo_id is None:
+                return None
+            repo = self.repos[repo_id]
+            return {
+                "id": repo_id,
+                "repo": repo["repo"],
+                "users": [self.users[user_id] for user_id in repo["users"]],
+                "languages": list(repo["languages"]),
+            }
+
+    def to_dict(self) -> dict:
+        """Return the index like the results of the report, to be written by its writers.
+
+        Returns:
+            dict: for contributors with its repositories and languages.
+        """
+        with self._lock:
+            return {user_id: self._user_entry(user_id) for user_id in self.user_repos}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "repositories": len(self.repos),
+                "users": len(self.user_repos),
+                "languages": len(self.languages),
+            }
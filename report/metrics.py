@@ -0,0 +1,217 @@
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import nullcontext
+
+# Upper bounds in seconds of the buckets of the latency histograms.
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60)
+# Number of the slowest repositories kept in the profile.
+SLOWEST = 10
+
+
+class Histogram:
+    """Count the observed latencies in fixed buckets, so it doesn't grow with the run."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram") -> None:
+        self.buckets = [
+            mine + theirs for mine, theirs in zip(self.buckets, other.buckets)
+        ]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, fraction: float) -> float:
+        """Return the upper bound of the bucket of the quantile."""
+        rank, seen = fraction * self.count, 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(BUCKETS + ("inf",), self.buckets)
+                if count
+            },
+        }
+
+
+class Timer:
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Collect the counters, the gauges and the latency histograms of a report.
+
+    The metrics are disabled by default, then every call returns right away and the timers
+    are a shared no-op, so the instrumentation costs close to nothing.
+
+    The workers of the multiprocessing pool inherit the metrics of the parent when they are
+    forked, they hand over their own metrics with every result to be merged by the parent.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.owner = os.getpid()
+        self._lock = threading.Lock()
+        self._null_timer = nullcontext()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.pid = os.getpid()
+            self.counters = Counter()
+            self.histograms = dict()
+            # The first, the last and the minimum value of every gauge.
+            self.gauges = dict()
+            # Tuples of seconds and name of the slowest repositories.
+            self.slowest = []
+
+    def enable(self, enabled: bool = True) -> None:
+        """Enable the metrics from a clean state, in the current process."""
+        self.enabled = enabled
+        self.owner = os.getpid()
+        self.reset()
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            first, _, minimum = self.gauges.get(name, (value, value, value))
+            self.gauges[name] = (first, value, min(minimum, value))
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def timer(self, name: str):
+        """Return a context manager that observes the seconds spent in it.
+
+        Args:
+            - name(str): The name of the histogram.
+        """
+        if not self.enabled:
+            return self._null_timer
+        return Timer(self, name)
+
+    def observe_repository(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        self.observe("repository", seconds)
+        with self._lock:
+            heapq.heappush(self.slowest, (seconds, name))
+            if len(self.slowest) > SLOWEST:
+                heapq.heappop(self.slowest)
+
+    def in_worker(self) -> bool:
+        """Check if the metrics are collected by a forked worker, the metrics inherited from
+        the parent are dropped the first time so the worker only hands over its own.
+        """
+        pid = os.getpid()
+        if pid == self.owner:
+            return False
+        if self.pid != pid:
+            self.reset()
+        return True
+
+    def drain(self) -> dict:
+        """Return the metrics collected so far and start again from a clean state."""
+        with self._lock:
+            data = {
+                "counters": self.counters,
+                "histograms": self.histograms,
+                "gauges": self.gauges,
+                "slowest": self.slowest,
+            }
+        self.reset()
+        return data
+
+    def merge(self, data: dict) -> None:
+        """Merge the metrics drained by a worker.
+
+        Args:
+            - data(dict): The metrics returned by `drain`.
+        """
+        with self._lock:
+            self.counters.update(data["counters"])
+            for name, histogram in data["histograms"].items():
+                self.histograms.setdefault(name, Histogram()).merge(histogram)
+            for name, (first, last, minimum) in data["gauges"].items():
+                mine = self.gauges.get(name, (first, last, minimum))
+                self.gauges[name] = (mine[0], last, min(mine[2], minimum))
+            self.slowest = heapq.nlargest(SLOWEST, self.slowest + data["slowest"])
+            heapq.heapify(self.slowest)
+
+    def to_dict(self) -> dict:
+        """Return the metrics as a JSON serializable dict."""
+        with self._lock:
+            counters = dict(self.counters)
+            hits = counters.get("cache.hits", 0)
+            misses = counters.get("cache.misses", 0)
+            first, _, minimum = self.gauges.get("rate_limit.remaining", (0, 0, 0))
+            return {
+                "counters": counters,
+                "gauges": {
+                    name: {"first": first, "last": last, "min": minimum}
+                    for name, (first, last, minimum) in self.gauges.items()
+                },
+                "latency": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+                "slowest_repositories": [
+                    {"repo": name, "seconds": round(seconds, 6)}
+                    for seconds, name in sorted(self.slowest, reverse=True)
+                ],
+                "cache_hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                # The first response already took one request of the budget.
+                "rate_limit_consumed": first - minimum + 1 if first else 0,
+            }
+
+
+# The metrics of the process.
+metrics = Metrics()
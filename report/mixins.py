@@ -1,4 +1,75 @@
-from .conf import redis_conn
+import math
+import threading
+
+from .conf import get_cache
+from .metrics import metrics
+
+
+class LockMixin:
+    """Pickle an object shared by the threads of a client without its lock, locks can't be
+    pickled into the workers of the multiprocessing pool, so every copy gets a new lock.
+
+    The workers of the pool would count on their own copies, so `share` moves the lock and
+    the numeric fields of `SHARED`, of their type, into shared memory before the pool starts.
+    The workers forked after it update the same values as the parent and the other workers.
+    """
+
+    # The numeric fields kept in shared memory by `share`, and their types.
+    SHARED = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The shared lock is inherited with the shared values by the workers of the pool.
+        if "_shared" not in state:
+            del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_shared" not in state:
+            self._lock = threading.Lock()
+
+    def share(self, context) -> None:
+        """Move the lock and the shared fields into shared memory, once.
+
+        Args:
+            - context(module): `multiprocessing` or one of its contexts.
+        """
+        if "_shared" in self.__dict__:
+            return
+        names = list(self.SHARED)
+        shared = context.RawArray(
+            "d", [self._encode(self.__dict__[name]) for name in names]
+        )
+        for name in names:
+            del self.__dict__[name]
+        self.__dict__["_shared"] = shared
+        self._lock = context.Lock()
+
+    @staticmethod
+    def _encode(value) -> float:
+        # None is stored as NaN, it's never a value of the fields.
+        return math.nan if value is None else float(value)
+
+    def __getattr__(self, name):
+        # Only called for the fields moved into shared memory.
+        shared = self.__dict__.get("_shared")
+        if shared is None or name not in self.SHARED:
+            raise AttributeError(name)
+        value = shared[list(self.SHARED).index(name)]
+        return None if math.isnan(value) else self.SHARED[name](value)
+
+    def __setattr__(self, name, value) -> None:
+        shared = self.__dict__.get("_shared")
+        if shared is not None and name in self.SHARED:
+            shared[list(self.SHARED).index(name)] = self._encode(value)
+        else:
+            super().__setattr__(name, value)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add to a counter under the lock, of all the processes once it's shared."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
 
 
 class CacheMixin:
@@ -11,9 +82,32 @@ class CacheMixin:
         Return:
             - dict: with the results
         """
-        if redis_conn.hgetall(cache_key):
+        with metrics.timer("cache.get"):
+            data = get_cache().get(cache_key)
+        if data:
+            metrics.count("cache.hits")
             print(f"Get this key: {cache_key} from the cache.")
-            return redis_conn.hgetall(cache_key)
+            return data
+        metrics.count("cache.misses")
+
+    def get_many_from_cache(self, cache_keys: list) -> list:
+        """Will return the values of many cache keys in one round trip.
+
+        Args:
+            - cache_keys(list): The cache keys
+
+        Return:
+            - list: with a dict for every key, empty if the key doesn't exist.
+        """
+        if not cache_keys:
+            return []
+        with metrics.timer("cache.get_many"):
+            results = get_cache().get_many(cache_keys)
+        if metrics.enabled:
+            hits = sum(1 for result in results if result)
+            metrics.count("cache.hits", hits)
+            metrics.count("cache.misses", len(results) - hits)
+        return results
 
     def set_into_cache(self, cache_key: str, data: dict) -> None:
         """Add the data into a cach key.
@@ -23,4 +117,18 @@ class CacheMixin:
             - data(dict): The data will be cached.
         """
         print(f"Set this key: {cache_key} into a cache.")
-        redis_conn.hmset(cache_key, data)
+        with metrics.timer("cache.set"):
+            get_cache().set(cache_key, data)
+
+    def set_many_into_cache(self, data: dict) -> None:
+        """Add the data of many cache keys in one round trip.
+
+        Args:
+            - data(dict): The cache keys and the data will be cached for each one.
+        """
+        if not data:
+            return
+        for cache_key in data:
+            print(f"Set this key: {cache_key} into a cache.")
+        with metrics.timer("cache.set_many"):
+            get_cache().set_many(data)
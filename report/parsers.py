@@ -1,66 +1,204 @@
 from .constants import CONTRIBUTOR_CACHE_KEY
+from .metrics import metrics
 from .mixins import CacheMixin
 
 
-class OrganizationParser:
-    def __init__(self, organization):
-        self.organization = organization
+class ContributorParser(CacheMixin):
+    def __init__(self, contributors, resolve=True):
+        self.contributors = contributors
+        self.resolve = resolve
 
-    def _get_repos(self):
-        """Return a list of all possible repositories.
+    def _get_contributor_info(self, contributor):
+        """Get the contributor's information from Github.
 
         Args:
-            - repos(PaginatedList): PaginatedList
+            - contributor(NamedUser): NamedUser
 
         Returns:
-            list: list of all possible repositories.
+            - dict: dict with all needed contributor's information.
         """
-        return [repo for repo in self.organization.get_repos()]
-
-    def parse(self):
         return {
-            "name": self.organization.name,
-            "repos": self._get_repos(),
+            "id": contributor.id,
+            "login": contributor.login,
+            "name": contributor.name or "",
+            "email": contributor.email or "",
         }
 
+    def parse(self):
+        with metrics.timer("parser.contributors"):
+            return self._parse()
 
-class ContributorParser(CacheMixin):
-    def __init__(self, contributors):
-        self.contributors = contributors
+    def _parse(self):
+        if not self.resolve:
+            # Reading the name or the email would fetch the user, so only the fields of the
+            # listing are returned and the users are resolved later by the UserResolver.
+            return [
+                {
+                    "id": contributor.id,
+                    "login": contributor.login,
+                    # Number of commits of the contributor in the repository.
+                    "contributions": contributor.contributions,
+                }
+                for contributor in self.contributors
+            ]
+        # Try to get all contributors of the repository from the cache in one round trip,
+        # then get the missing ones from Github and cache them in one round trip too.
+        contributors = list(self.contributors)
+        cache_keys = [
+            CONTRIBUTOR_CACHE_KEY.format(id=contributor.id)
+            for contributor in contributors
+        ]
+        results, missing = [], dict()
+        for contributor, cache_key, user_info in zip(
+            contributors, cache_keys, self.get_many_from_cache(cache_keys)
+        ):
+            if not user_info:
+                user_info = self._get_contributor_info(contributor)
+                missing[cache_key] = user_info
+            results.append(user_info)
+        if missing:
+            self.set_many_into_cache(missing)
+        return results
 
-    def _get_contributor_info(self, contributor):
-        """Try to get the contributors from the cache, if it's not found in the cache, then it will get
-        the results from Github and cache them.
+
+class LanguageParser:
+    def __init__(self, languages):
+        self.languages = languages
+
+    def parse(self, sizes=False):
+        """Return the languages of the repository, the largest first.
 
         Args:
-            - contributor(NamedUser): NamedUser
+            - sizes(bool): Return the number of bytes of every language too.
 
         Returns:
-            - dict: dict with all needed contributor's information.
+            list: of the languages, or dict of the languages and their bytes.
         """
-        cache_key = CONTRIBUTOR_CACHE_KEY.format(id=contributor.id)
-        if self.get_from_cache(cache_key):
-            return self.get_from_cache(cache_key)
-        else:
-            user_info = {
-                "id": contributor.id,
-                "login": contributor.login,
-                "name": contributor.name or "",
-                "email": contributor.email or "",
-            }
-            self.set_into_cache(cache_key, user_info)
-            return user_info
+        if sizes:
+            # Values in the cache are strings.
+            return {lang: int(size) for lang, size in self.languages.items()}
+        return [lang for lang in self.languages]
+
+
+class ContributorStatsParser:
+    def __init__(self, stats):
+        self.stats = stats
 
     def parse(self):
-        results = []
-        for contributor in self.contributors:
-            results.append(self._get_contributor_info(contributor))
-        return results
+        """Sum the weekly additions and deletions of every contributor.
 
+        Returns:
+            list: of lists of the user id, its additions and deletions, None if Github
+                didn't compute the statistics yet.
+        """
+        if self.stats is None:
+            return None
+        return [
+            [
+                contributor["author"]["id"],
+                sum(week["a"] for week in contributor["weeks"]),
+                sum(week["d"] for week in contributor["weeks"]),
+            ]
+            # Commits of deleted users don't have an author.
+            for contributor in self.stats
+            if contributor.get("author")
+        ]
 
-class LanguageParser:
-    def __init__(self, languages):
+
+class GraphQLRepository:
+    """Repository fetched with its languages and contributors from the GraphQL API, with
+    the metadata of the REST API to be filtered the same way.
+    """
+
+    def __init__(
+        self,
+        id,
+        name,
+        languages,
+        contributors,
+        language_bytes=None,
+        fork=False,
+        archived=False,
+        size=0,
+        pushed_at=None,
+        topics=None,
+        visibility="public",
+    ):
+        self.id = id
+        self.name = name
         self.languages = languages
+        self.contributors = contributors
+        self.language_bytes = language_bytes or dict()
+        self.fork = fork
+        self.archived = archived
+        self.size = size
+        self.pushed_at = pushed_at
+        self.topics = topics or []
+        self.visibility = visibility
+
+
+class GraphQLOrganizationParser:
+    def __init__(self, organization, nodes):
+        self.organization = organization
+        self.nodes = nodes
+
+    def _get_contributors(self, node):
+        """Return the distinct authors of the repository history with the same keys
+        of ContributorParser, their contributions are their commits in the history.
+
+        Args:
+            - node(dict): Repository node of the GraphQL response.
+
+        Returns:
+            list: list of dicts with all needed contributor's information.
+        """
+        contributors = dict()
+        branch = node.get("defaultBranchRef") or {}
+        # Empty repositories don't have a default branch.
+        history = (branch.get("target") or {}).get("history") or {"nodes": []}
+        for commit in history["nodes"]:
+            # Authors of the commits are not always linked to a Github user.
+            user = (commit.get("author") or {}).get("user")
+            if not user:
+                continue
+            if user["databaseId"] not in contributors:
+                contributors[user["databaseId"]] = {
+                    "id": user["databaseId"],
+                    "login": user["login"],
+                    "name": user["name"] or "",
+                    "email": user["email"] or "",
+                    "contributions": 0,
+                }
+            contributors[user["databaseId"]]["contributions"] += 1
+        return list(contributors.values())
+
+    def _get_repos(self):
+        return [
+            GraphQLRepository(
+                id=node["databaseId"],
+                name=node["name"],
+                languages=[lang["node"]["name"] for lang in node["languages"]["edges"]],
+                contributors=self._get_contributors(node),
+                language_bytes={
+                    lang["node"]["name"]: lang["size"]
+                    for lang in node["languages"]["edges"]
+                },
+                fork=node.get("isFork", False),
+                archived=node.get("isArchived", False),
+                size=node.get("diskUsage") or 0,
+                pushed_at=node.get("pushedAt"),
+                topics=[
+                    topic["topic"]["name"]
+                    for topic in (node.get("repositoryTopics") or {}).get("nodes", [])
+                ],
+                visibility=(node.get("visibility") or "public").lower(),
+            )
+            for node in self.nodes
+        ]
 
     def parse(self):
-        return [lang for lang in self.languages]
+        with metrics.timer("parser.graphql_organization"):
+            return {
+                "name": self.organization["name"],
+                "repos": self._get_repos(),
+            }
@@ -0,0 +1,107 @@
+# Github GraphQL API doesn't expose the contributors of a repository, so the authors of the
+# commits of the default branch are used instead. The metadata of the repositories
+# are fetched to filter them like the REST API.
+# https://docs.github.com/en/graphql/reference/objects#repository
+ORGANIZATION_REPOSITORIES_QUERY = """
+query(
+  $organization: String!
+  $first: Int!
+  $after: String
+  $history: Int!
+  $isFork: Boolean
+  $privacy: RepositoryPrivacy
+) {
+  organization(login: $organization) {
+    name
+    repositories(
+      first: $first
+      after: $after
+      isFork: $isFork
+      privacy: $privacy
+    ) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        databaseId
+        name
+        isFork
+        isArchived
+        diskUsage
+        pushedAt
+        visibility
+        repositoryTopics(first: 100) {
+          nodes {
+            topic {
+              name
+            }
+          }
+        }
+        languages(first: 100, orderBy: {field: SIZE, direction: DESC}) {
+          edges {
+            size
+            node {
+              name
+            }
+          }
+        }
+        defaultBranchRef {
+          target {
+            ... on Commit {
+              history(first: $history) {
+                pageInfo {
+                  hasNextPage
+                  endCursor
+                }
+                nodes {
+                  author {
+                    user {
+                      databaseId
+                      login
+                      name
+                      email
+                    }
+                  }
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# The commits of the default branch beyond the first page of its history, to get all the
+# authors of the repositories with a longer history.
+# https://docs.github.com/en/graphql/reference/objects#commit
+REPOSITORY_HISTORY_QUERY = """
+query($owner: String!, $name: String!, $history: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: $history, after: $after) {
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+            nodes {
+              author {
+                user {
+                  databaseId
+                  login
+                  name
+                  email
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
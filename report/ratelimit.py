@@ -0,0 +1,314 @@
+import threading
+import time
+from datetime import datetime
+
+from .mixins import LockMixin
+
+# Seconds to wait after a secondary rate limit without `Retry-After`, like Github advises.
+SECONDARY_RATE_LIMIT_BACKOFF = 60
+
+
+class RateLimitGovernor(LockMixin):
+    """Track the remaining budget of the rate limit of Github from the headers of every
+    response, instead of asking for the rate limit before every request.
+
+    The governor is shared by all the threads of a client, every request takes one unit of
+    the budget before it's sent so concurrent requests can't overshoot it. When the budget is
+    low the requests are spread until the reset time, and when it runs out or Github asks to
+    slow down with `Retry-After` (secondary rate limit) the requests wait instead of failing.
+    With the pool engine the budget is shared by the workers as well, see `share`.
+
+    Args:
+        - wait(bool): Wait until the rate limit resets, otherwise the requests fail.
+        - reserve(int): Number of requests to keep in the budget.
+        - pace_below(float): Fraction of the limit under which the requests are spread
+            evenly until the reset time.
+    """
+
+    SHARED = {
+        "limit": int,
+        "remaining": int,
+        "reset": int,
+        "blocked_until": float,
+        "next_slot": float,
+    }
+
+    def __init__(self, wait=True, reserve=0, pace_below=0.1, *args, **kwargs):
+        self.wait = wait
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.blocked_until = 0
+        # The time of the last paced request, the next one is sent one interval after.
+        self.next_slot = 0
+        self._lock = threading.Lock()
+
+    @property
+    def reset_time(self) -> str:
+        return datetime.fromtimestamp(self.reset or 0).strftime("%m-%d-%Y %H:%M:%S")
+
+    def update(self, headers) -> None:
+        """Update the budget from the headers of a response.
+
+        Args:
+            - headers(dict): The headers of the response.
+        """
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        with self._lock:
+            self.limit = int(headers["X-RateLimit-Limit"])
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+            self.reset = int(headers["X-RateLimit-Reset"])
+
+    def is_exhausted(self) -> bool:
+        now = time.time()
+        return (
+            self.remaining is not None
+            and self.remaining <= self.reserve
+            and self.reset is not None
+            and self.reset > now
+        ) or self.blocked_until > now
+
+    def _delay(self, now: float) -> tuple:
+        """Return the seconds to wait before the next request, and take one unit of the
+        budget for it if there is one.
+
+        Returns:
+            tuple: of the seconds to wait, and True if the request can be sent after them,
+                False if it has to wait for the budget.
+        """
+        with self._lock:
+            if self.blocked_until > now:
+                return self.blocked_until - now, False
+            if self.remaining is None or self.reset is None or self.reset <= now:
+                return 0, True
+            seconds = self.reset - now
+            if self.remaining <= self.reserve:
+                return seconds, False
+            self.remaining -= 1
+            if self.limit and self.remaining < self.limit * self.pace_below:
+                # The units left are spread evenly until the reset, every request takes
+                # the next slot so concurrent requests don't wake up together.
+                slot = max(now, self.next_slot)
+                self.next_slot = slot + seconds / (self.remaining - self.reserve + 1)
+                return slot - now, True
+            return 0, True
+
+    def acquire(self) -> None:
+        """Wait until the next request can be sent without exceeding the rate limit."""
+        while True:
+            delay, ready = self._delay(time.time())
+            if ready:
+                # Pacing the requests, the budget is already taken.
+                if delay:
+                    time.sleep(delay)
+                return
+            if not self.wait:
+                return
+            print(
+                f"You exceed the rate limit: {self.limit} of Github API, waiting until: {self.reset_time}"
+            )
+            time.sleep(delay)
+
+    def should_retry(self, status: int, headers, message: str = "") -> bool:
+        """Check if a rejected request hit the rate limit and should be sent again after
+        waiting for it.
+
+        Args:
+            - status(int): The status of the response.
+            - headers(dict): The headers of the response.
+            - message(str): The message of the error, to tell a secondary rate limit
+                without `Retry-After` from the other errors.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        if status not in (403, 429):
+            return False
+        self.update(headers)
+        if "Retry-After" in headers:
+            self._block(int(headers["Retry-After"]))
+            return self.wait
+        if self.remaining == 0:
+            return self.wait
+        if status == 429 or "rate limit" in message.lower():
+            self._block(SECONDARY_RATE_LIMIT_BACKOFF)
+            return self.wait
+        return False
+
+    def _block(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+
+class Token(LockMixin):
+    """A credential of a token pool, with its own budget of the rate limit and its usage.
+
+    Args:
+        - key(str): Access Token of Github account or installation token of a Github App.
+        - governor(RateLimitGovernor): The governor of the budget of the token.
+    """
+
+    SHARED = {"requests": int, "rate_limited": int, "revoked": bool}
+
+    def __init__(self, key: str, governor: RateLimitGovernor) -> None:
+        self.key = key
+        self.governor = governor
+        self.requests = 0
+        self.rate_limited = 0
+        self.revoked = False
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        # Only the end of the key, so it can be logged.
+        return f"****{self.key[-4:]}" if self.key else "anonymous"
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"token {self.key}"} if self.key else {}
+
+    def budget(self) -> float:
+        # Unknown until its first response, so every token is tried first.
+        remaining = self.governor.remaining
+        return float("inf") if remaining is None else remaining
+
+    def to_dict(self) -> dict:
+        return {
+            "token": self.name,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "revoked": self.revoked,
+            "limit": self.governor.limit,
+            "remaining": self.governor.remaining,
+            "reset": self.governor.reset_time if self.governor.reset else None,
+        }
+
+
+class TokenPool(LockMixin):
+    """Spread the requests across many tokens, every request is sent with the token with
+    the most remaining budget of the rate limit, tracked by its own governor.
+
+    When a token runs out of budget the requests fail over to the other tokens instead of
+    waiting, and only wait for the first token to reset when all of them ran out. A token
+    rejected by Github as bad credentials, revoked or expired, is removed from the pool.
+
+    Args:
+        - keys(list): Access Tokens of Github accounts or installation tokens of Github
+            Apps.
+        - governor(RateLimitGovernor): The governor of the first token, the other tokens
+            get a governor with the same settings.
+    """
+
+    def __init__(self, keys: list, governor: RateLimitGovernor = None) -> None:
+        governor = governor or RateLimitGovernor()
+        # Duplicated keys share their budget, so they are one token.
+        keys = list(dict.fromkeys(keys)) or [None]
+        self.tokens = [Token(keys[0], governor)] + [
+            Token(
+                key,
+                RateLimitGovernor(governor.wait, governor.reserve, governor.pace_below),
+            )
+            for key in keys[1:]
+        ]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def share(self, context) -> None:
+        """Share the usage and the budgets of the tokens with the workers of a
+        multiprocessing pool, so they are counted, spent and revoked once for all of them.
+        """
+        super().share(context)
+        for token in self.tokens:
+            token.share(context)
+            token.governor.share(context)
+
+    def _valid_tokens(self) -> list:
+        # The revoked tokens are only used again when no other token is left, so the
+        # requests fail with the error of Github.
+        return [token for token in self.tokens if not token.revoked] or self.tokens
+
+    def select(self) -> Token:
+        """Return the token with the most remaining budget, the token that resets first if
+        all of them ran out.
+        """
+        tokens = self._valid_tokens()
+        available = [token for token in tokens if not token.governor.is_exhausted()]
+        if available:
+            # The ties go to the least used token, so the requests are spread evenly.
+            return max(available, key=lambda token: (token.budget(), -token.requests))
+        return min(
+            tokens,
+            key=lambda token: max(
+                token.governor.reset or 0, token.governor.blocked_until
+            ),
+        )
+
+    @property
+    def governor(self) -> RateLimitGovernor:
+        """The governor of the next token, it's exhausted only if all tokens are."""
+        return self.select().governor
+
+    def acquire(self) -> Token:
+        """Wait until the next request can be sent with one of the tokens.
+
+        Returns:
+            Token: The token to send the request with.
+        """
+        with self._lock:
+            token = self.select()
+            token.increment("requests")
+        token.governor.acquire()
+        return token
+
+    def should_retry(
+        self, token: Token, status: int, headers, message: str = ""
+    ) -> bool:
+        """Check if a rejected request should be sent again, with the same token after
+        waiting for its rate limit or with another token.
+
+        Args:
+            - token(Token): The token the request was sent with.
+            - status(int): The status of the response.
+            - headers(dict): The headers of the response.
+            - message(str): The message of the error.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        if status == 401 and token.key:
+            with self._lock:
+                if not token.revoked:
+                    token.revoked = True
+                    print(
+                        f"The token {token.name} was rejected by Github, it's removed"
+                    )
+                return any(not other.revoked for other in self.tokens)
+        retry = token.governor.should_retry(status, headers, message)
+        if status in (403, 429) and token.governor.is_exhausted():
+            token.increment("rate_limited")
+            # Another token with budget takes over without waiting.
+            return retry or not self.governor.is_exhausted()
+        return retry
+
+    def to_dict(self) -> list:
+        """Return the usage of every token."""
+        return [token.to_dict() for token in self.tokens]
+
+    def print_usage(self) -> None:
+        """Print the usage of every token, when there are many."""
+        if len(self.tokens) < 2:
+            return
+        for token in self.tokens:
+            usage = f"Token {token.name}: {token.requests} requests"
+            if token.governor.remaining is not None:
+                usage += f", {token.governor.remaining} of {token.governor.limit} remaining until {token.governor.reset_time}"
+            if token.rate_limited:
+                usage += f", rate limited {token.rate_limited} times"
+            if token.revoked:
+                usage += ", rejected by Github"
+            print(usage)
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+from .metrics import Histogram
+from .mixins import LockMixin
+
+DEFAULT_RETRIES = 3
+# Seconds before the first retry, doubled on every retry up to the maximum.
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8
+# The statuses of the errors of Github that are worth another attempt.
+RETRY_STATUSES = (500, 502, 503, 504)
+# Number of latencies of an endpoint observed before its requests are hedged.
+HEDGE_MIN_SAMPLES = 20
+# Maximum fraction of the requests that are hedged, so the hedges can't double the load
+# on Github and the budget of the rate limit when all responses are slow.
+HEDGE_RATIO = 0.05
+
+
+class RetryPolicy(LockMixin):
+    """Classify the failed attempts of a request and wait before the next one.
+
+    The errors of the network and the server errors of Github (5xx) are transient, so
+    the request is sent again after a backoff with full jitter, a random delay up to an
+    exponential bound, so the concurrent requests that failed together don't retry
+    together. The other errors are the answer of Github and are not retried. The retries
+    of the client are counted by reason, with or without metrics.
+
+    Args:
+        - retries(int): Maximum number of retries of a request, 0 to never retry.
+        - backoff(float): Seconds of the bound of the first retry, doubled on every retry.
+        - max_backoff(float): Maximum seconds of the bound.
+    """
+
+    # The retries by reason.
+    SHARED = {"network": int, "server": int, "rate_limit": int}
+
+    def __init__(
+        self,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        *args,
+        **kwargs,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.network = 0
+        self.server = 0
+        self.rate_limit = 0
+        self._lock = threading.Lock()
+
+    def should_retry(self, attempt: int, status: int = None) -> bool:
+        """Check if a failed attempt should be sent again.
+
+        Args:
+            - attempt(int): Number of the failed attempt, from 0.
+            - status(int): The status of the response, None for an error of the network.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        if attempt >= self.retries:
+            return False
+        return status is None or status in RETRY_STATUSES
+
+    def delay(self, attempt: int) -> float:
+        """Return the seconds to wait before the retry of a failed attempt."""
+        return random.uniform(0, min(self.backoff * 2**attempt, self.max_backoff))
+
+    def wait(self, attempt: int) -> None:
+        time.sleep(self.delay(attempt))
+
+
+class Hedger(LockMixin):
+    """Decide when to send a duplicate of a slow idempotent request, the first response
+    of both is used.
+
+    The latencies of every endpoint are observed, and a request is hedged once it takes
+    longer than the percentile of the latencies of its endpoint, so only the tail of the
+    requests is duplicated. The hedges are bounded to a fraction of the requests.
+
+    Args:
+        - percentile(float): The fraction of the latencies under which a request isn't
+            hedged, e.g. 0.95.
+        - min_samples(int): Number of latencies of an endpoint observed before hedging.
+        - ratio(float): Maximum fraction of the requests that are hedged.
+    """
+
+    SHARED = {"requests": int, "hedges": int, "won": int}
+
+    def __init__(
+        self,
+        percentile: float,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        ratio: float = HEDGE_RATIO,
+        *args,
+        **kwargs,
+    ) -> None:
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.ratio = ratio
+        self.latencies = defaultdict(Histogram)
+        self.requests = 0
+        self.hedges = 0
+        # The hedges answered before their request.
+        self.won = 0
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies[name].observe(seconds)
+
+    def delay(self, name: str) -> float:
+        """Return the seconds after which a request of an endpoint is hedged.
+
+        Args:
+            - name(str): The name of the endpoint.
+
+        Returns:
+            float: The percentile of the latencies of the endpoint, None if it has too
+                few of them.
+        """
+        with self._lock:
+            self.requests += 1
+            histogram = self.latencies.get(name)
+            if histogram is None or histogram.count < self.min_samples:
+                return None
+            return histogram.quantile(self.percentile)
+
+    def take(self) -> bool:
+        """Take a hedge from the budget of the hedges, False if it's spent."""
+        with self._lock:
+            if self.hedges >= self.requests * self.ratio:
+                return False
+            self.hedges += 1
+            return True
+
+
+def print_retries(retry_policy: RetryPolicy, hedger: Hedger = None) -> None:
+    """Print the number of retried and hedged requests of the run.
+
+    Args:
+        - retry_policy(RetryPolicy): The retry policy of the client.
+        - hedger(Hedger): The hedger of the client, None if it doesn't hedge.
+    """
+    retries = {
+        "errors of the network": retry_policy.network,
+        "server errors": retry_policy.server,
+        "the rate limit": retry_policy.rate_limit,
+    }
+    if any(retries.values()):
+        print(
+            f"{sum(retries.values())} requests were retried after "
+            + ", ".join(f"{count} {reason}" for reason, count in retries.items())
+        )
+    if hedger is not None and hedger.hedges:
+        print(
+            f"{hedger.hedges} slow requests were hedged, "
+            f"{hedger.won} hedges answered first"
+        )
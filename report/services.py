@@ -1,35 +1,47 @@
-from datetime import datetime
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 
-from report.parsers import ContributorParser, LanguageParser, OrganizationParser
+from report.parsers import (
+    ContributorParser,
+    ContributorStatsParser,
+    GraphQLOrganizationParser,
+    LanguageParser,
+)
 
-from .constants import REPO_LANGUAGES_CACHE_KEY
+from .constants import (
+    CONTRIBUTOR_CACHE_KEY,
+    REPO_LANGUAGES_CACHE_KEY,
+    REPO_SNAPSHOT_CACHE_KEY,
+)
 from .exceptions import (
     ContributorServiceException,
     LanguageServiceException,
     OrganizationServiceException,
     RateLimitException,
 )
-from .mixins import CacheMixin
+from .metrics import metrics
+from .mixins import CacheMixin, LockMixin
+from .queries import ORGANIZATION_REPOSITORIES_QUERY, REPOSITORY_HISTORY_QUERY
+
+DEFAULT_RESOLVER_CONCURRENCY = 16
 
 
 class BaseService:
     def __init__(self, github_obj, *args, **kwargs):
         self.github_obj = github_obj
 
-    def _get_rate_limit_details(self):
-        data = self.github_obj.get_rate_limit().core.raw_data
-        data["reset"] = datetime.fromtimestamp(data["reset"]).strftime(
-            "%m-%d-%Y %H:%M:%S"
-        )
-        return data
-
     def _is_limit_exceeded(self):
-        data = self._get_rate_limit_details()
-        if data["remaining"] > 0:
-            print(f"Remaining: >>>>>>>>>>> {data['remaining']}")
+        # The budget is tracked from the headers of the responses, so checking it doesn't
+        # cost a request. When the governor waits for the rate limit to reset, it's never
+        # exceeded.
+        governor = getattr(self.github_obj, "governor", None)
+        if governor is None or governor.wait or not governor.is_exhausted():
             return False
         print(
-            f"You exceed the rate limit: {data['limit']} of Github API, please try again after: {data['reset']}"
+            f"You exceed the rate limit: {governor.limit} of Github API, please try again after: {governor.reset_time}"
         )
         return True
 
@@ -44,7 +56,11 @@ class BaseService:
         try:
             return self._request()
         except Exception as e:
-            raise self.EXCEPTION(message=e.data.get("message"), status_code=e.status)
+            # Network errors don't have the data and status of a GithubException.
+            data = getattr(e, "data", None) or {"message": str(e)}
+            raise self.EXCEPTION(
+                message=data.get("message"), status_code=getattr(e, "status", "")
+            )
 
 
 class OrganizationService(BaseService):
@@ -74,19 +90,35 @@ class ContributorService(BaseService):
         return self.repo.get_contributors()
 
 
+class ContributorStatsService(BaseService):
+    EXCEPTION = ContributorServiceException
+
+    def __init__(self, github_obj, repo, *args, **kwargs):
+        super().__init__(github_obj, *args, **kwargs)
+        self.repo = repo
+
+    def _request(self):
+        # Return the weekly additions, deletions and commits of every contributor
+        # https://docs.github.com/en/rest/metrics/statistics#get-all-contributor-commit-activity
+        return self.repo.get_stats_contributors()
+
+
 class LanguageService(BaseService, CacheMixin):
     EXCEPTION = LanguageServiceException
 
-    def __init__(self, github_obj, repo, *args, **kwargs):
+    def __init__(self, github_obj, repo, cached=None, *args, **kwargs):
         super().__init__(github_obj, *args, **kwargs)
         self.repo = repo
+        # The languages already got from the cache for the whole organization.
+        self.cached = cached
 
     def _request(self):
         # Try to get the languages from the cache, if it's not found in the cache, then it will get
         # the results from Github and cache them
         cache_key = REPO_LANGUAGES_CACHE_KEY.format(id=self.repo.id)
-        if self.get_from_cache(cache_key):
-            return self.get_from_cache(cache_key)
+        cached = self.get_from_cache(cache_key) if self.cached is None else self.cached
+        if cached:
+            return cached
         else:
             # Return a dict of languages and number of lines for each language.
             languages = self.repo.get_languages()
@@ -97,42 +129,414 @@ class LanguageService(BaseService, CacheMixin):
             return languages
 
 
-class GithubService:
-    def __init__(self, github_object, *args, **kwargs):
+class UserService(BaseService):
+    EXCEPTION = ContributorServiceException
+
+    def __init__(self, github_obj, login, *args, **kwargs):
+        super().__init__(github_obj, *args, **kwargs)
+        self.login = login
+
+    def _request(self):
+        # Return NamedUser with its name and email
+        # https://pygithub.readthedocs.io/en/latest/github_objects/NamedUser.html#github.NamedUser.NamedUser
+        return self.github_obj.get_user(self.login)
+
+
+class UserResolver(LockMixin, CacheMixin):
+    """Resolve the name and email of the contributors of the whole report, so every distinct
+    user costs one batched cache lookup and at most one request, however many repositories
+    they contributed to.
+
+    Args:
+        - github_obj(GithubClient): The client of the Github API.
+        - concurrency(int): Maximum number of users fetched in parallel.
+    """
+
+    def __init__(self, github_obj, concurrency=DEFAULT_RESOLVER_CONCURRENCY):
+        self.github_obj = github_obj
+        self.concurrency = concurrency
+        # Number of requests per user id, to check that every user is fetched once.
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _fetch(self, user):
+        contributor = UserService(self.github_obj, user["login"]).request()
+        return {
+            "id": user["id"],
+            "login": contributor.login,
+            "name": contributor.name or "",
+            "email": contributor.email or "",
+        }
+
+    def resolve(self, users) -> dict:
+        """Get the distinct users from the cache in one round trip, then fetch the missing
+        ones in parallel and cache them.
+
+        Args:
+            - users(iterable): dicts with the id and login of the users, duplicates allowed.
+
+        Returns:
+            dict: of the user id and a dict with all needed contributor's information.
+        """
+        with self._lock:
+            return self._resolve(users)
+
+    def _resolve(self, users) -> dict:
+        users = {user["id"]: user for user in users}
+        results = dict()
+        cache_keys = [CONTRIBUTOR_CACHE_KEY.format(id=user_id) for user_id in users]
+        missing = []
+        for user, cached in zip(users.values(), self.get_many_from_cache(cache_keys)):
+            if cached:
+                # Values in the cache are strings, so keep the id of the listing.
+                results[user["id"]] = dict(cached, id=user["id"])
+            else:
+                missing.append(user)
+
+        fetched = dict()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for user_info in executor.map(self._fetch, missing):
+                self.calls[user_info["id"]] += 1
+                fetched[CONTRIBUTOR_CACHE_KEY.format(id=user_info["id"])] = user_info
+                results[user_info["id"]] = user_info
+        if fetched:
+            self.set_many_into_cache(fetched)
+        return results
+
+
+class GraphQLOrganizationService(BaseService):
+    EXCEPTION = OrganizationServiceException
+
+    def __init__(
+        self,
+        github_obj,
+        organization,
+        first,
+        history,
+        after=None,
+        variables=None,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(github_obj, *args, **kwargs)
+        self.organization = organization
+        self.first = first
+        self.history = history
+        self.after = after
+        # The filters of the repositories.
+        self.variables = variables or dict()
+
+    def _request(self):
+        # Return one page of the repositories with their languages and commit authors
+        # https://docs.github.com/en/graphql/reference/objects#organization
+        return self.github_obj.graphql(
+            ORGANIZATION_REPOSITORIES_QUERY,
+            {
+                "organization": self.organization,
+                "first": self.first,
+                "after": self.after,
+                "history": self.history,
+                **self.variables,
+            },
+        )["organization"]
+
+
+class GraphQLHistoryService(BaseService):
+    EXCEPTION = ContributorServiceException
+
+    def __init__(self, github_obj, organization, name, history, after, *args, **kwargs):
+        super().__init__(github_obj, *args, **kwargs)
+        self.organization = organization
+        self.name = name
+        self.history = history
+        self.after = after
+
+    def _request(self):
+        # Return the next page of the commits of the default branch with their authors
+        # https://docs.github.com/en/graphql/reference/objects#commit
+        return self.github_obj.graphql(
+            REPOSITORY_HISTORY_QUERY,
+            {
+                "owner": self.organization,
+                "name": self.name,
+                "history": self.history,
+                "after": self.after,
+            },
+        )["repository"]["defaultBranchRef"]["target"]["history"]
+
+
+class GithubService(CacheMixin):
+    def __init__(
+        self, github_object, concurrency=DEFAULT_RESOLVER_CONCURRENCY, *args, **kwargs
+    ):
         self.github_object = github_object
+        self.concurrency = concurrency
+        self.resolver = UserResolver(github_object, concurrency)
+        self.cached_languages = dict()
 
-    def get_organization(self, organization):
-        """Call the OrganizationService and return OrganizationParser.
+    def iter_repositories(self, organization, repo_filter=None):
+        """Call the OrganizationService and yield the repositories of the organization page
+        by page, the pages are fetched concurrently and yielded as soon as they land.
 
         Args:
             - organization(str): The name of the organization.
+            - repo_filter(RepositoryFilter): Its `type` is pushed into the listing.
 
         Returns:
-            OrganizationParser(dict): with the name of the organization and its repositories.
+            generator: of lists of the repositories of every page.
         """
-        organization = OrganizationService(self.github_object, organization).request()
-        return OrganizationParser(organization).parse()
+        with metrics.timer("stage.organization"):
+            organization = OrganizationService(
+                self.github_object, organization
+            ).request()
+        params = repo_filter.params() if repo_filter is not None else None
+        yield from organization.get_repo_pages(self.concurrency, params)
 
-    def get_languages(self, repo):
+    def get_languages(self, repo, sizes=False):
         """Call the LanguageService and return LanguageParser.
 
         Args:
             - repo(obj): Instance of Repository
+            - sizes(bool): Return the number of bytes of every language too.
 
         Returns:
-            LanguageParser(list): List of all languages in the repo.
+            LanguageParser(list): List of all languages in the repo, or a dict of the
+                languages and their bytes.
         """
-        language_service = LanguageService(self.github_object, repo).request()
-        return LanguageParser(language_service).parse()
+        with metrics.timer("stage.languages"):
+            language_service = LanguageService(
+                self.github_object, repo, cached=self.cached_languages.get(repo.id)
+            ).request()
+            return LanguageParser(language_service).parse(sizes)
 
-    def get_contributors(self, repo):
+    def prefetch_languages(self, repos):
+        """Get the languages of all repositories from the cache in one round trip, so
+        `get_languages` only calls Github for the missing ones.
+
+        Args:
+            - repos(list): Instances of Repository
+        """
+        cache_keys = [REPO_LANGUAGES_CACHE_KEY.format(id=repo.id) for repo in repos]
+        # Called for every page of the repositories while the others are fetched.
+        with metrics.timer("stage.prefetch_languages"):
+            self.cached_languages.update(
+                (repo.id, languages)
+                for repo, languages in zip(repos, self.get_many_from_cache(cache_keys))
+            )
+
+    def forget_languages(self, repo):
+        """Get the languages of a repository from Github on the next `get_languages`
+        instead of the cache, after a push that may have changed them.
+
+        Args:
+            - repo(obj): Instance of Repository
+        """
+        # An empty value skips the lookup of the cache, and the languages got from Github
+        # are cached again.
+        self.cached_languages[repo.id] = dict()
+
+    def get_contributors(self, repo, resolve=True):
         """Call the ContributorService and return ContributorParser.
 
         Args:
             - repo(obj): Instance of Repository
+            - resolve(bool): Get the name and email of every contributor, otherwise they
+                will be resolved later for the whole report by `get_users`.
 
         Returns:
             ContributorParser(dict): with all contributor info.
         """
-        contributor_service = ContributorService(self.github_object, repo).request()
-        return ContributorParser(contributor_service).parse()
+        with metrics.timer("stage.contributors"):
+            contributor_service = ContributorService(self.github_object, repo).request()
+            return ContributorParser(contributor_service, resolve=resolve).parse()
+
+    def get_contributor_stats(self, repo):
+        """Call the ContributorStatsService and return ContributorStatsParser.
+
+        Args:
+            - repo(obj): Instance of Repository
+
+        Returns:
+            ContributorStatsParser(list): The user id, additions and deletions of every
+                contributor, None if Github didn't compute them yet.
+        """
+        with metrics.timer("stage.contributor_stats"):
+            stats = ContributorStatsService(self.github_object, repo).request()
+            return ContributorStatsParser(stats).parse()
+
+    def get_snapshots(self, repos) -> dict:
+        """Get the results of the repositories that were not pushed to since they were
+        fetched from the cache in one round trip.
+
+        Args:
+            - repos(list): Instances of Repository
+
+        Returns:
+            dict: of the repository id and its results.
+        """
+        # Repositories without the time of the last push are always fetched.
+        repos = [repo for repo in repos if getattr(repo, "pushed_at", None)]
+        cache_keys = [REPO_SNAPSHOT_CACHE_KEY.format(id=repo.id) for repo in repos]
+        snapshots = dict()
+        with metrics.timer("stage.get_snapshots"):
+            cached = self.get_many_from_cache(cache_keys)
+        for repo, snapshot in zip(repos, cached):
+            if snapshot and snapshot["pushed_at"] == repo.pushed_at:
+                snapshots[repo.id] = dict(
+                    json.loads(snapshot["result"]), unchanged=True
+                )
+        return snapshots
+
+    def set_snapshots(self, repos, results) -> None:
+        """Cache the results of the repositories with the time of their last push in one
+        round trip.
+
+        Args:
+            - repos(list): Instances of Repository
+            - results(list): The results of every repository.
+        """
+        with metrics.timer("stage.set_snapshots"):
+            self.set_many_into_cache(
+                {
+                    REPO_SNAPSHOT_CACHE_KEY.format(id=repo.id): {
+                        "pushed_at": repo.pushed_at,
+                        "result": json.dumps(result),
+                    }
+                    for repo, result in zip(repos, results)
+                    if getattr(repo, "pushed_at", None)
+                }
+            )
+
+    def get_users(self, users):
+        """Call the UserResolver to get the info of every distinct user once.
+
+        Args:
+            - users(iterable): dicts with the id and login of the users.
+
+        Returns:
+            dict: of the user id and a dict with all needed contributor's information.
+        """
+        with metrics.timer("stage.users"):
+            return self.resolver.resolve(users)
+
+
+class GraphQLGithubService(GithubService):
+    """Fetch the languages and the contributors of many repositories per request through
+    the GraphQL API, instead of three REST calls and a user call per contributor for every
+    repository. The results have the same shape of GithubService.
+
+    Args:
+        - github_object(GithubClient): The client of the Github API.
+        - first(int): Number of repositories per query.
+        - history(int): Number of commits of the default branch per page of its history,
+            the contributors are the authors of all its pages.
+    """
+
+    def __init__(
+        self,
+        github_object,
+        concurrency=DEFAULT_RESOLVER_CONCURRENCY,
+        first=25,
+        history=100,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(github_object, concurrency, *args, **kwargs)
+        self.first = first
+        self.history = history
+
+    def _get_history(self, organization, node):
+        """Follow the cursors of the history of a repository with more commits than its
+        first page, the nodes of the next pages are added to those of the first one.
+
+        Args:
+            - organization(str): The name of the organization.
+            - node(dict): Repository node of the GraphQL response.
+        """
+        branch = node.get("defaultBranchRef") or {}
+        # Empty repositories don't have a default branch.
+        history = (branch.get("target") or {}).get("history")
+        while history and history.get("pageInfo", {}).get("hasNextPage"):
+            page = GraphQLHistoryService(
+                self.github_object,
+                organization,
+                node["name"],
+                self.history,
+                history["pageInfo"]["endCursor"],
+            ).request()
+            history["nodes"].extend(page["nodes"])
+            history["pageInfo"] = page["pageInfo"]
+
+    def _get_histories(self, organization, nodes):
+        with metrics.timer("stage.history"):
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                # The errors of the requests are raised as the results are read.
+                list(executor.map(self._get_history, repeat(organization), nodes))
+
+    def iter_repositories(self, organization, repo_filter=None):
+        """Call the GraphQLOrganizationService page by page using the cursors and yield
+        the repositories of every page as soon as it lands.
+
+        Args:
+            - organization(str): The name of the organization.
+            - repo_filter(RepositoryFilter): Its forks and privacy are pushed into the
+                query.
+
+        Returns:
+            generator: of lists of the repositories of every page.
+        """
+        after = None
+        variables = repo_filter.variables() if repo_filter is not None else None
+        while True:
+            with metrics.timer("stage.organization"):
+                data = GraphQLOrganizationService(
+                    self.github_object,
+                    organization,
+                    self.first,
+                    self.history,
+                    after,
+                    variables=variables,
+                ).request()
+            repositories = data["repositories"]
+            self._get_histories(organization, repositories["nodes"])
+            yield GraphQLOrganizationParser(data, repositories["nodes"]).parse()[
+                "repos"
+            ]
+            if not repositories["pageInfo"]["hasNextPage"]:
+                break
+            after = repositories["pageInfo"]["endCursor"]
+
+    def prefetch_languages(self, repos):
+        # Languages are already fetched with the repositories.
+        pass
+
+    def get_languages(self, repo, sizes=False):
+        # Languages are already fetched with the repository.
+        return repo.language_bytes if sizes else repo.languages
+
+    def get_contributors(self, repo, resolve=True):
+        # Contributors are already fetched with the repository.
+        return repo.contributors
+
+    def get_contributor_stats(self, repo):
+        raise ContributorServiceException(
+            message="The statistics of the contributors are only available through the REST API"
+        )
+
+    def get_users(self, users):
+        # Users are already fetched with their name and email.
+        return {
+            user["id"]: {
+                "id": user["id"],
+                "login": user["login"],
+                "name": user["name"],
+                "email": user["email"],
+            }
+            for user in users
+        }
+
+
+SERVICES = {
+    "rest": GithubService,
+    "graphql": GraphQLGithubService,
+}
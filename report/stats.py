@@ -0,0 +1,284 @@
+from array import array
+
+from .aggregation import Interner
+
+
+def import_numpy():
+    # Imported on the first aggregation, it's slow to import and optional.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def group_sum(keys: array, values: array, size: int) -> list:
+    """Sum the values of every key, the keys are integers lower than `size`.
+
+    Args:
+        - keys(array): The key of every row.
+        - values(array): The value of every row.
+        - size(int): Number of keys.
+
+    Returns:
+        list: The sum of every key.
+    """
+    numpy = import_numpy()
+    if numpy is not None:
+        sums = numpy.bincount(
+            numpy.frombuffer(keys, dtype=numpy.uint32),
+            weights=numpy.frombuffer(values, dtype=numpy.uint64),
+            minlength=size,
+        )
+        return sums.astype(numpy.int64).tolist()
+    sums = [0] * size
+    for key, value in zip(keys, values):
+        sums[key] += value
+    return sums
+
+
+class ContributionStats:
+    """Aggregate the contributions of the contributors of an organization into columns.
+
+    Every contributor of every repository is a row of flat arrays of integer ids and
+    counters, and every language of every repository is a row of other arrays, so millions
+    of rows don't need an object per row. The totals, the rankings and the shares of the
+    languages are computed with group-bys over the columns, vectorized with NumPy when it's
+    installed.
+    """
+
+    def __init__(self) -> None:
+        self.repos = Interner()
+        self.languages = Interner()
+        self.users = Interner()
+        # By the index of the user.
+        self.user_data = []
+        # A row for every contributor of every repository.
+        self.row_users = array("I")
+        self.row_repos = array("I")
+        self.row_commits = array("Q")
+        self.row_additions = array("Q")
+        self.row_deletions = array("Q")
+        # A row for every language of every repository.
+        self.language_repos = array("I")
+        self.language_ids = array("I")
+        self.language_bytes = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _user_index(self, user: dict) -> int:
+        index = self.users.intern(user["id"])
+        if index == len(self.user_data):
+            self.user_data.append(user)
+        return index
+
+    def add(self, result: dict) -> None:
+        """Add the contributions of a repository, a repository is only added once.
+
+        Args:
+            - result(dict): The repository with its contributors, their contributions
+                and the bytes of its languages.
+        """
+        if result["repo"] in self.repos:
+            return
+        repo_index = self.repos.intern(result["repo"])
+        # Additions and deletions of every user id, when they were fetched.
+        lines = {
+            user_id: (additions, deletions)
+            for user_id, additions, deletions in result.get("lines") or []
+        }
+        for user in result["users"]:
+            additions, deletions = lines.get(user["id"], (0, 0))
+            self.row_users.append(self._user_index(user))
+            self.row_repos.append(repo_index)
+            self.row_commits.append(int(user.get("contributions") or 0))
+            self.row_additions.append(additions)
+            self.row_deletions.append(deletions)
+        for language, size in zip(
+            result["languages"], result.get("language_bytes") or []
+        ):
+            self.language_repos.append(repo_index)
+            self.language_ids.append(self.languages.intern(language))
+            self.language_bytes.append(int(size))
+
+    def extend(self, results) -> "ContributionStats":
+        for result in results:
+            self.add(result)
+        return self
+
+    def totals(self) -> dict:
+        """Return the totals of every user.
+
+        Returns:
+            dict: of the name of every counter and a list of its total by user index.
+        """
+        size = len(self.users)
+        return {
+            "commits": group_sum(self.row_users, self.row_commits, size),
+            "additions": group_sum(self.row_users, self.row_additions, size),
+            "deletions": group_sum(self.row_users, self.row_deletions, size),
+            "repositories": group_sum(
+                self.row_users, array("Q", [1]) * len(self.row_users), size
+            ),
+        }
+
+    def ranking(self, totals: list, top: int = None) -> list:
+        """Return the indexes of the users sorted by their totals, the highest first.
+
+        Args:
+            - totals(list): The total of every user index.
+            - top(int): Number of users to keep, all of them if None.
+
+        Returns:
+            list: of the user indexes.
+        """
+        numpy = import_numpy()
+        if numpy is not None:
+            values = numpy.asarray(totals)
+            # Stable on the negated totals, so the ties keep the order of the users.
+            order = numpy.argsort(-values, kind="stable")
+            return order[:top].tolist()
+        order = sorted(range(len(totals)), key=lambda index: -totals[index])
+        return order[:top]
+
+    def _repo_weights(self, numpy):
+        repo_commits = numpy.bincount(
+            numpy.frombuffer(self.row_repos, dtype=numpy.uint32),
+            weights=numpy.frombuffer(self.row_commits, dtype=numpy.uint64),
+            minlength=len(self.repos),
+        )
+        commits = numpy.frombuffer(self.row_commits, dtype=numpy.uint64).astype(float)
+        totals = repo_commits[numpy.frombuffer(self.row_repos, dtype=numpy.uint32)]
+        return numpy.divide(
+            commits, totals, out=numpy.zeros_like(commits), where=totals > 0
+        )
+
+    def _language_shares_numpy(self, numpy, users: list) -> dict:
+        results = {index: [] for index in users}
+        if not len(self.languages) or not users:
+            return results
+        row_users = numpy.frombuffer(self.row_users, dtype=numpy.uint32)
+        row_repos = numpy.frombuffer(self.row_repos, dtype=numpy.uint32)
+        # Only the rows of the users asked for are joined.
+        selected = numpy.zeros(len(self.users), dtype=bool)
+        selected[users] = True
+        indexes = numpy.nonzero(selected[row_users])[0]
+        weights = self._repo_weights(numpy)[indexes]
+        row_users, row_repos = row_users[indexes], row_repos[indexes]
+        # The languages of every repository in a contiguous range, sorted by repository.
+        language_repos = numpy.frombuffer(self.language_repos, dtype=numpy.uint32)
+        order = numpy.argsort(language_repos, kind="stable")
+        language_ids = numpy.frombuffer(self.language_ids, dtype=numpy.uint32)[order]
+        language_bytes = numpy.frombuffer(self.language_bytes, dtype=numpy.uint64)
+        language_bytes = language_bytes[order].astype(float)
+        counts = numpy.bincount(language_repos, minlength=len(self.repos))
+        starts = numpy.cumsum(counts) - counts
+        # Join every contributor row with every language of its repository.
+        row_counts = counts[row_repos]
+        rows = numpy.repeat(numpy.arange(len(row_repos)), row_counts)
+        offsets = numpy.arange(len(rows)) - numpy.repeat(
+            numpy.cumsum(row_counts) - row_counts, row_counts
+        )
+        positions = numpy.repeat(starts[row_repos], row_counts) + offsets
+        # Group by user and language.
+        keys = row_users[rows].astype(numpy.int64) * len(self.languages)
+        keys += language_ids[positions]
+        keys, inverse = numpy.unique(keys, return_inverse=True)
+        sums = numpy.bincount(
+            inverse.ravel(), weights=weights[rows] * language_bytes[positions]
+        )
+        key_users = keys // len(self.languages)
+        key_languages = keys % len(self.languages)
+        user_totals = numpy.bincount(
+            key_users, weights=sums, minlength=len(self.users)
+        )[key_users]
+        shares = numpy.divide(
+            sums, user_totals, out=numpy.zeros_like(sums), where=user_totals > 0
+        )
+        # By user, the largest share first.
+        order = numpy.lexsort((-shares, key_users))
+        names = self.languages.names
+        for user, language, share in zip(
+            key_users[order].tolist(),
+            key_languages[order].tolist(),
+            shares[order].tolist(),
+        ):
+            if share > 0:
+                results[user].append((names[language], share))
+        return results
+
+    def _language_shares_python(self, users: list) -> dict:
+        repo_commits = group_sum(self.row_repos, self.row_commits, len(self.repos))
+        repo_languages = [[] for _ in range(len(self.repos))]
+        for repo_index, language, size in zip(
+            self.language_repos, self.language_ids, self.language_bytes
+        ):
+            repo_languages[repo_index].append((language, size))
+        user_bytes = {index: dict() for index in users}
+        for user, repo_index, commits in zip(
+            self.row_users, self.row_repos, self.row_commits
+        ):
+            if user not in user_bytes or not repo_commits[repo_index]:
+                continue
+            weight = commits / repo_commits[repo_index]
+            languages = user_bytes[user]
+            for language, size in repo_languages[repo_index]:
+                languages[language] = languages.get(language, 0.0) + weight * size
+        names = self.languages.names
+        results = dict()
+        for index, languages in user_bytes.items():
+            total = sum(languages.values())
+            # The largest share first, the ties in the order of the languages.
+            order = sorted(
+                languages, key=lambda language: (-languages[language], language)
+            )
+            results[index] = [
+                (names[language], languages[language] / total)
+                for language in order
+                if languages[language] > 0
+            ]
+        return results
+
+    def language_shares(self, users: list = None) -> dict:
+        """Return the share of every language of the users, the bytes of every language
+        of a repository are weighted by the share of the commits of the user in it.
+
+        Args:
+            - users(list): The indexes of the users, all of them if None.
+
+        Returns:
+            dict: of the user index and a list of tuples of the language and its share,
+                the largest first.
+        """
+        if users is None:
+            users = list(range(len(self.users)))
+        numpy = import_numpy()
+        if numpy is not None:
+            return self._language_shares_numpy(numpy, users)
+        return self._language_shares_python(users)
+
+    def to_dict(self, top: int = None, key: str = "commits") -> dict:
+        """Return the stats of the users, ranked by one of their totals.
+
+        Args:
+            - top(int): Number of users to keep, all of them if None.
+            - key(str): The total to rank the users by.
+
+        Returns:
+            dict: for contributors with its rank, totals and shares of the languages, in
+                the order of the ranking.
+        """
+        totals = self.totals()
+        ranking = self.ranking(totals[key], top)
+        # Only the languages of the users in the ranking are computed.
+        shares = self.language_shares(ranking)
+        results = dict()
+        for rank, index in enumerate(ranking, 1):
+            results[self.users.names[index]] = {
+                "user": self.user_data[index],
+                "rank": rank,
+                **{name: values[index] for name, values in totals.items()},
+                "languages": shares[index],
+            }
+        return results
@@ -1,13 +1,5 @@
-class Rate:
-    @property
-    def raw_data(self):
-        return {"limit": 5000, "used": 0, "remaining": 5000, "reset": 1626708493}
-
-
-class RateLimit:
-    @property
-    def core(self):
-        return Rate()
+import threading
+import time
 
 
 class NamedUser:
@@ -27,6 +19,10 @@ class NamedUser:
     def email(self):
         return "test@test.com"
 
+    @property
+    def contributions(self):
+        return 10
+
 
 class Repository:
     def get_contributors(self):
@@ -56,8 +52,186 @@ class Github:
     def __init__(self, token, *args, **kwargs):
         self.token = token
 
-    def get_rate_limit(self):
-        return RateLimit()
-
     def get_organization(self, name):
         return Organization()
+
+
+class Redis:
+    """In-memory Redis counting the commands and the round trips to the server, it's safe
+    to share across threads like a client with a connection pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.data = dict()
+        self.ttls = dict()
+        self.commands = 0
+        self.round_trips = 0
+        self.lock = threading.RLock()
+
+    def _execute(self, command, *args, **kwargs):
+        with self.lock:
+            self.commands += 1
+            return getattr(self, f"_{command}")(*args, **kwargs)
+
+    def _call(self, command, *args, **kwargs):
+        with self.lock:
+            self.round_trips += 1
+            return self._execute(command, *args, **kwargs)
+
+    def __getattr__(self, command):
+        if not hasattr(type(self), f"_{command}"):
+            raise AttributeError(command)
+        return lambda *args, **kwargs: self._call(command, *args, **kwargs)
+
+    def _hgetall(self, name):
+        return dict(self.data.get(name, {}))
+
+    def _hset(self, name, key=None, value=None, mapping=None):
+        mapping = dict(mapping or {})
+        if key is not None:
+            mapping[key] = value
+        # Like a client with decode_responses, all values are returned as strings.
+        self.data.setdefault(name, {}).update(
+            {str(key): str(value) for key, value in mapping.items()}
+        )
+        return len(mapping)
+
+    def _hincrby(self, name, key, amount=1):
+        values = self.data.setdefault(name, {})
+        values[str(key)] = str(int(values.get(str(key), 0)) + amount)
+        return int(values[str(key)])
+
+    def _hdel(self, name, *keys):
+        values = self.data.get(name, {})
+        return sum(values.pop(str(key), None) is not None for key in keys)
+
+    def _expire(self, name, time):
+        self.ttls[name] = time
+        return name in self.data
+
+    def _time(self):
+        now = time.time()
+        return int(now), int(now % 1 * 1e6)
+
+    def _get(self, name):
+        return self.data.get(name)
+
+    def _set(self, name, value, ex=None):
+        self.data[name] = str(value)
+        if ex is not None:
+            self.ttls[name] = ex
+        return True
+
+    def _delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def _lpush(self, name, *values):
+        items = self.data.setdefault(name, [])
+        for value in values:
+            items.insert(0, str(value))
+        return len(items)
+
+    def _rpush(self, name, *values):
+        items = self.data.setdefault(name, [])
+        items.extend(str(value) for value in values)
+        return len(items)
+
+    def _lpop(self, name):
+        items = self.data.get(name)
+        return items.pop(0) if items else None
+
+    def _rpoplpush(self, src, dst):
+        items = self.data.get(src)
+        if not items:
+            return None
+        value = items.pop()
+        self.data.setdefault(dst, []).insert(0, value)
+        return value
+
+    def _lrange(self, name, start, end):
+        items = self.data.get(name, [])
+        return list(items[start : None if end == -1 else end + 1])
+
+    def _lrem(self, name, count, value):
+        items = self.data.get(name, [])
+        removed = 0
+        while value in items and (not count or removed < count):
+            items.remove(value)
+            removed += 1
+        return removed
+
+    def _zadd(self, name, mapping, nx=False):
+        items = self.data.setdefault(name, {})
+        added = 0
+        for member, score in mapping.items():
+            if nx and member in items:
+                continue
+            added += member not in items
+            items[member] = float(score)
+        return added
+
+    def _zrem(self, name, *members):
+        items = self.data.get(name, {})
+        return sum(items.pop(member, None) is not None for member in members)
+
+    def _zrangebyscore(self, name, min, max):
+        low, high = float(min), float(max)
+        items = self.data.get(name, {})
+        return [
+            member
+            for member, score in sorted(items.items(), key=lambda item: item[1])
+            if low <= score <= high
+        ]
+
+    def _block(self, command, timeout, *args):
+        # Polled, so the lock isn't held while waiting.
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self._call(command, *args)
+            if result is not None or time.monotonic() >= deadline:
+                return result
+            time.sleep(0.01)
+
+    def brpoplpush(self, src, dst, timeout=0):
+        return self._block("rpoplpush", timeout, src, dst)
+
+    def blpop(self, keys, timeout=0):
+        deadline = time.monotonic() + timeout
+        while True:
+            for key in keys:
+                value = self._call("lpop", key)
+                if value is not None:
+                    return key, value
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+
+    def hmset(self, name, mapping):
+        return self.hset(name, mapping=mapping)
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+
+class Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = []
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self.queue.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        # Atomic like a transaction.
+        with self.redis.lock:
+            self.redis.round_trips += 1
+            results = [
+                self.redis._execute(command, *args, **kwargs)
+                for command, args, kwargs in self.queue
+            ]
+        self.queue = []
+        return results
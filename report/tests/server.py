@@ -0,0 +1,601 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+LANGUAGES = ["Python", "JavaScript", "Go", "HTML", "CSS", "Shell", "Rust", "Java"]
+
+
+class FakeGithub:
+    """A synthetic organization to be served by the FakeGithubServer.
+
+    Repositories share their contributors, so the same user shows up in several repos
+    like it happens in real organizations.
+
+    Args:
+        - organization(str): The login of the organization.
+        - repos(int): Number of repositories.
+        - contributors(int): Number of contributors per repository.
+        - users(int): Number of distinct users in the organization.
+        - languages(int): Number of languages per repository.
+        - first_id(int): The id of the first repository, so the repositories of many
+            organizations don't share their ids. The users are the same in every
+            organization.
+
+    The repositories added to `failing` reply with a server error to their contributors.
+    The statistics of the repositories in `computing` reply with 202 as many times as
+    their value, like Github does while it computes them.
+    """
+
+    def __init__(
+        self,
+        organization="fake-org",
+        repos=10,
+        contributors=3,
+        users=None,
+        languages=2,
+        first_id=100,
+    ):
+        self.organization = organization
+        users = users or max(repos, contributors)
+        self.users = {
+            f"user{index}": {
+                "id": 1000 + index,
+                "login": f"user{index}",
+                "name": f"User {index}",
+                "email": f"user{index}@example.com",
+            }
+            for index in range(users)
+        }
+        logins = list(self.users)
+        self.failing = set()
+        self.computing = dict()
+        self.repos = {}
+        for index in range(repos):
+            name = f"repo-{index}"
+            self.repos[name] = {
+                "id": first_id + index,
+                "name": name,
+                "full_name": f"{organization}/{name}",
+                "pushed_at": "2021-07-01T00:00:00Z",
+                "fork": False,
+                "archived": False,
+                "topics": [],
+                "visibility": "public",
+                # In KB, the repositories with more contributors are larger.
+                "size": 1000 * min(contributors, users) + 10 * index,
+                "contributors": [
+                    logins[(index + position) % users]
+                    for position in range(min(contributors, users))
+                ],
+                "languages": {
+                    LANGUAGES[(index + position) % len(LANGUAGES)]: 1000
+                    * (position + 1)
+                    for position in range(languages)
+                },
+            }
+
+    def save(self, path):
+        """Record the organization into a JSON fixture, to be served again with `load`."""
+        with open(path, "w") as fixture_file:
+            json.dump(
+                {
+                    "organization": self.organization,
+                    "users": self.users,
+                    "repos": self.repos,
+                },
+                fixture_file,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Serve an organization recorded into a JSON fixture by `save`."""
+        with open(path) as fixture_file:
+            fixture = json.load(fixture_file)
+        github = cls(fixture["organization"], repos=0, users=1)
+        github.users = fixture["users"]
+        github.repos = fixture["repos"]
+        return github
+
+    def contributions(self, repo, position):
+        # Like Github, the contributors are listed with the most commits first.
+        return 10 * (len(self.repos[repo]["contributors"]) - position)
+
+    def repo_data(self, repo):
+        return {
+            key: value
+            for key, value in repo.items()
+            if key not in ("contributors", "languages")
+        }
+
+    def list_repos(self, type=None, fork=None, visibility=None):
+        """Return the repositories listed with the filters of Github, the `type` of the
+        REST API or the fork and the visibility of the GraphQL API.
+        """
+        if type in ("forks", "sources"):
+            fork = type == "forks"
+        elif type in ("public", "private"):
+            visibility = type
+        return [
+            repo
+            for repo in self.repos.values()
+            if (fork is None or repo.get("fork", False) == fork)
+            and (visibility is None or repo.get("visibility", "public") == visibility)
+        ]
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    routes = [
+        ("rate_limit", re.compile(r"^/rate_limit$")),
+        ("organization", re.compile(r"^/orgs/(?P<org>[^/]+)$")),
+        ("repos", re.compile(r"^/orgs/(?P<org>[^/]+)/repos$")),
+        (
+            "contributors",
+            re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/contributors$"),
+        ),
+        ("languages", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/languages$")),
+        (
+            "stats_contributors",
+            re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/stats/contributors$"),
+        ),
+        ("user", re.compile(r"^/users/(?P<login>[^/]+)$")),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        for endpoint, pattern in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                self.server.record(endpoint)
+                if endpoint != "rate_limit" and self.inject_fault():
+                    return
+                time.sleep(self.server.latency)
+                if endpoint != "rate_limit" and self.is_limited():
+                    return
+                return getattr(self, f"get_{endpoint}")(url.path, **match.groupdict())
+        self.reply(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/graphql":
+            return self.reply(404, {"message": "Not Found"})
+        self.server.record("graphql")
+        if self.inject_fault():
+            return
+        time.sleep(self.server.latency)
+        if self.is_limited():
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.post_graphql(body["variables"])
+
+    def history(self, github, repo, variables):
+        # Every contributor authored one commit, the cursor is the index of the next one.
+        start = int(variables.get("after") or 0)
+        end = start + variables["history"]
+        authors = repo["contributors"][start:end]
+        return {
+            "pageInfo": {
+                "hasNextPage": end < len(repo["contributors"]),
+                "endCursor": str(end),
+            },
+            "nodes": [
+                {
+                    "author": {
+                        "user": dict(
+                            github.users[login], databaseId=github.users[login]["id"]
+                        )
+                    }
+                }
+                for login in authors
+            ],
+        }
+
+    def post_graphql(self, variables):
+        # Only the queries of the organization repositories and of the history of a
+        # repository are supported, so the variables are enough to build the response.
+        if "name" in variables:
+            return self.post_graphql_history(variables)
+        github = self.server.get_github(variables["organization"])
+        if github is None:
+            message = f"Could not resolve to an Organization with the login of '{variables['organization']}'."
+            return self.reply(
+                200, {"data": {"organization": None}, "errors": [{"message": message}]}
+            )
+        privacy = variables.get("privacy")
+        repos = github.list_repos(
+            fork=variables.get("isFork"), visibility=privacy and privacy.lower()
+        )
+        start = int(variables.get("after") or 0)
+        end = start + variables["first"]
+        nodes = []
+        for repo in repos[start:end]:
+            nodes.append(
+                {
+                    "databaseId": repo["id"],
+                    "name": repo["name"],
+                    "isFork": repo.get("fork", False),
+                    "isArchived": repo.get("archived", False),
+                    "diskUsage": repo["size"],
+                    "pushedAt": repo["pushed_at"],
+                    "visibility": repo.get("visibility", "public").upper(),
+                    "repositoryTopics": {
+                        "nodes": [
+                            {"topic": {"name": topic}}
+                            for topic in repo.get("topics", [])
+                        ]
+                    },
+                    "languages": {
+                        "edges": [
+                            {"size": size, "node": {"name": name}}
+                            for name, size in repo["languages"].items()
+                        ]
+                    },
+                    "defaultBranchRef": {
+                        "target": {
+                            "history": self.history(
+                                github, repo, dict(variables, after=None)
+                            )
+                        }
+                    },
+                }
+            )
+        organization = {
+            "name": github.organization.title(),
+            "repositories": {
+                "pageInfo": {"hasNextPage": end < len(repos), "endCursor": str(end)},
+                "nodes": nodes,
+            },
+        }
+        self.reply(200, {"data": {"organization": organization}})
+
+    def post_graphql_history(self, variables):
+        github = self.server.get_github(variables["owner"])
+        repo = github and github.repos.get(variables["name"])
+        if repo is None:
+            message = f"Could not resolve to a Repository with the name '{variables['owner']}/{variables['name']}'."
+            return self.reply(
+                200, {"data": {"repository": None}, "errors": [{"message": message}]}
+            )
+        branch = {"target": {"history": self.history(github, repo, variables)}}
+        self.reply(200, {"data": {"repository": {"defaultBranchRef": branch}}})
+
+    @property
+    def token(self):
+        authorization = self.headers.get("Authorization")
+        return authorization.split()[-1] if authorization else None
+
+    def inject_fault(self):
+        """Fail the request like an unreliable Github, with a server error or a connection
+        reset, or make it slow.
+
+        Returns:
+            bool: True if the request was failed.
+        """
+        fault = self.server.next_fault()
+        if fault is None:
+            return False
+        self.server.record(f"injected_{fault}")
+        if fault == "slow":
+            time.sleep(self.server.slow_latency)
+            return False
+        if fault == "reset":
+            # Closed without a response.
+            self.close_connection = True
+            return True
+        self.rate_headers = {}
+        self.reply(502, {"message": "Server Error"})
+        return True
+
+    def is_limited(self):
+        """Reject the request if its token is revoked, if the budget of the rate limit of
+        its token is exhausted or if it hits the secondary rate limit.
+        """
+        self.server.record_token(self.token)
+        if self.token in self.server.revoked:
+            self.server.record("unauthorized")
+            self.reply(401, {"message": "Bad credentials"})
+            return True
+        self.rate_headers = self.server.take_rate_limit(self.token)
+        if self.rate_headers["X-RateLimit-Remaining"] == "-1":
+            self.rate_headers["X-RateLimit-Remaining"] = "0"
+            self.server.record("rate_limited")
+            self.reply(403, {"message": "API rate limit exceeded"})
+            return True
+        if self.server.is_secondary_limited():
+            self.server.record("secondary_limited")
+            self.reply(
+                403,
+                {"message": "You have exceeded a secondary rate limit"},
+                {"Retry-After": "1"},
+            )
+            return True
+        return False
+
+    def reply(self, status, data, headers=None):
+        body = b"" if data is None else json.dumps(data).encode()
+        headers = dict(getattr(self, "rate_headers", {}), **(headers or {}))
+        if self.command == "GET" and status == 200:
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                # Like Github, a 304 doesn't count against the rate limit.
+                self.server.refund_rate_limit(self.token)
+                self.server.record("not_modified")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page_numbers(self, items):
+        per_page = min(int(self.query.get("per_page", self.server.page_size)), 100)
+        page = int(self.query.get("page", 1))
+        return per_page, page, max((len(items) + per_page - 1) // per_page, 1)
+
+    def reply_page(self, path, items):
+        per_page, page, last = self.page_numbers(items)
+        links = []
+        for rel, number in (("next", page + 1), ("last", last)):
+            if number <= last and number != page:
+                query = urlencode(dict(self.query, per_page=per_page, page=number))
+                links.append(f'<{self.server.url}{path}?{query}>; rel="{rel}"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        self.reply(200, items[(page - 1) * per_page : page * per_page], headers)
+
+    def get_rate_limit(self, path):
+        core = self.server.rate_limit_status(self.token)
+        self.reply(200, {"resources": {"core": core}, "rate": core})
+
+    def get_organization(self, path, org):
+        if self.server.get_github(org) is None:
+            return self.reply(404, {"message": "Not Found"})
+        self.reply(200, {"id": 1, "login": org, "name": org.title()})
+
+    def get_repos(self, path, org):
+        github = self.server.get_github(org)
+        if github is None:
+            return self.reply(404, {"message": "Not Found"})
+        repo_type = self.query.get("type")
+        if repo_type:
+            self.server.record(f"repos_{repo_type}")
+        repos = [github.repo_data(repo) for repo in github.list_repos(repo_type)]
+        _, page, last = self.page_numbers(repos)
+        if self.server.hold_listing is not None and page == last > 1:
+            # The end of the listing waits for the first repository to be fetched.
+            self.server.contributors_requested.wait(self.server.hold_listing)
+            self.server.record("repos_last")
+        self.reply_page(path, repos)
+
+    def get_contributors(self, path, org, repo):
+        self.server.contributors_requested.set()
+        github = self.server.get_github(org)
+        if github is None or repo not in github.repos:
+            return self.reply(404, {"message": "Not Found"})
+        if repo in github.failing:
+            return self.reply(500, {"message": "Server Error"})
+        contributors = [
+            {
+                "id": github.users[login]["id"],
+                "login": login,
+                "contributions": github.contributions(repo, position),
+            }
+            for position, login in enumerate(github.repos[repo]["contributors"])
+        ]
+        if not contributors:
+            # Like Github, an empty repository has no content.
+            return self.reply(204, None)
+        self.reply_page(path, contributors)
+
+    def get_stats_contributors(self, path, org, repo):
+        github = self.server.get_github(org)
+        if github is None or repo not in github.repos:
+            return self.reply(404, {"message": "Not Found"})
+        if github.computing.get(repo):
+            github.computing[repo] -= 1
+            self.server.record("stats_computing")
+            return self.reply(202, {})
+        stats = []
+        for position, login in enumerate(github.repos[repo]["contributors"]):
+            commits = github.contributions(repo, position)
+            # A single week, the additions and deletions follow the commits.
+            week = {
+                "w": 1625097600,
+                "a": 100 * commits,
+                "d": 10 * commits,
+                "c": commits,
+            }
+            stats.append(
+                {
+                    "author": {"id": github.users[login]["id"], "login": login},
+                    "total": commits,
+                    "weeks": [week],
+                }
+            )
+        self.reply(200, stats)
+
+    def get_languages(self, path, org, repo):
+        github = self.server.get_github(org)
+        if github is None or repo not in github.repos:
+            return self.reply(404, {"message": "Not Found"})
+        self.reply(200, github.repos[repo]["languages"])
+
+    def get_user(self, path, login):
+        for github in [self.server.github, *self.server.organizations.values()]:
+            if login in github.users:
+                return self.reply(200, github.users[login])
+        self.reply(404, {"message": "Not Found"})
+
+
+class FakeGithubServer(ThreadingHTTPServer):
+    """A local HTTP server that mimics the endpoints of the Github REST API used by the
+    report, to be used in the tests and benchmarks instead of the real Github.
+
+    Args:
+        - github(FakeGithub): The organization to be served.
+        - page_size(int): The default number of items per page.
+        - latency(float): Seconds to wait before answering each request.
+        - rate_limit(int): Number of requests allowed in every window of the rate limit,
+            every token has its own budget.
+        - window(int): Seconds until the rate limit resets.
+        - secondary_limit_every(int): Reject every nth request with a `Retry-After`.
+        - organizations(list): More organizations to be served with the first one.
+        - error_every(int): Reply to every nth request with a server error.
+        - reset_every(int): Close the connection of every nth request without a response.
+        - slow_every(int): Answer every nth request after `slow_latency` more seconds.
+        - slow_latency(float): Seconds to wait before answering the slow requests.
+        - hold_listing(float): Seconds the last page of the repositories waits for a
+            first request of contributors, None to answer it right away.
+    """
+
+    daemon_threads = True
+    # Many clients connect at the same time, the default backlog of 5 would drop them.
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        github=None,
+        page_size=30,
+        latency=0.0,
+        rate_limit=5000,
+        window=3600,
+        secondary_limit_every=None,
+        organizations=None,
+        error_every=None,
+        reset_every=None,
+        slow_every=None,
+        slow_latency=1.0,
+        hold_listing=None,
+    ):
+        super().__init__(("127.0.0.1", 0), FakeGithubHandler)
+        self.github = github or FakeGithub()
+        self.organizations = {
+            github.organization: github for github in organizations or []
+        }
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.secondary_limit_every = secondary_limit_every
+        self.faults = {"error": error_every, "reset": reset_every, "slow": slow_every}
+        self.slow_latency = slow_latency
+        self.hold_listing = hold_listing
+        self.contributors_requested = threading.Event()
+        self.fault_requests = 0
+        # The remaining budget and the reset time of every token.
+        self.budgets = dict()
+        # The tokens rejected as bad credentials.
+        self.revoked = set()
+        self.requests = 0
+        self.calls = Counter()
+        # The endpoints in the order their requests arrived.
+        self.log = []
+        self.token_calls = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get_github(self, organization):
+        if organization == self.github.organization:
+            return self.github
+        return self.organizations.get(organization)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.log.append(endpoint)
+
+    def record_token(self, token):
+        with self._lock:
+            self.token_calls[token] += 1
+
+    def _budget(self, token):
+        budget = self.budgets.get(token)
+        if budget is None or time.time() >= budget[1]:
+            budget = self.budgets[token] = [
+                self.rate_limit,
+                math.ceil(time.time() + self.window),
+            ]
+        return budget
+
+    def rate_limit_status(self, token=None):
+        with self._lock:
+            remaining, reset = self._budget(token)
+            return {
+                "limit": self.rate_limit,
+                "used": self.rate_limit - remaining,
+                "remaining": remaining,
+                "reset": reset,
+            }
+
+    def take_rate_limit(self, token=None):
+        """Take one request from the budget of a token and return the headers of the rate
+        limit, with -1 remaining if the budget is exhausted.
+        """
+        with self._lock:
+            budget = self._budget(token)
+            remaining = budget[0] - 1
+            budget[0] = max(remaining, 0)
+            reset = budget[1]
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset),
+        }
+
+    def refund_rate_limit(self, token=None):
+        with self._lock:
+            budget = self._budget(token)
+            budget[0] = min(budget[0] + 1, self.rate_limit)
+
+    def next_fault(self):
+        """Return the fault injected into the next request, `error`, `reset`, `slow` or
+        None.
+        """
+        with self._lock:
+            self.fault_requests += 1
+            number = self.fault_requests
+        for fault, every in self.faults.items():
+            if every and number % every == 0:
+                return fault
+        return None
+
+    def is_secondary_limited(self):
+        with self._lock:
+            self.requests += 1
+            return bool(
+                self.secondary_limit_every
+                and self.requests % self.secondary_limit_every == 0
+            )
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from report.aggregation import Aggregation, iter_bits
+
+
+def repo(name, logins, languages):
+    return {
+        "repo": name,
+        "users": [{"id": int(login[4:]), "login": login} for login in logins],
+        "languages": languages,
+    }
+
+
+REPOS = [
+    repo("repo-0", ["user1", "user2"], ["Python", "Go"]),
+    repo("repo-1", ["user2", "user3"], ["Go", "Rust"]),
+    repo("repo-2", ["user1"], ["HTML"]),
+    repo("repo-3", ["user3", "user4"], []),
+]
+
+
+class TestAggregation(TestCase):
+    def test_iter_bits(self):
+        self.assertEqual(list(iter_bits(0b100101)), [0, 2, 5])
+        self.assertEqual(list(iter_bits(0)), [])
+
+    def test_languages_are_the_union_of_all_repositories(self):
+        results = Aggregation().extend(REPOS).to_dict()
+        self.assertEqual(results[1]["repos"], ["repo-0", "repo-2"])
+        self.assertEqual(results[1]["languages"], ["Python", "Go", "HTML"])
+        self.assertEqual(results[2]["languages"], ["Python", "Go", "Rust"])
+        self.assertEqual(results[4]["languages"], [])
+        self.assertEqual(results[4]["user"], {"id": 4, "login": "user4"})
+
+    def test_repositories_are_added_once(self):
+        results = Aggregation().extend(REPOS + REPOS[:2]).to_dict()
+        self.assertEqual(results[2]["repos"], ["repo-0", "repo-1"])
+
+    def test_merge_matches_a_single_aggregation(self):
+        aggregation = Aggregation().extend(REPOS[1:3])
+        aggregation.merge(Aggregation().extend([REPOS[3], REPOS[0], REPOS[1]]))
+        expected = Aggregation().extend(REPOS).to_dict()
+        results = aggregation.to_dict()
+        self.assertEqual(set(results), set(expected))
+        for user_id, data in expected.items():
+            self.assertCountEqual(results[user_id]["repos"], data["repos"])
+            self.assertCountEqual(results[user_id]["languages"], data["languages"])
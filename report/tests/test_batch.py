@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from report.batch import BatchContributorsReport
+from report.cache import LRUCache, RedisCache
+
+from .objects import Redis
+from .server import FakeGithub, FakeGithubServer
+
+
+class TestBatchContributorsReport(TestCase):
+    def setUp(self):
+        # Both organizations share their users.
+        self.server = FakeGithubServer(
+            FakeGithub("org-a", repos=4, contributors=2),
+            organizations=[FakeGithub("org-b", repos=3, contributors=2, first_id=200)],
+        ).start()
+        patcher = patch("report.conf._cache", LRUCache(RedisCache(Redis())))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        report_dir = tempfile.TemporaryDirectory()
+        self.report_path = report_dir.name
+        self.addCleanup(report_dir.cleanup)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _report(self, organizations, engine="async"):
+        return BatchContributorsReport(
+            "AUTH_KEY",
+            organizations,
+            self.report_path,
+            engine=engine,
+            concurrency=2,
+            organization_concurrency=2,
+            base_url=self.server.url,
+        )
+
+    def test_organizations_share_the_client_and_the_users(self):
+        report = self._report(["org-a", "org-b"])
+        with patch("builtins.print"):
+            results = report._run()
+        self.assertEqual(list(results), ["org-a", "org-b"])
+        self.assertEqual(len(results["org-a"]), 4)
+        self.assertEqual(len(results["org-b"]), 3)
+        # Every user is fetched once for both organizations.
+        self.assertEqual(self.server.calls["user"], 4)
+        self.assertEqual(self.server.calls["contributors"], 7)
+
+    def test_rollup_prefixes_the_repositories_with_their_organization(self):
+        report = self._report(["org-a", "org-b"])
+        with patch("builtins.print"):
+            rollup = report._rollup(report._run())
+        self.assertEqual(len(rollup), 4)
+        self.assertEqual(rollup[1000]["organizations"], ["org-a", "org-b"])
+        self.assertCountEqual(
+            rollup[1000]["repos"],
+            ["org-a/repo-0", "org-a/repo-3", "org-b/repo-0", "org-b/repo-2"],
+        )
+        self.assertEqual(rollup[1003]["organizations"], ["org-a"])
+
+    def test_generate_report_writes_every_organization_and_the_rollup(self):
+        with patch("builtins.print"):
+            report = self._report(["org-a", "org-b"], engine="pool")
+            # The pool isn't forked from the threads of the organizations.
+            self.assertEqual(report.engine, "async")
+            report.generate_report()
+        for organization in ("org-a", "org-b"):
+            files = os.listdir(os.path.join(self.report_path, organization))
+            self.assertTrue(any(name.endswith(".csv") for name in files))
+        names = os.listdir(self.report_path)
+        [rollup] = [name for name in names if name.endswith(".csv")]
+        with open(os.path.join(self.report_path, rollup)) as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            {row["Login"]: row["Organizations"] for row in rows}["user0"],
+            "org-a, org-b",
+        )
+        [profile] = [name for name in names if name.endswith(".profile.json")]
+        with open(os.path.join(self.report_path, profile)) as profile_file:
+            self.assertEqual(json.load(profile_file)["failures"], dict())
+
+    def test_a_failed_organization_doesnt_stop_the_others(self):
+        report = self._report(["org-a", "missing-org"])
+        with patch("builtins.print") as print_mock:
+            results = report._run()
+        self.assertEqual(list(results), ["org-a"])
+        self.assertEqual(list(report.failures), ["missing-org"])
+        print_mock.assert_any_call("1 organizations failed: missing-org")
+
+    def test_the_reports_of_one_organization_are_rejected(self):
+        for option in ("long_format", "profile", "stats"):
+            with self.assertRaises(ValueError):
+                BatchContributorsReport(
+                    "AUTH_KEY", ["org-a", "org-b"], self.report_path, **{option: True}
+                )
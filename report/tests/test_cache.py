@@ -0,0 +1,86 @@
+import multiprocessing as mp
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+import redis
+
+from report import conf
+from report.cache import LRUCache, MemoryCache, RedisCache
+
+from .objects import Redis
+
+TTLS = {"user-{id}": 60, "repo-{id}-languages": 120}
+
+
+class TestMemoryCache(TestCase):
+    @patch("report.cache.time.monotonic")
+    def test_keys_expire_after_the_ttl_of_their_family(self, monotonic):
+        monotonic.return_value = 0
+        cache = MemoryCache(TTLS)
+        cache.set_many({"user-1": {"id": 1}, "repo-1-languages": {"Python": 10}})
+        self.assertEqual(cache.get("user-1"), {"id": "1"})
+        monotonic.return_value = 90
+        self.assertEqual(
+            cache.get_many(["user-1", "repo-1-languages"]), [{}, {"Python": "10"}]
+        )
+        monotonic.return_value = 150
+        self.assertEqual(cache.get("repo-1-languages"), {})
+
+
+class TestRedisCache(TestCase):
+    def test_set_many_expires_the_keys_in_one_round_trip(self):
+        redis = Redis()
+        cache = RedisCache(redis, TTLS)
+        cache.set_many({"user-1": {"id": 1}, "repo-1-languages": {"Python": 10}})
+        self.assertEqual(redis.round_trips, 1)
+        self.assertEqual(redis.ttls, {"user-1": 60, "repo-1-languages": 120})
+        self.assertEqual(cache.get("user-1"), {"id": "1"})
+
+    def test_forked_workers_open_their_own_connections(self):
+        cache = LRUCache(RedisCache(redis.Redis()))
+        with patch("report.conf._cache", cache):
+            with mp.get_context("fork").Pool(1) as pool:
+                pid, pool_pid = pool.apply(connection_pool_pid)
+        self.assertNotEqual(pid, os.getpid())
+        # The pool of the worker was reset as soon as it was forked.
+        self.assertEqual(pool_pid, pid)
+
+
+def connection_pool_pid():
+    connection_pool = conf.get_cache().backend.redis_conn.connection_pool
+    return os.getpid(), connection_pool.pid
+
+
+class TestLRUCache(TestCase):
+    def setUp(self):
+        self.redis = Redis()
+        self.cache = LRUCache(RedisCache(self.redis), max_size=2)
+
+    def test_hits_are_served_from_memory(self):
+        self.cache.set("user-1", {"id": 1})
+        self.redis.round_trips = 0
+        self.assertEqual(self.cache.get_many(["user-1", "user-2"]), [{"id": "1"}, {}])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_ratio, 0.5)
+        # Only the missing key is requested from Redis.
+        self.assertEqual(self.redis.round_trips, 1)
+
+    def test_least_recently_used_key_is_evicted(self):
+        self.cache.set_many({"user-1": {"id": 1}, "user-2": {"id": 2}})
+        self.cache.get("user-1")
+        self.cache.set("user-3", {"id": 3})
+        self.assertEqual(list(self.cache.data), ["user-1", "user-3"])
+        # The evicted key is still in Redis.
+        self.assertEqual(self.cache.get("user-2"), {"id": "2"})
+
+    @patch("report.cache.time.monotonic")
+    def test_keys_expire_from_memory_after_the_ttl_of_their_family(self, monotonic):
+        monotonic.return_value = 0
+        cache = LRUCache(MemoryCache(TTLS), max_size=2)
+        cache.set_many({"user-1": {"id": 1}, "repo-1-languages": {"Python": 10}})
+        monotonic.return_value = 90
+        self.assertEqual(
+            cache.get_many(["user-1", "repo-1-languages"]), [{}, {"Python": "10"}]
+        )
+        self.assertEqual(list(cache.data), ["repo-1-languages"])
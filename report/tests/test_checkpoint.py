@@ -0,0 +1,42 @@
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+from report.checkpoint import CheckpointJournal
+
+
+class TestCheckpointJournal(TestCase):
+    def setUp(self):
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        self.path = os.path.join(report_dir.name, "reports", "checkpoint.jsonl")
+
+    def test_load_without_journal(self):
+        self.assertEqual(CheckpointJournal(self.path).load(), ({}, {}))
+
+    def test_the_last_entry_of_a_repository_wins(self):
+        result = {"id": 1, "repo": "repo-1", "users": [], "languages": []}
+        failure = {"id": 2, "repo": "repo-2", "error": "Server Error"}
+        with CheckpointJournal(self.path).open() as journal:
+            journal.record_failure(dict(result, error="Server Error"))
+            journal.record(result)
+            journal.record_failure(failure)
+        self.assertEqual(
+            CheckpointJournal(self.path).load(), ({1: result}, {2: failure})
+        )
+
+    def test_resume_keeps_the_journal_and_ignores_a_cut_line(self):
+        result = {"id": 1, "repo": "repo-1", "users": [], "languages": []}
+        with CheckpointJournal(self.path).open() as journal:
+            journal.record(result)
+        with open(self.path, "a") as journal_file:
+            journal_file.write('{"id": 2, "repo"')
+        other = {"id": 3, "repo": "repo-3", "users": [], "languages": []}
+        with CheckpointJournal(self.path).open(resume=True) as journal:
+            journal.record(other)
+        self.assertEqual(CheckpointJournal(self.path).load()[0], {1: result, 3: other})
+
+    def test_pickle_an_open_journal(self):
+        with CheckpointJournal(self.path).open() as journal:
+            self.assertIsNone(pickle.loads(pickle.dumps(journal))._file)
@@ -0,0 +1,105 @@
+import pickle
+from unittest import TestCase
+from unittest.mock import patch
+
+from github import GithubException
+
+from report.cache import MemoryCache
+from report.client import GithubClient
+
+from .server import FakeGithub, FakeGithubServer
+
+
+class TestGithubClient(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=5, contributors=3)).start()
+        self.client = GithubClient("AUTH_KEY", base_url=self.server.url, per_page=2)
+        patcher = patch("report.conf._cache", MemoryCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_get_organization_repos_follow_pagination(self):
+        organization = self.client.get_organization("fake-org")
+        repos = organization.get_repos()
+        self.assertEqual(organization.name, "Fake-Org")
+        # The pages after the first one land in any order.
+        self.assertCountEqual(
+            [repo.name for repo in repos], [f"repo-{i}" for i in range(5)]
+        )
+        self.assertEqual(self.server.calls["repos"], 3)
+
+    def test_pages_are_fetched_concurrently_up_to_the_last_page(self):
+        pages = list(self.client.pages_concurrently("/orgs/fake-org/repos"))
+        self.assertEqual(pages[0].last, 3)
+        self.assertEqual(pages[0].data[0]["name"], "repo-0")
+        self.assertEqual(sorted(len(page.data) for page in pages), [1, 2, 2])
+        self.assertEqual(self.server.calls["repos"], 3)
+        # The number of pages is kept with the conditional requests.
+        cached = list(self.client.pages_concurrently("/orgs/fake-org/repos"))
+        self.assertEqual(cached[0].last, 3)
+        self.assertEqual(self.server.calls["not_modified"], 3)
+
+    @patch("report.client.GithubClient._last", return_value=None)
+    def test_pages_without_the_last_page_are_followed(self, last_mock):
+        pages = list(self.client.pages_concurrently("/orgs/fake-org/repos"))
+        self.assertEqual(
+            [page.data[0]["name"] for page in pages], ["repo-0", "repo-2", "repo-4"]
+        )
+
+    def test_contributors_are_fetched_in_concurrent_pages_of_100(self):
+        self.server.github = FakeGithub(repos=1, contributors=250)
+        repo = self.client.get_organization("fake-org").get_repos()[0]
+        contributors = repo.get_contributors()
+        self.assertCountEqual(
+            [user.login for user in contributors], [f"user{i}" for i in range(250)]
+        )
+        self.assertEqual(self.server.calls["contributors"], 3)
+
+    def test_contributors_pages_are_fetched_up_to_the_pool_size(self):
+        client = GithubClient("AUTH_KEY", base_url=self.server.url, pool_size=3)
+        repo = client.get_organization("fake-org").get_repos()[0]
+        with patch.object(
+            client, "pages_concurrently", wraps=client.pages_concurrently
+        ) as pages_mock:
+            repo.get_contributors()
+        self.assertEqual(pages_mock.call_args.kwargs["concurrency"], 3)
+
+    def test_contributors_are_completed_lazily(self):
+        repo = self.client.get_organization("fake-org").get_repos()[0]
+        contributors = repo.get_contributors()
+        self.assertEqual(
+            [user.login for user in contributors], ["user0", "user1", "user2"]
+        )
+        self.assertEqual(self.server.calls["user"], 0)
+        self.assertEqual(contributors[0].name, "User 0")
+        self.assertEqual(contributors[0].email, "user0@example.com")
+        self.assertEqual(self.server.calls["user"], 1)
+
+    def test_get_languages(self):
+        repo = self.client.get_organization("fake-org").get_repos()[0]
+        self.assertEqual(repo.get_languages(), {"Python": 1000, "JavaScript": 2000})
+
+    def test_repositories_are_pickled_without_the_client(self):
+        repo = self.client.get_organization("fake-org").get_repos()[0]
+        copy = pickle.loads(pickle.dumps(repo))
+        self.assertIsNone(copy._client)
+        copy.attach(self.client)
+        self.assertEqual(copy.get_languages(), {"Python": 1000, "JavaScript": 2000})
+
+    def test_error_raises_github_exception(self):
+        with self.assertRaises(GithubException) as error:
+            self.client.get_organization("unknown")
+        self.assertEqual(error.exception.status, 404)
+        self.assertEqual(error.exception.data["message"], "Not Found")
+
+    def test_conditional_request_is_served_from_the_cache(self):
+        repo = self.client.get_organization("fake-org").get_repos()[0]
+        self.assertTrue(self.client.get("/repos/fake-org/repo-0/languages").modified)
+        page = self.client.get("/repos/fake-org/repo-0/languages")
+        self.assertFalse(page.modified)
+        self.assertEqual(page.data, repo.get_languages())
+        self.assertFalse(repo.modified)
+        self.assertEqual(self.server.calls["not_modified"], 2)
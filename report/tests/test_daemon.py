@@ -0,0 +1,267 @@
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from report.cache import MemoryCache
+from report.client import Repository
+from report.daemon import ReportDaemon, to_repository_data
+from report.filters import RepositoryFilter
+from report.github import GithubContributorsReport
+from report.index import ContributorsIndex
+
+from .server import FakeGithub, FakeGithubServer
+
+WEBHOOKS = os.path.join(os.path.dirname(__file__), "webhooks")
+SECRET = "WEBHOOK_SECRET"
+
+
+def user(index):
+    return {
+        "id": 1000 + index,
+        "login": f"user{index}",
+        "name": f"User {index}",
+        "email": "",
+    }
+
+
+class TestContributorsIndex(TestCase):
+    def setUp(self):
+        self.index = ContributorsIndex()
+        self.users = {1000 + index: user(index) for index in range(3)}
+        self.index.add(
+            {"id": 1, "repo": "api", "users": [user(0), user(1)], "languages": ["Go"]},
+            self.users,
+        )
+        self.index.add(
+            {"id": 2, "repo": "web", "users": [user(1)], "languages": ["Go", "CSS"]},
+            self.users,
+        )
+
+    def test_users_and_languages_are_indexed(self):
+        self.assertEqual(
+            self.index.get_user("USER1"),
+            {"user": user(1), "repos": ["api", "web"], "languages": ["CSS", "Go"]},
+        )
+        self.assertEqual(
+            self.index.get_language("go"),
+            {
+                "language": "Go",
+                "users": [dict(user(1), repos=2), dict(user(0), repos=1)],
+            },
+        )
+        self.assertEqual(self.index.get_repo("web")["users"], [user(1)])
+        self.assertIsNone(self.index.get_user("user2"))
+
+    def test_repositories_are_replaced_and_removed(self):
+        self.index.add(
+            {"id": 2, "repo": "web", "users": [user(2)], "languages": ["Rust"]},
+            self.users,
+        )
+        self.assertEqual(self.index.get_user("user1")["repos"], ["api"])
+        self.assertIsNone(self.index.get_language("css"))
+        self.assertTrue(self.index.remove(1))
+        self.assertFalse(self.index.remove(1))
+        self.assertIsNone(self.index.get_user("user0"))
+        self.assertIsNone(self.index.get_language("go"))
+        self.assertEqual(
+            self.index.stats(), {"repositories": 1, "users": 1, "languages": 1}
+        )
+
+    def test_renamed_repositories_keep_their_contributors(self):
+        self.assertTrue(self.index.rename(1, "api-v2"))
+        self.assertIsNone(self.index.get_repo("api"))
+        self.assertEqual(self.index.get_user("user0")["repos"], ["api-v2"])
+
+
+class TestReportDaemon(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=6, contributors=2)).start()
+        self.addCleanup(self.server.stop)
+        self.cache = MemoryCache()
+        for patcher in (
+            patch("report.conf._cache", self.cache),
+            patch("builtins.print"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        report_dir = tempfile.TemporaryDirectory()
+        self.report_path = report_dir.name
+        self.addCleanup(report_dir.cleanup)
+
+    def _start(self, repo_filter=None, crawl=True):
+        report = GithubContributorsReport(
+            "AUTH_KEY",
+            "fake-org",
+            self.report_path,
+            engine="async",
+            concurrency=4,
+            base_url=self.server.url,
+            repo_filter=repo_filter,
+        )
+        self.daemon = ReportDaemon(report, port=0, secret=SECRET).start()
+        self.addCleanup(self.daemon.stop)
+        if crawl:
+            self.daemon.crawl()
+        return self.daemon
+
+    def get(self, path):
+        return requests.get(f"{self.daemon.url}{path}")
+
+    def replay(self, name, event=None, secret=SECRET):
+        """Post a recorded webhook payload to the daemon like Github delivers it."""
+        with open(os.path.join(WEBHOOKS, f"{name}.json"), mode="rb") as payload_file:
+            body = payload_file.read()
+        digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        response = requests.post(
+            f"{self.daemon.url}/webhook",
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-GitHub-Event": event or name.split("_")[0],
+                "X-Hub-Signature-256": f"sha256={digest}",
+            },
+        )
+        self.daemon.join()
+        return response
+
+    def test_queries_are_answered_from_the_index(self):
+        self._start()
+        self.server.calls.clear()
+        response = self.get("/users/user0")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["repos"], ["repo-0", "repo-5"])
+        self.assertEqual(response.json()["user"]["name"], "User 0")
+        users = self.get("/languages/python").json()["users"]
+        self.assertEqual({data["login"] for data in users}, {"user0", "user1"})
+        self.assertEqual(
+            [data["login"] for data in self.get("/repos/repo-1").json()["users"]],
+            ["user1", "user2"],
+        )
+        self.assertEqual(self.get("/users/unknown").status_code, 404)
+        self.assertEqual(self.get("/status").json()["repositories"], 6)
+        self.assertEqual(sum(self.server.calls.values()), 0)
+
+    def test_the_report_is_exported_on_demand(self):
+        self._start()
+        response = self.get("/report")
+        self.assertEqual(response.headers["Content-Type"], "text/csv")
+        rows = {row["Login"]: row for row in csv.DictReader(io.StringIO(response.text))}
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows["user0"]["Repositories"], "repo-0, repo-5")
+
+    def test_push_fetches_the_repository_again(self):
+        self._start()
+        self.server.github.repos["repo-1"]["contributors"] = ["user0"]
+        self.server.github.repos["repo-1"]["languages"] = {"Haskell": 100}
+        self.server.calls.clear()
+        self.assertEqual(self.replay("push").status_code, 202)
+        self.assertEqual(self.server.calls["contributors"], 1)
+        self.assertEqual(self.server.calls["languages"], 1)
+        self.assertEqual(self.server.calls["repos"], 0)
+        self.assertEqual(
+            self.get("/users/user0").json()["repos"], ["repo-0", "repo-1", "repo-5"]
+        )
+        self.assertEqual(self.get("/users/user2").json()["repos"], ["repo-2"])
+        self.assertEqual(
+            [data["login"] for data in self.get("/languages/haskell").json()["users"]],
+            ["user0"],
+        )
+        self.assertEqual(self.get("/status").json()["events"], {"push": 1})
+
+    def test_push_replaces_the_snapshot_of_the_repository(self):
+        self._start()
+        self.server.github.repos["repo-1"]["contributors"] = ["user0"]
+        self.replay("push")
+        with open(os.path.join(WEBHOOKS, "push.json")) as payload_file:
+            data = to_repository_data(json.load(payload_file)["repository"])
+        repo = Repository(None, data)
+        snapshots = self.daemon.report.service.get_snapshots([repo])
+        self.assertEqual(
+            [user["login"] for user in snapshots[repo.id]["users"]], ["user0"]
+        )
+
+    def test_users_expired_from_the_cache_are_fetched_again(self):
+        self._start()
+        self.server.github.users["user1"]["name"] = "Renamed"
+        self.replay("push")
+        self.assertEqual(self.get("/users/user1").json()["user"]["name"], "User 1")
+        # The users expire from the cache after its TTL.
+        self.cache.data.clear()
+        self.replay("push")
+        self.assertEqual(self.get("/users/user1").json()["user"]["name"], "Renamed")
+
+    def test_repository_events_update_the_index(self):
+        self._start(RepositoryFilter(skip_archived=True))
+        self.server.github.repos["repo-6"] = dict(
+            self.server.github.repos["repo-0"],
+            id=106,
+            name="repo-6",
+            full_name="fake-org/repo-6",
+            contributors=["user5"],
+        )
+        self.server.calls.clear()
+        self.replay("repository_renamed")
+        self.assertEqual(self.get("/repos/repo-2").status_code, 404)
+        self.assertEqual(self.get("/repos/repo-2-renamed").status_code, 200)
+        self.replay("repository_deleted")
+        self.replay("repository_archived")
+        self.assertEqual(self.get("/repos/repo-3").status_code, 404)
+        self.assertEqual(self.get("/repos/repo-4").status_code, 404)
+        self.assertEqual(self.get("/users/user4").status_code, 404)
+        # Only the new repository is fetched.
+        self.assertEqual(sum(self.server.calls.values()), 0)
+        self.replay("repository_created")
+        self.assertEqual(self.server.calls["contributors"], 1)
+        self.assertEqual(self.get("/users/user5").json()["repos"], ["repo-5", "repo-6"])
+
+    def test_member_events_fetch_the_repository_again(self):
+        self._start()
+        self.server.github.repos["repo-5"]["contributors"].append("user3")
+        self.assertEqual(self.replay("member_added").status_code, 202)
+        self.assertIn("repo-5", self.get("/users/user3").json()["repos"])
+
+    def test_events_received_while_crawling_are_applied_after(self):
+        self._start(crawl=False)
+        self.server.github.repos["repo-1"]["contributors"] = ["user0"]
+        self.assertEqual(self.replay_later("push").status_code, 202)
+        self.assertEqual(self.get("/users/user0").status_code, 503)
+        self.daemon.crawl()
+        self.daemon.join()
+        self.assertEqual(
+            self.get("/users/user0").json()["repos"], ["repo-0", "repo-1", "repo-5"]
+        )
+
+    def replay_later(self, name):
+        # Joining the events would wait for the crawl.
+        with patch.object(self.daemon, "join"):
+            return self.replay(name)
+
+    def test_other_deliveries_are_ignored(self):
+        self._start()
+        self.server.calls.clear()
+        self.assertEqual(self.replay("ping").status_code, 200)
+        self.assertEqual(self.replay("push", secret="WRONG").status_code, 401)
+        with open(os.path.join(WEBHOOKS, "push.json")) as payload_file:
+            payload = json.load(payload_file)
+        self.assertIsNotNone(
+            self.daemon.receive("push", dict(payload, ref="refs/heads/feature"))
+        )
+        payload["repository"]["owner"]["login"] = "other-org"
+        self.assertIsNotNone(self.daemon.receive("push", payload))
+        self.daemon.join()
+        self.assertEqual(sum(self.server.calls.values()), 0)
+
+    def test_graphql_is_not_served(self):
+        report = GithubContributorsReport(
+            "AUTH_KEY", "fake-org", self.report_path, api="graphql"
+        )
+        with self.assertRaises(ValueError):
+            ReportDaemon(report)
@@ -0,0 +1,54 @@
+import threading
+import time
+from unittest import TestCase
+
+from report.deferred import DeferredQueue
+
+
+class TestDeferredQueue(TestCase):
+    def test_parked_items_are_yielded_when_they_are_due(self):
+        queue = DeferredQueue(delay=0.05, deadline=10)
+        queue.start()
+        self.assertTrue(queue.park("repo", "repo"))
+        queue.finish()
+        start = time.monotonic()
+        items = []
+        for item in queue:
+            items.append(item)
+            # Every item yielded is in flight until it's finished.
+            queue.finish()
+        self.assertEqual(items, ["repo"])
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertEqual(queue.attempts("repo"), 1)
+
+    def test_the_delay_is_doubled_until_the_deadline(self):
+        queue = DeferredQueue(delay=1, deadline=1.5)
+        self.assertTrue(queue.park("repo", "repo"))
+        # The second retry would be 2 seconds later, after the deadline.
+        self.assertFalse(queue.park("repo", "repo"))
+        self.assertEqual(queue.attempts("repo"), 1)
+
+    def test_the_deadline_starts_when_an_item_is_first_parked(self):
+        queue = DeferredQueue(delay=0.05, deadline=0.1)
+        self.assertTrue(queue.park("first", "first"))
+        time.sleep(0.1)
+        # An item parked later gets its own deadline.
+        self.assertTrue(queue.park("late", "late"))
+        self.assertFalse(queue.park("first", "first"))
+
+    def test_iteration_waits_for_the_items_in_flight(self):
+        queue = DeferredQueue(delay=0.01, deadline=10)
+        queue.start()
+
+        def finish():
+            # The item in flight is parked again before it's finished.
+            time.sleep(0.05)
+            queue.park("late", "late")
+            queue.finish()
+
+        threading.Thread(target=finish).start()
+        items = []
+        for item in queue:
+            items.append(item)
+            queue.finish()
+        self.assertEqual(items, ["late"])
@@ -0,0 +1,237 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from report import conf
+from report.cache import LRUCache, RedisCache
+from report.distributed import Worker, WorkQueue
+from report.github import GithubContributorsReport
+
+from .objects import Redis
+from .server import FakeGithub, FakeGithubServer
+from .test_github import repos_by_user
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+class TestWorkQueue(TestCase):
+    def setUp(self):
+        self.redis = Redis()
+        self.queue = WorkQueue(self.redis, prefix="test", lease=60)
+
+    def test_tasks_are_taken_in_order_and_their_results_returned(self):
+        job_id = self.queue.create_job({"organization": "fake-org"})
+        self.assertEqual(self.queue.get_job(job_id), {"organization": "fake-org"})
+        self.queue.put(job_id, 0, {"id": 1})
+        self.queue.put(job_id, 1, {"id": 2})
+        task = self.queue.take()
+        self.assertIn('"task": 0', task)
+        self.assertEqual(self.redis.zrangebyscore("test:leases", "-inf", "inf"), [task])
+        self.queue.complete(task, {"id": 1})
+        self.assertEqual(self.queue.get_result(job_id), (0, {"id": 1}))
+        self.assertEqual(self.redis.lrange("test:processing", 0, -1), [])
+        self.assertEqual(self.redis.zrangebyscore("test:leases", "-inf", "inf"), [])
+        self.queue.delete_job(job_id)
+        self.assertIsNone(self.queue.get_job(job_id))
+
+    def test_expired_leases_are_delivered_again_first(self):
+        job_id = self.queue.create_job({})
+        for task_id in range(3):
+            self.queue.put(job_id, task_id, {"id": task_id})
+        task = self.queue.take()
+        self.assertEqual(self.queue.reap(), 0)
+        self.redis.zadd("test:leases", {task: 0})
+        self.assertEqual(self.queue.reap(), 1)
+        self.assertEqual(self.queue.take(), task)
+
+    def test_tasks_delivered_too_many_times_fail(self):
+        queue = WorkQueue(self.redis, prefix="test", lease=60, deliveries=2)
+        job_id = queue.create_job({})
+        queue.put(job_id, 0, {"id": 1, "name": "repo-1"})
+        with patch("builtins.print"):
+            for delivered in (1, 0):
+                task = queue.take()
+                self.redis.zadd("test:leases", {task: 0})
+                self.assertEqual(queue.reap(), delivered)
+        task_id, result = queue.get_result(job_id)
+        self.assertEqual((task_id, result["repo"]), (0, "repo-1"))
+        self.assertIn("error", result)
+        self.assertIsNone(queue.take())
+        self.assertEqual(self.redis.hgetall("test:deliveries"), {})
+
+    def test_tasks_taken_without_a_lease_get_one(self):
+        job_id = self.queue.create_job({})
+        self.queue.put(job_id, 0, {"id": 0})
+        # The worker died between taking the task and leasing it.
+        task = self.redis.brpoplpush("test:pending", "test:processing")
+        self.assertEqual(self.queue.reap(), 0)
+        self.assertEqual(self.redis.zrangebyscore("test:leases", "-inf", "inf"), [task])
+
+    def test_imap_keeps_the_first_result_of_every_task(self):
+        job_id = self.queue.create_job({})
+
+        def work():
+            while True:
+                task = self.queue.take()
+                if task is None:
+                    return
+                # Completed twice, like a task delivered again.
+                self.queue.complete(task, {"task": task})
+                self.queue.complete(task, {"task": task})
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        results = list(self.queue.imap(job_id, ({"id": n} for n in range(5))))
+        thread.join()
+        self.assertEqual(len(results), 5)
+
+
+class TestDistributedEngine(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=6, contributors=2)).start()
+        self.addCleanup(self.server.stop)
+        self.redis = Redis()
+        for patcher in (
+            patch("report.conf._cache", LRUCache(RedisCache(Redis()))),
+            patch("report.conf.get_redis", return_value=self.redis),
+            patch("report.distributed.REAP_INTERVAL", 0),
+            patch("builtins.print"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        report_dir = tempfile.TemporaryDirectory()
+        self.report_path = report_dir.name
+        self.addCleanup(report_dir.cleanup)
+        self.stopped = threading.Event()
+        self.addCleanup(self.stopped.set)
+
+    def _report(self, engine):
+        return GithubContributorsReport(
+            "AUTH_KEY",
+            "fake-org",
+            self.report_path,
+            engine=engine,
+            concurrency=4,
+            base_url=self.server.url,
+        )
+
+    def _start_worker(self):
+        worker = Worker("AUTH_KEY", WorkQueue(self.redis), concurrency=2)
+        threading.Thread(target=worker.run, args=(self.stopped,)).start()
+        return worker
+
+    def test_workers_crawl_the_repositories(self):
+        workers = [self._start_worker(), self._start_worker()]
+        results = self._report("distributed")._run()
+        self.assertEqual(
+            repos_by_user(results), repos_by_user(self._report("async")._run())
+        )
+        self.assertEqual(sum(worker.completed for worker in workers), 6)
+        # The job is deleted with its results.
+        self.assertEqual(
+            [key for key in self.redis.data if ":job:" in key or ":results:" in key],
+            [],
+        )
+
+    @patch.dict(conf.settings, QUEUE_LEASE=0.2)
+    def test_repositories_of_a_dead_worker_are_delivered_again(self):
+        queue = WorkQueue(self.redis)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._report("distributed")._run)
+            # A worker takes a repository and dies before completing it.
+            while queue.take() is None:
+                pass
+            worker = self._start_worker()
+            results = future.result(timeout=30)
+        self.assertEqual(
+            repos_by_user(results), repos_by_user(self._report("async")._run())
+        )
+        # A slow repository may be delivered again too.
+        self.assertGreaterEqual(worker.completed, 6)
+
+    def test_graphql_is_not_distributed(self):
+        with self.assertRaises(ValueError):
+            GithubContributorsReport(
+                "AUTH_KEY", "fake-org", self.report_path, "distributed", api="graphql"
+            )
+
+
+@skipUnless(shutil.which("redis-server"), "redis-server is not installed")
+class TestDistributedWorkers(TestCase):
+    """The coordinator and worker processes against a local Redis server."""
+
+    def setUp(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.redis_url = f"redis://127.0.0.1:{port}/0"
+        redis_server = subprocess.Popen(
+            ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL,
+        )
+        self.addCleanup(redis_server.wait)
+        self.addCleanup(redis_server.terminate)
+        for patcher in (
+            patch.dict(conf.settings, REDIS_URL=self.redis_url),
+            patch("report.conf._cache", LRUCache(RedisCache(Redis()))),
+            patch("builtins.print"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        redis_conn = conf.get_redis()
+        for _ in range(100):
+            try:
+                redis_conn.ping()
+                break
+            except Exception:
+                time.sleep(0.05)
+        self.server = FakeGithubServer(FakeGithub(repos=8, contributors=2)).start()
+        self.addCleanup(self.server.stop)
+        report_dir = tempfile.TemporaryDirectory()
+        self.report_path = report_dir.name
+        self.addCleanup(report_dir.cleanup)
+
+    def _start_worker(self):
+        worker = subprocess.Popen(
+            [
+                sys.executable,
+                "report.py",
+                "--worker",
+                "--auth-key",
+                "AUTH_KEY",
+                "--redis-url",
+                self.redis_url,
+                "--concurrency",
+                "2",
+            ],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+        self.addCleanup(worker.wait)
+        self.addCleanup(worker.terminate)
+        return worker
+
+    def _report(self, engine):
+        return GithubContributorsReport(
+            "AUTH_KEY",
+            "fake-org",
+            self.report_path,
+            engine=engine,
+            base_url=self.server.url,
+        )
+
+    def test_worker_processes_crawl_the_repositories(self):
+        self._start_worker()
+        self._start_worker()
+        self.assertEqual(
+            repos_by_user(self._report("distributed")._run()),
+            repos_by_user(self._report("async")._run()),
+        )
@@ -0,0 +1,59 @@
+import threading
+from unittest import TestCase
+
+from report.engines import AsyncEngine, PoolEngine
+
+
+def square(number):
+    return number * number
+
+
+def fail(number):
+    raise ValueError(number)
+
+
+class Square:
+    def __call__(self, number):
+        return number * number
+
+    def __reduce__(self):
+        raise TypeError("The function is pickled with the tasks")
+
+
+class TestEngines(TestCase):
+    def test_imap_yields_every_result(self):
+        for engine in (PoolEngine(2), AsyncEngine(4)):
+            self.assertCountEqual(
+                engine.imap(square, range(10)), [square(n) for n in range(10)]
+            )
+
+    def test_pool_hands_the_function_once_to_every_worker(self):
+        self.assertCountEqual(
+            PoolEngine(2).imap(Square(), range(10)), [square(n) for n in range(10)]
+        )
+        self.assertEqual(PoolEngine(2).map(Square(), range(3)), [0, 1, 4])
+
+    def test_async_imap_yields_results_as_they_complete(self):
+        results = AsyncEngine(4).imap(square, range(10))
+        # The first result is available before the others are consumed.
+        self.assertIn(next(results), [square(n) for n in range(10)])
+        self.assertEqual(len(list(results)), 9)
+
+    def test_async_imap_raises_the_errors(self):
+        with self.assertRaises(ValueError):
+            list(AsyncEngine(4).imap(fail, range(3)))
+
+    def test_async_imap_starts_before_the_iterable_is_exhausted(self):
+        started = threading.Event()
+
+        def items():
+            yield 1
+            # The first item is in flight before the second one is produced.
+            self.assertTrue(started.wait(timeout=5))
+            yield 2
+
+        def call(number):
+            started.set()
+            return number
+
+        self.assertCountEqual(AsyncEngine(4).imap(call, items()), [1, 2])
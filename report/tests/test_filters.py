@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+from report.client import Repository
+from report.filters import RepositoryFilter
+from report.parsers import GraphQLRepository
+
+
+def repository(**data):
+    return Repository(
+        None,
+        dict(
+            {
+                "id": 1,
+                "name": "api-server",
+                "fork": False,
+                "archived": False,
+                "size": 100,
+                "pushed_at": "2021-07-01T00:00:00Z",
+                "topics": ["python"],
+                "visibility": "public",
+            },
+            **data,
+        ),
+    )
+
+
+class TestRepositoryFilter(TestCase):
+    def test_names_are_matched_by_glob_patterns(self):
+        repo_filter = RepositoryFilter(include=["API-*"], exclude=["*-legacy"])
+        self.assertTrue(repo_filter.match(repository()))
+        self.assertFalse(repo_filter.match(repository(name="web")))
+        self.assertFalse(repo_filter.match(repository(name="api-legacy")))
+
+    def test_metadata_of_the_listing_are_matched(self):
+        self.assertFalse(RepositoryFilter(skip_forks=True).match(repository(fork=True)))
+        self.assertFalse(
+            RepositoryFilter(skip_archived=True).match(repository(archived=True))
+        )
+        self.assertFalse(RepositoryFilter(skip_empty=True).match(repository(size=0)))
+        self.assertFalse(RepositoryFilter(topics=["go"]).match(repository()))
+        self.assertFalse(
+            RepositoryFilter(visibility="private").match(repository(visibility=None))
+        )
+        self.assertTrue(
+            RepositoryFilter(visibility="private").match(
+                repository(visibility=None, private=True)
+            )
+        )
+
+    def test_repositories_are_matched_by_their_last_push(self):
+        repo_filter = RepositoryFilter(pushed_since="2021-06-01")
+        self.assertTrue(repo_filter.match(repository()))
+        self.assertFalse(
+            repo_filter.match(repository(pushed_at="2021-05-31T23:59:59Z"))
+        )
+        self.assertFalse(repo_filter.match(repository(pushed_at=None)))
+
+    def test_graphql_repositories_are_matched_like_rest_repositories(self):
+        repo = GraphQLRepository(
+            1, "api-server", [], [], fork=True, size=100, topics=["python"]
+        )
+        self.assertTrue(RepositoryFilter(topics=["python"]).match(repo))
+        self.assertFalse(RepositoryFilter(skip_forks=True).match(repo))
+
+    def test_filters_are_pushed_into_the_listing(self):
+        self.assertEqual(RepositoryFilter().params(), {})
+        self.assertEqual(
+            RepositoryFilter(skip_forks=True).params(), {"type": "sources"}
+        )
+        self.assertEqual(
+            RepositoryFilter(visibility="private").params(), {"type": "private"}
+        )
+        self.assertEqual(
+            RepositoryFilter(skip_forks=True, type="public").params(),
+            {"type": "public"},
+        )
+        self.assertEqual(
+            RepositoryFilter(skip_forks=True, visibility="private").variables(),
+            {"isFork": False, "privacy": "PRIVATE"},
+        )
+        # Github can't list the internal repositories only.
+        self.assertEqual(RepositoryFilter(visibility="internal").variables(), {})
+
+    def test_unknown_filters_are_rejected(self):
+        with self.assertRaises(ValueError):
+            RepositoryFilter(visibility="secret")
+        with self.assertRaises(ValueError):
+            RepositoryFilter(type="unknown")
+        with self.assertRaises(ValueError):
+            RepositoryFilter(pushed_since="yesterday")
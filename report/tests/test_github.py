@@ -0,0 +1,453 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from collections import Counter, deque
+from unittest import TestCase
+from unittest.mock import patch
+
+from report.cache import LRUCache, RedisCache
+from report.filters import RepositoryFilter
+from report.github import GithubContributorsReport
+from report.metrics import metrics
+
+from .objects import Redis
+from .server import FakeGithub, FakeGithubServer
+
+
+def repos_by_user(results):
+    # The repositories are aggregated in the order they complete.
+    return {
+        user_id: (data["user"], sorted(data["repos"]), sorted(data["languages"]))
+        for user_id, data in results.items()
+    }
+
+
+class TestGithubContributorsReport(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=6, contributors=2)).start()
+        self.redis = Redis()
+        self.cache = LRUCache(RedisCache(self.redis))
+        patcher = patch("report.conf._cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        report_dir = tempfile.TemporaryDirectory()
+        self.report_path = report_dir.name
+        self.addCleanup(report_dir.cleanup)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _report(
+        self, engine, api="rest", incremental=True, resume=False, repo_filter=None
+    ):
+        return GithubContributorsReport(
+            "AUTH_KEY",
+            "fake-org",
+            self.report_path,
+            engine=engine,
+            concurrency=4,
+            api=api,
+            incremental=incremental,
+            resume=resume,
+            base_url=self.server.url,
+            repo_filter=repo_filter,
+        )
+
+    def test_async_engine(self):
+        results = self._report("async")._run()
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[1000]["user"]["name"], "User 0")
+        self.assertCountEqual(results[1000]["repos"], ["repo-0", "repo-5"])
+        # The languages of all the repositories of the user.
+        self.assertCountEqual(
+            results[1000]["languages"], ["Python", "JavaScript", "Shell", "Rust"]
+        )
+        self.assertEqual(self.server.calls["languages"], 6)
+        self.assertEqual(self.server.calls["contributors"], 6)
+
+    def test_repositories_are_fetched_while_they_are_listed(self):
+        self.server.hold_listing = 5
+        report = self._report("async")
+        report.github_object.per_page = 1
+        results = report._run()
+        self.assertLess(
+            self.server.log.index("contributors"), self.server.log.index("repos_last")
+        )
+        self.assertEqual(self.server.calls["repos"], 6)
+        self.assertEqual(self.server.calls["contributors"], 6)
+        self.assertEqual(
+            repos_by_user(results),
+            repos_by_user(self._report("async", incremental=False)._run()),
+        )
+
+    def test_largest_repositories_are_fetched_first(self):
+        self.server.github.repos["repo-3"]["size"] = 10**6
+        report = self._report("async")
+        repos = report._iter_stale_repositories(dict(), deque(), Counter())
+        self.assertEqual(
+            [repo.name for repo in repos],
+            ["repo-3", "repo-5", "repo-4", "repo-2", "repo-1", "repo-0"],
+        )
+
+    def test_largest_repositories_of_all_pages_are_fetched_first(self):
+        self.server.github.repos["repo-5"]["size"] = 10**6
+        self.server.github.repos["repo-0"]["size"] = 10**5
+        report = self._report("async")
+        report.github_object.per_page = 2
+        repos = report._iter_stale_repositories(dict(), deque(), Counter())
+        self.assertEqual([repo.name for repo in repos][:2], ["repo-5", "repo-0"])
+        self.assertEqual(self.server.calls["repos"], 3)
+
+    def test_largest_repositories_are_fetched_before_the_listing_is_complete(self):
+        self.server.github.repos["repo-2"]["size"] = 10**6
+        self.server.hold_listing = 5
+        report = self._report("async")
+        report.github_object.per_page = 1
+        repos = report._iter_stale_repositories(dict(), deque(), Counter())
+        # More repositories than the engine runs at once are listed before the last page.
+        self.assertEqual(next(repos).name, "repo-2")
+        self.assertEqual(self.server.calls["repos_last"], 0)
+        self.server.contributors_requested.set()
+        self.assertEqual(len(list(repos)), 5)
+        self.assertEqual(self.server.calls["repos_last"], 1)
+
+    def test_users_are_fetched_once_for_the_report(self):
+        report = self._report("async")
+        results = report._run()
+        # Every user contributed to two repositories.
+        self.assertEqual(self.server.calls["user"], 6)
+        self.assertEqual(set(report.service.resolver.calls), set(results))
+        self.assertEqual(set(report.service.resolver.calls.values()), {1})
+
+    @patch("report.retry.RetryPolicy.delay", return_value=0)
+    def test_report_survives_server_errors_and_connection_resets(self, delay):
+        expected = repos_by_user(self._report("async", incremental=False)._run())
+        self.server.faults.update(error=4, reset=7)
+        self.server.calls.clear()
+        results = self._report("async", incremental=False)._run()
+        self.assertGreater(self.server.calls["injected_error"], 0)
+        self.assertGreater(self.server.calls["injected_reset"], 0)
+        self.assertEqual(repos_by_user(results), expected)
+
+    def test_empty_repositories_are_not_failures(self):
+        self.server.github.repos["repo-1"]["contributors"] = []
+        self.server.github.repos["repo-1"]["languages"] = {}
+        report = self._report("async")
+        results = report._run()
+        self.assertEqual(report.failures, [])
+        self.assertNotIn(
+            "repo-1", {repo for data in results.values() for repo in data["repos"]}
+        )
+
+    def test_pool_engine_matches_async_engine(self):
+        # The workers of the pool don't share the cache of the tests.
+        self.assertEqual(
+            repos_by_user(self._report("pool")._run()),
+            repos_by_user(self._report("async")._run()),
+        )
+
+    def test_warm_cache_uses_one_round_trip_per_stage(self):
+        results = self._report("async")._run()
+        # Another process doesn't share the memory of the LRU.
+        self.cache.data.clear()
+        self.redis.round_trips = 0
+        self.server.calls.clear()
+        self.assertEqual(
+            repos_by_user(self._report("async", incremental=False)._run()),
+            repos_by_user(results),
+        )
+        # One lookup for the languages of the organization and one for the users, then
+        # one for the validators of every conditional request and one for the snapshots.
+        self.assertEqual(self.redis.round_trips, 2 + 8 + 1)
+        self.assertEqual(self.server.calls["languages"], 0)
+        self.assertEqual(self.server.calls["user"], 0)
+
+    def test_graphql_api_matches_rest_api(self):
+        results = self._report("async", api="graphql")._run()
+        self.assertEqual(self.server.calls["graphql"], 1)
+        self.assertEqual(self.server.calls["user"], 0)
+        self.assertEqual(
+            repos_by_user(results), repos_by_user(self._report("async")._run())
+        )
+
+    def _set_repository_metadata(self):
+        repos = self.server.github.repos
+        repos["repo-0"]["fork"] = True
+        repos["repo-1"]["archived"] = True
+        repos["repo-2"]["visibility"] = "private"
+        repos["repo-3"]["topics"] = ["legacy"]
+
+    def test_graphql_api_has_no_stats(self):
+        for option in ("stats", "line_stats"):
+            with self.assertRaises(ValueError):
+                GithubContributorsReport(
+                    "AUTH_KEY",
+                    "fake-org",
+                    self.report_path,
+                    api="graphql",
+                    **{option: True},
+                )
+
+    def test_filtered_repositories_cost_no_requests(self):
+        self._set_repository_metadata()
+        repo_filter = RepositoryFilter(
+            exclude=["repo-5"], skip_forks=True, skip_archived=True, visibility="public"
+        )
+        results = self._report("async", repo_filter=repo_filter)._run()
+        self.assertEqual(
+            {repo for data in results.values() for repo in data["repos"]},
+            {"repo-3", "repo-4"},
+        )
+        # The forks and the private repositories aren't even listed.
+        self.assertEqual(self.server.calls["repos_sources"], 1)
+        self.assertEqual(self.server.calls["contributors"], 2)
+        self.assertEqual(self.server.calls["languages"], 2)
+
+    def test_graphql_api_filters_like_rest_api(self):
+        self._set_repository_metadata()
+        repo_filter = RepositoryFilter(
+            skip_forks=True, visibility="public", topics=["legacy"]
+        )
+        self.assertEqual(
+            repos_by_user(
+                self._report("async", api="graphql", repo_filter=repo_filter)._run()
+            ),
+            repos_by_user(self._report("async", repo_filter=repo_filter)._run()),
+        )
+
+    def test_lru_cache_serves_the_second_report(self):
+        results = self._report("async")._run()
+        self.redis.round_trips = 0
+        self.assertEqual(
+            repos_by_user(self._report("async")._run()), repos_by_user(results)
+        )
+        self.assertEqual(self.redis.round_trips, 0)
+        # The snapshots, the languages and the users are cached, then every response
+        # of the first run is cached with its validators.
+        self.assertEqual(self.cache.misses, 18 + 20)
+        # Only the organization and its repositories are requested again.
+        self.assertEqual(self.cache.hits, 6 + 2 + 6)
+
+    def test_unchanged_repositories_are_served_from_conditional_requests(self):
+        results = self._report("async")._run()
+        self.cache.data.clear()
+        # Only the languages are still in the cache of the previous run.
+        self.cache.backend.redis_conn.data = {
+            key: value
+            for key, value in self.redis.data.items()
+            if not key.startswith("user-")
+        }
+        self.server.github.repos["repo-0"]["contributors"].append("user3")
+        self.server.calls.clear()
+
+        report = self._report("async", incremental=False)
+        with patch("builtins.print") as print_mock:
+            new_results = report._run()
+        print_mock.assert_any_call(
+            "5 repositories were unchanged and 1 were refetched."
+        )
+        self.assertCountEqual(
+            new_results[1003]["repos"], ["repo-0", "repo-2", "repo-3"]
+        )
+        self.assertEqual(len(new_results), len(results))
+        # The organization, the contributors of 5 repositories and the 6 users were
+        # not modified.
+        self.assertEqual(self.server.calls["contributors"], 6)
+        self.assertEqual(self.server.calls["user"], 6)
+        self.assertEqual(self.server.calls["not_modified"], 2 + 5 + 6)
+
+    def test_only_pushed_repositories_are_fetched_again(self):
+        results = self._report("async")._run()
+        self.server.github.repos["repo-0"]["contributors"].append("user3")
+        self.server.github.repos["repo-0"]["pushed_at"] = "2021-07-02T00:00:00Z"
+        self.server.calls.clear()
+
+        with patch("builtins.print") as print_mock:
+            new_results = self._report("async")._run()
+        print_mock.assert_any_call(
+            "5 repositories were unchanged and 1 were refetched."
+        )
+        self.assertEqual(self.server.calls["contributors"], 1)
+        self.assertEqual(self.server.calls["languages"], 0)
+        self.assertCountEqual(
+            new_results[1003]["repos"], ["repo-0", "repo-2", "repo-3"]
+        )
+        self.assertEqual(
+            {
+                user_id: sorted(data["repos"])
+                for user_id, data in new_results.items()
+                if user_id != 1003
+            },
+            {
+                user_id: sorted(data["repos"])
+                for user_id, data in results.items()
+                if user_id != 1003
+            },
+        )
+
+    def test_long_format_writes_a_row_per_contributor_of_every_repository(self):
+        report = self._report("async")
+        report._write_long_report(report._iter_repositories())
+        (filename,) = [
+            filename
+            for filename in os.listdir(self.report_path)
+            if filename.startswith("report_")
+        ]
+        with open(os.path.join(self.report_path, filename)) as report_file:
+            rows = list(csv.reader(report_file))
+        self.assertEqual(rows[0], ["Repository", "Login", "Name", "Email", "Languages"])
+        self.assertEqual(len(rows), 1 + 6 * 2)
+        self.assertIn(
+            ["repo-5", "user0", "User 0", "user0@example.com", "Shell, Rust"], rows
+        )
+        # The users are still fetched once for the whole report.
+        self.assertEqual(self.server.calls["user"], 6)
+
+    def test_failed_repositories_are_reported_and_fetched_on_resume(self):
+        self.server.github.failing.add("repo-2")
+        report = self._report("async", incremental=False)
+        with patch("builtins.print") as print_mock:
+            results = report._run()
+        print_mock.assert_any_call(
+            "1 repositories failed, run the report again with --resume to fetch them: repo-2"
+        )
+        self.assertEqual([failure["repo"] for failure in report.failures], ["repo-2"])
+        self.assertEqual(report.failures[0]["status_code"], 500)
+        self.assertCountEqual(results[1002]["repos"], ["repo-1"])
+
+        self.server.github.failing.clear()
+        self.server.calls.clear()
+        report = self._report("async", incremental=False, resume=True)
+        with patch("builtins.print") as print_mock:
+            results = report._run()
+        print_mock.assert_any_call("5 repositories were resumed from the checkpoint.")
+        # Only the failed repository is fetched again.
+        self.assertEqual(self.server.calls["contributors"], 1)
+        self.assertEqual(report.failures, [])
+        self.assertCountEqual(results[1002]["repos"], ["repo-1", "repo-2"])
+        self.assertEqual(len(results), 6)
+
+    def test_the_checkpoint_is_started_again_without_resume(self):
+        self._report("async", incremental=False)._run()
+        self.server.calls.clear()
+        self._report("async", incremental=False)._run()
+        self.assertEqual(self.server.calls["contributors"], 6)
+        results, errors = self._report("async").journal.load()
+        self.assertEqual(len(results), 6)
+        self.assertEqual(errors, {})
+
+    def test_generate_report_writes_a_profile_next_to_the_csv(self):
+        self._report("async", incremental=False).generate_report()
+        filenames = os.listdir(self.report_path)
+        (profile_filename,) = [
+            filename for filename in filenames if filename.endswith(".profile.json")
+        ]
+        self.assertIn(profile_filename.replace(".profile.json", ".csv"), filenames)
+        with open(os.path.join(self.report_path, profile_filename)) as profile_file:
+            profile = json.load(profile_file)
+        self.assertEqual(profile["latency"]["repository"]["count"], 6)
+        self.assertEqual(profile["latency"]["stage.contributors"]["count"], 6)
+        self.assertEqual(profile["counters"]["api.repos/contributors"], 6)
+        self.assertEqual(profile["counters"]["api.users"], 6)
+        self.assertEqual(
+            profile["counters"]["api.calls"], sum(self.server.calls.values())
+        )
+        self.assertGreater(profile["counters"]["api.bytes"], 0)
+        self.assertEqual(len(profile["slowest_repositories"]), 6)
+        self.assertEqual(profile["rate_limit_consumed"], 1 + 1 + 6 + 6 + 6)
+        self.assertEqual(
+            [(usage["token"], usage["requests"]) for usage in profile["tokens"]],
+            [("****_KEY", 1 + 1 + 6 + 6 + 6)],
+        )
+
+    def test_generate_report_in_compressed_json_lines(self):
+        report = self._report("async")
+        report.output_format, report.compression = "ndjson", "gzip"
+        report.generate_report()
+        (filename,) = [
+            filename
+            for filename in os.listdir(self.report_path)
+            if filename.endswith(".ndjson.gz")
+        ]
+        with gzip.open(os.path.join(self.report_path, filename), "rt") as report_file:
+            rows = {row["Login"]: row for row in map(json.loads, report_file)}
+        self.assertEqual(len(rows), 6)
+        self.assertCountEqual(rows["user0"]["Repositories"], ["repo-0", "repo-5"])
+
+    def test_the_workers_of_the_pool_hand_over_their_metrics(self):
+        report = self._report("pool", incremental=False)
+        report._run()
+        data = metrics.to_dict()
+        self.assertEqual(data["latency"]["repository"]["count"], 6)
+        self.assertEqual(data["counters"]["api.repos/languages"], 6)
+
+    def test_the_workers_of_the_pool_count_the_requests_of_the_tokens(self):
+        report = self._report("pool", incremental=False)
+        report._run()
+        (usage,) = report.github_object.tokens.to_dict()
+        self.assertEqual(usage["requests"], sum(self.server.calls.values()))
+
+    def test_profile_writes_the_stats_of_cprofile(self):
+        report = self._report("async")
+        report.profile = True
+        with patch("builtins.print"):
+            report.generate_report()
+        self.assertEqual(
+            len([f for f in os.listdir(self.report_path) if f.endswith(".prof")]), 1
+        )
+
+    def test_stats_report_ranks_the_contributors_by_their_commits(self):
+        # user0 contributes to a third repository, first with 30 commits.
+        self.server.github.repos["repo-3"]["contributors"].insert(0, "user0")
+        self._report("async")._run()
+        report = self._report("pool")
+        report.stats = report.line_stats = True
+        report.output_format = "ndjson"
+        report.generate_report()
+        # The snapshots of the run without stats were fetched again.
+        self.assertEqual(self.server.calls["stats_contributors"], 6)
+        (filename,) = [
+            filename
+            for filename in os.listdir(self.report_path)
+            if filename.endswith(".ndjson")
+        ]
+        with open(os.path.join(self.report_path, filename)) as report_file:
+            rows = [json.loads(line) for line in report_file]
+        self.assertEqual([row["Rank"] for row in rows], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(
+            {key: rows[0][key] for key in ("Login", "Commits", "Repositories")},
+            {"Login": "user0", "Commits": 60, "Repositories": 3},
+        )
+        self.assertEqual(rows[0]["Additions"], 100 * 60)
+        self.assertEqual(rows[0]["Deletions"], 10 * 60)
+        self.assertEqual([row["Commits"] for row in rows[1:]], [30] * 5)
+        self.assertTrue(rows[0]["Languages"][0].endswith("%"))
+
+    def test_repositories_with_computing_stats_are_retried_later(self):
+        self.server.github.computing = {"repo-1": 2, "repo-4": 1}
+        report = self._report("async")
+        report.line_stats = report.stats = True
+        report.stats_retry_delay = 0.01
+        with patch("builtins.print"):
+            results = report._run_stats()
+        # Every repository is retried until Github computed its stats.
+        self.assertEqual(self.server.calls["stats_contributors"], 6 + 3)
+        self.assertEqual(report.incomplete, [])
+        self.assertEqual(sum(data["additions"] for data in results.values()), 6 * 3000)
+
+    def test_repositories_still_computing_at_the_deadline_are_incomplete(self):
+        self.server.github.computing = {"repo-1": 100}
+        report = self._report("pool")
+        report.line_stats = report.stats = True
+        report.stats_retry_delay, report.stats_deadline = 0.01, 0.1
+        with patch("builtins.print") as print_mock:
+            results = report._run_stats()
+        self.assertEqual(report.incomplete, ["repo-1"])
+        print_mock.assert_any_call(
+            "1 repositories are incomplete, Github was still computing their statistics: repo-1"
+        )
+        # The other repositories and the commits of repo-1 are still reported.
+        self.assertEqual(sum(data["additions"] for data in results.values()), 5 * 3000)
+        self.assertEqual(sum(data["commits"] for data in results.values()), 6 * 30)
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+# The dependencies that are slow to import, they are imported when they are used.
+HEAVY_MODULES = (
+    "asyncio",
+    "cProfile",
+    "github",
+    "multiprocessing",
+    "numpy",
+    "pstats",
+    "pyarrow",
+    "redis",
+    "requests",
+)
+
+
+class TestImports(TestCase):
+    def test_the_report_doesnt_import_its_heavy_dependencies(self):
+        code = (
+            "import sys, report.batch, report.daemon, report.distributed, report.github; "
+            "print(' '.join(name for name in sys.argv[1:] if name in sys.modules))"
+        )
+        imported = subprocess.run(
+            [sys.executable, "-c", code, *HEAVY_MODULES],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        ).stdout.split()
+        self.assertEqual(imported, [])
@@ -0,0 +1,79 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from report.metrics import Histogram, Metrics
+
+
+class TestHistogram(TestCase):
+    def test_quantiles_are_the_upper_bounds_of_the_buckets(self):
+        histogram = Histogram()
+        for seconds in (0.0005, 0.003, 0.003, 0.04, 120):
+            histogram.observe(seconds)
+        data = histogram.to_dict()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["p50"], 0.005)
+        self.assertEqual(data["p99"], 120)
+        self.assertEqual(data["buckets"], {"0.001": 1, "0.005": 2, "0.05": 1, "inf": 1})
+
+
+class TestMetrics(TestCase):
+    def test_disabled_metrics_are_not_collected(self):
+        metrics = Metrics()
+        metrics.count("api.calls")
+        metrics.gauge("rate_limit.remaining", 10)
+        with metrics.timer("stage.users") as timer:
+            pass
+        self.assertIsNone(timer)
+        self.assertEqual(metrics.to_dict()["counters"], {})
+        self.assertEqual(metrics.to_dict()["latency"], {})
+
+    def test_enabled_metrics(self):
+        metrics = Metrics()
+        metrics.enable()
+        metrics.count("cache.hits", 3)
+        metrics.count("cache.misses")
+        for remaining in (99, 90, 95):
+            metrics.gauge("rate_limit.remaining", remaining)
+        with metrics.timer("stage.users"):
+            pass
+        metrics.observe_repository("repo-0", 0.5)
+        data = metrics.to_dict()
+        self.assertEqual(data["cache_hit_ratio"], 0.75)
+        self.assertEqual(
+            data["gauges"]["rate_limit.remaining"], {"first": 99, "last": 95, "min": 90}
+        )
+        self.assertEqual(data["rate_limit_consumed"], 10)
+        self.assertEqual(data["latency"]["stage.users"]["count"], 1)
+        self.assertEqual(
+            data["slowest_repositories"], [{"repo": "repo-0", "seconds": 0.5}]
+        )
+
+    def test_merge_the_metrics_of_a_worker(self):
+        metrics = Metrics()
+        metrics.enable()
+        worker = Metrics()
+        worker.enable()
+        for name in ("repo-0", "repo-1"):
+            metrics.observe_repository(name, 0.1)
+            metrics.count("api.calls")
+            worker.observe_repository(name.replace("0", "2"), 0.2)
+            worker.count("api.calls")
+        metrics.merge(worker.drain())
+        data = metrics.to_dict()
+        self.assertEqual(data["counters"], {"api.calls": 4})
+        self.assertEqual(data["latency"]["repository"]["count"], 4)
+        self.assertEqual(data["slowest_repositories"][0]["seconds"], 0.2)
+        self.assertEqual(worker.to_dict()["counters"], {})
+
+    def test_a_forked_worker_drops_the_metrics_of_the_parent(self):
+        metrics = Metrics()
+        metrics.enable()
+        metrics.count("api.calls")
+        self.assertFalse(metrics.in_worker())
+        with patch("report.metrics.os.getpid", return_value=-1):
+            self.assertTrue(metrics.in_worker())
+            self.assertEqual(metrics.counters, {})
+            metrics.count("api.calls")
+            # Only the first call in the worker drops the metrics.
+            self.assertTrue(metrics.in_worker())
+            self.assertEqual(metrics.counters, {"api.calls": 1})
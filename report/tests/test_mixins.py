@@ -0,0 +1,34 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from report.cache import RedisCache
+from report.mixins import CacheMixin
+
+from .objects import Redis
+
+
+class TestCacheMixin(TestCase):
+    def setUp(self):
+        self.redis = Redis()
+        patcher = patch("report.conf._cache", RedisCache(self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = CacheMixin()
+
+    def test_get_from_cache_is_one_round_trip(self):
+        self.cache.set_into_cache("user-1", {"id": 1, "login": "test"})
+        self.redis.round_trips = 0
+        self.assertEqual(
+            self.cache.get_from_cache("user-1"), {"id": "1", "login": "test"}
+        )
+        self.assertIsNone(self.cache.get_from_cache("user-2"))
+        self.assertEqual(self.redis.round_trips, 2)
+
+    def test_many_keys_are_one_round_trip(self):
+        self.cache.set_many_into_cache({"user-1": {"id": 1}, "user-2": {"id": 2}})
+        self.assertEqual(
+            self.cache.get_many_from_cache(["user-1", "user-2", "user-3"]),
+            [{"id": "1"}, {"id": "2"}, {}],
+        )
+        self.assertEqual(self.redis.round_trips, 2)
+        self.assertEqual(self.redis.commands, 5)
@@ -1,32 +1,22 @@
 from unittest import TestCase
 from unittest.mock import patch
 
-from report.parsers import ContributorParser, LanguageParser, OrganizationParser
-from report.services import ContributorService, LanguageService, OrganizationService
+from report.parsers import (
+    ContributorParser,
+    GraphQLOrganizationParser,
+    LanguageParser,
+)
+from report.services import ContributorService, LanguageService
 
-from .objects import Github, Organization, Repository, NamedUser
-
-
-class TestOrganizationParser(TestCase):
-    def setUp(self):
-        self.github_object = Github("AUTH_KEY")
-
-    @patch("report.services.OrganizationService._request")
-    def test_organization_parser(self, service_mock):
-        org = Organization("test")
-        service_mock.return_value = org
-        service = OrganizationService(self.github_object, "test").request()
-        parser = OrganizationParser(service).parse()
-        self.assertEqual(parser["name"], org.name)
-        self.assertEqual(len(parser["repos"]), len(org.get_repos()))
+from .objects import Github, Repository, NamedUser
 
 
 class TestContributorParser(TestCase):
     def setUp(self):
         self.github_object = Github("AUTH_KEY")
 
-    @patch("report.services.ContributorParser.set_into_cache")
-    @patch("report.services.ContributorParser.get_from_cache", return_value={})
+    @patch("report.services.ContributorParser.set_many_into_cache")
+    @patch("report.services.ContributorParser.get_many_from_cache", return_value=[{}])
     @patch("report.services.ContributorService._request")
     def test_organization_parser_with_disable_cache(
         self, service_mock, parser_from_cache, parser_set_cache
@@ -42,10 +32,10 @@ class TestContributorParser(TestCase):
         self.assertEqual(parser_from_cache.call_count, 1)
         self.assertEqual(parser_set_cache.call_count, 1)
 
-    @patch("report.services.ContributorParser.set_into_cache")
+    @patch("report.services.ContributorParser.set_many_into_cache")
     @patch(
-        "report.services.ContributorParser.get_from_cache",
-        return_value={"id": 123, "login": "test", "name": "Test", "email": ""},
+        "report.services.ContributorParser.get_many_from_cache",
+        return_value=[{"id": 123, "login": "test", "name": "Test", "email": ""}],
     )
     @patch("report.services.ContributorService._request")
     def test_organization_parser_with_enable_cache(
@@ -60,9 +50,31 @@ class TestContributorParser(TestCase):
         self.assertEqual(parser[0]["login"], "test")
         self.assertEqual(parser[0]["name"], "Test")
         self.assertEqual(parser[0]["email"], "")
-        self.assertEqual(parser_from_cache.call_count, 2)
+        self.assertEqual(parser_from_cache.call_count, 1)
         self.assertEqual(parser_set_cache.call_count, 0)
 
+    @patch("report.services.ContributorParser.set_many_into_cache")
+    @patch("report.services.ContributorParser.get_many_from_cache")
+    def test_organization_parser_gets_repo_keys_in_one_lookup(
+        self, parser_from_cache, parser_set_cache
+    ):
+        parser_from_cache.return_value = [{}, {"id": "1", "login": "cached"}]
+        users = [NamedUser(), NamedUser()]
+        parser = ContributorParser(users).parse()
+        self.assertEqual(parser[0]["login"], "testuser")
+        self.assertEqual(parser[1]["login"], "cached")
+        self.assertEqual(parser_from_cache.call_count, 1)
+        parser_set_cache.assert_called_once_with(
+            {
+                "user-123456789": {
+                    "id": 123456789,
+                    "login": "testuser",
+                    "name": "Test User",
+                    "email": "test@test.com",
+                }
+            }
+        )
+
 
 class TestLanguageParser(TestCase):
     def setUp(self):
@@ -74,3 +86,58 @@ class TestLanguageParser(TestCase):
         service = LanguageService(self.github_object, Repository()).request()
         parser = LanguageParser(service).parse()
         self.assertEqual(parser, ["Python", "Go", "JavaScript"])
+
+
+class TestGraphQLOrganizationParser(TestCase):
+    def test_graphql_organization_parser(self):
+        user = {"databaseId": 1, "login": "test", "name": "Test", "email": None}
+        nodes = [
+            {
+                "databaseId": 10,
+                "name": "first",
+                "languages": {
+                    "edges": [
+                        {"size": 300, "node": {"name": "Python"}},
+                        {"size": 100, "node": {"name": "Go"}},
+                    ]
+                },
+                "defaultBranchRef": {
+                    "target": {
+                        "history": {
+                            "nodes": [
+                                {"author": {"user": user}},
+                                {"author": {"user": None}},
+                                {"author": {"user": user}},
+                            ]
+                        }
+                    }
+                },
+            },
+            {
+                "databaseId": 11,
+                "name": "empty",
+                "languages": {"edges": []},
+                "defaultBranchRef": None,
+            },
+        ]
+        parser = GraphQLOrganizationParser({"name": "Test"}, nodes).parse()
+        self.assertEqual(parser["name"], "Test")
+        first, empty = parser["repos"]
+        self.assertEqual(first.name, "first")
+        self.assertEqual(first.languages, ["Python", "Go"])
+        self.assertEqual(first.language_bytes, {"Python": 300, "Go": 100})
+        # The contributions are the commits of the user in the history.
+        self.assertEqual(
+            first.contributors,
+            [
+                {
+                    "id": 1,
+                    "login": "test",
+                    "name": "Test",
+                    "email": "",
+                    "contributions": 2,
+                }
+            ],
+        )
+        self.assertEqual(empty.languages, [])
+        self.assertEqual(empty.contributors, [])
@@ -0,0 +1,262 @@
+import multiprocessing
+import pickle
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from github import GithubException
+
+from report import exceptions
+from report.cache import MemoryCache
+from report.client import GithubClient
+from report.ratelimit import (
+    SECONDARY_RATE_LIMIT_BACKOFF,
+    RateLimitGovernor,
+    TokenPool,
+)
+from report.services import UserService
+
+from .server import FakeGithub, FakeGithubServer
+
+
+def headers(remaining, reset, limit=5000):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(reset),
+    }
+
+
+class TestRateLimitGovernor(TestCase):
+    def test_budget_is_taken_by_every_request(self):
+        governor = RateLimitGovernor()
+        governor.update(headers(4000, int(time.time()) + 60))
+        governor.acquire()
+        governor.acquire()
+        self.assertEqual(governor.remaining, 3998)
+        self.assertFalse(governor.is_exhausted())
+
+    def test_requests_are_paced_when_the_budget_is_low(self):
+        governor = RateLimitGovernor(pace_below=0.1)
+        governor.update(headers(99, 1060, limit=1000))
+        # 99 requests spread over 60 seconds, the concurrent ones take the next slots.
+        self.assertEqual(governor._delay(1000), (0, True))
+        self.assertAlmostEqual(governor._delay(1000)[0], 60 / 99)
+        self.assertAlmostEqual(governor._delay(1000)[0], 2 * 60 / 99, places=1)
+        self.assertAlmostEqual(governor._delay(1030)[0], 0)
+
+    def test_exhausted_budget_waits_until_reset(self):
+        governor = RateLimitGovernor()
+        governor.update(headers(0, 1060))
+        self.assertEqual(governor._delay(1000), (60, False))
+        self.assertEqual(governor._delay(1061), (0, True))
+
+    @patch("report.ratelimit.time.sleep")
+    def test_the_last_unit_of_the_budget_is_sent_without_waiting(self, sleep):
+        governor = RateLimitGovernor(reserve=10)
+        governor.update(headers(11, int(time.time()) + 60, limit=1000))
+        governor.acquire()
+        sleep.assert_not_called()
+        # The next request waits for the reset.
+        delay, ready = governor._delay(time.time())
+        self.assertFalse(ready)
+        self.assertAlmostEqual(delay, 60, delta=2)
+
+    def test_retry_after_blocks_the_requests(self):
+        governor = RateLimitGovernor()
+        self.assertTrue(governor.should_retry(403, {"Retry-After": "30"}))
+        self.assertTrue(governor.is_exhausted())
+        self.assertFalse(governor.should_retry(404, {}))
+        self.assertFalse(
+            RateLimitGovernor(wait=False).should_retry(403, {"Retry-After": "30"})
+        )
+
+    def test_secondary_rate_limit_without_retry_after_backs_off(self):
+        governor = RateLimitGovernor()
+        reset = int(time.time()) + 3600
+        self.assertFalse(
+            governor.should_retry(403, headers(10, reset), "Resource not accessible")
+        )
+        self.assertFalse(governor.is_exhausted())
+        self.assertTrue(
+            governor.should_retry(
+                403, headers(10, reset), "You have exceeded a secondary rate limit"
+            )
+        )
+        self.assertAlmostEqual(
+            governor.blocked_until - time.time(), SECONDARY_RATE_LIMIT_BACKOFF, delta=2
+        )
+        self.assertTrue(RateLimitGovernor().should_retry(429, headers(10, reset)))
+
+    def test_shared_budget_is_spent_by_the_workers(self):
+        context = multiprocessing.get_context("fork")
+        governor = RateLimitGovernor()
+        governor.update(headers(4000, int(time.time()) + 60))
+        governor.share(context)
+        workers = [
+            context.Process(target=lambda: [governor.acquire() for _ in range(5)])
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(governor.remaining, 3990)
+
+    def test_governor_can_be_pickled(self):
+        governor = RateLimitGovernor()
+        governor.update(headers(10, 1060))
+        self.assertEqual(pickle.loads(pickle.dumps(governor)).remaining, 10)
+
+
+class TestGithubClientRateLimit(TestCase):
+    def setUp(self):
+        patcher = patch("report.conf._cache", MemoryCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _client(self, server, wait=True):
+        return GithubClient(
+            "AUTH_KEY",
+            base_url=server.url,
+            conditional=False,
+            governor=RateLimitGovernor(wait=wait),
+        )
+
+    def test_client_waits_until_the_rate_limit_resets(self):
+        with FakeGithubServer(FakeGithub(), rate_limit=3, window=1) as server:
+            client = self._client(server)
+            users = [client.get_user(f"user{index}").name for index in range(5)]
+        self.assertEqual(users, [f"User {index}" for index in range(5)])
+        self.assertEqual(server.calls["rate_limited"], 0)
+        # Never asked for the rate limit.
+        self.assertEqual(server.calls["rate_limit"], 0)
+
+    def test_client_retries_after_secondary_rate_limit(self):
+        with FakeGithubServer(FakeGithub(), secondary_limit_every=2) as server:
+            client = self._client(server)
+            users = [client.get_user(f"user{index}").name for index in range(2)]
+        self.assertEqual(users, ["User 0", "User 1"])
+        self.assertEqual(server.calls["secondary_limited"], 1)
+        self.assertEqual(server.calls["user"], 3)
+
+    def test_service_fails_without_waiting(self):
+        with FakeGithubServer(FakeGithub(), rate_limit=1) as server:
+            client = self._client(server, wait=False)
+            UserService(client, "user0").request()
+            with self.assertRaises(exceptions.RateLimitException):
+                UserService(client, "user1").request()
+            # The request is sent if the budget is not known.
+            client.governor.remaining = None
+            with self.assertRaises(exceptions.ContributorServiceException) as error:
+                UserService(client, "user1").request()
+        self.assertEqual(error.exception.status_code, 403)
+        self.assertEqual(server.calls["rate_limited"], 1)
+
+
+class TestTokenPool(TestCase):
+    def test_tokens_with_the_most_budget_are_selected_first(self):
+        pool = TokenPool(["token-a", "token-b", "token-c"])
+        # The budgets are unknown until the first responses.
+        self.assertEqual(
+            [pool.acquire().key for _ in range(3)], ["token-a", "token-b", "token-c"]
+        )
+        reset = int(time.time()) + 60
+        for token, remaining in zip(pool.tokens, (10, 30, 20)):
+            token.governor.update(headers(remaining, reset))
+        self.assertEqual(pool.acquire().key, "token-b")
+
+    def test_exhausted_tokens_fail_over_without_waiting(self):
+        pool = TokenPool(["token-a", "token-b"], RateLimitGovernor(wait=False))
+        reset = int(time.time()) + 60
+        token_a, token_b = pool.tokens
+        token_b.governor.update(headers(5, reset))
+        self.assertTrue(pool.should_retry(token_a, 403, headers(0, reset)))
+        self.assertEqual(token_a.rate_limited, 1)
+        self.assertEqual(pool.select(), token_b)
+        # When all tokens ran out, the first to reset is selected.
+        self.assertFalse(pool.should_retry(token_b, 403, headers(0, reset - 30)))
+        self.assertEqual(pool.select(), token_b)
+        self.assertTrue(pool.governor.is_exhausted())
+
+    def test_rejected_tokens_are_removed(self):
+        pool = TokenPool(["token-a", "token-b"])
+        token_a, token_b = pool.tokens
+        with patch("builtins.print"):
+            self.assertTrue(pool.should_retry(token_a, 401, {}))
+            self.assertEqual({pool.acquire().key for _ in range(3)}, {"token-b"})
+            # The last token is kept, so the requests fail with the error of Github.
+            self.assertFalse(pool.should_retry(token_b, 401, {}))
+        self.assertEqual(pool.select().key, "token-a")
+        self.assertEqual([usage["revoked"] for usage in pool.to_dict()], [True, True])
+
+    def test_usage_hides_the_tokens(self):
+        pool = TokenPool(["ghp_secret1234", "ghp_secret5678"])
+        pool.acquire()
+        self.assertEqual(
+            [(usage["token"], usage["requests"]) for usage in pool.to_dict()],
+            [("****1234", 1), ("****5678", 0)],
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(pool)).tokens[0].requests, 1)
+
+    def test_shared_tokens_count_the_requests_of_the_workers(self):
+        context = multiprocessing.get_context("fork")
+        pool = TokenPool(["token-a", "token-b"])
+        pool.share(context)
+        pool.share(context)
+
+        def work():
+            for _ in range(3):
+                pool.acquire()
+            with patch("builtins.print"):
+                pool.should_retry(pool.tokens[0], 401, {})
+
+        worker = context.Process(target=work)
+        worker.start()
+        worker.join()
+        pool.acquire()
+        self.assertEqual(sum(token.requests for token in pool.tokens), 4)
+        self.assertEqual([token.revoked for token in pool.tokens], [True, False])
+        self.assertEqual(pool.select().key, "token-b")
+
+
+class TestGithubClientTokenPool(TestCase):
+    def setUp(self):
+        patcher = patch("report.conf._cache", MemoryCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_are_spread_across_the_tokens(self):
+        with FakeGithubServer(FakeGithub(), rate_limit=4) as server:
+            client = GithubClient(
+                ["token-a", "token-b", "token-c"],
+                base_url=server.url,
+                conditional=False,
+                governor=RateLimitGovernor(wait=False),
+            )
+            users = [client.get_user(f"user{index % 3}").name for index in range(12)]
+        self.assertEqual(len(users), 12)
+        self.assertEqual(server.calls["rate_limited"], 0)
+        self.assertEqual(server.token_calls, {"token-a": 4, "token-b": 4, "token-c": 4})
+        self.assertTrue(client.governor.is_exhausted())
+
+    def test_revoked_tokens_fail_over(self):
+        with FakeGithubServer(FakeGithub()) as server:
+            server.revoked.add("token-a")
+            client = GithubClient(
+                ["token-a", "token-b"], base_url=server.url, conditional=False
+            )
+            with patch("builtins.print"):
+                users = [client.get_user(f"user{index}").name for index in range(3)]
+        self.assertEqual(users, ["User 0", "User 1", "User 2"])
+        self.assertEqual(server.calls["unauthorized"], 1)
+        self.assertEqual(server.token_calls["token-b"], 3)
+        self.assertTrue(client.tokens.tokens[0].revoked)
+
+    def test_single_revoked_token_fails(self):
+        with FakeGithubServer(FakeGithub()) as server:
+            server.revoked.add("AUTH_KEY")
+            client = GithubClient("AUTH_KEY", base_url=server.url, conditional=False)
+            with patch("builtins.print"), self.assertRaises(GithubException) as error:
+                client.get_user("user0")
+        self.assertEqual(error.exception.status, 401)
@@ -0,0 +1,142 @@
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from github import GithubException
+
+from report import exceptions
+from report.cache import MemoryCache
+from report.client import GithubClient
+from report.metrics import metrics
+from report.retry import Hedger, RetryPolicy, print_retries
+from report.services import UserService
+
+from .server import FakeGithub, FakeGithubServer
+
+
+class TestRetryPolicy(TestCase):
+    def test_only_transient_errors_are_retried(self):
+        policy = RetryPolicy(retries=2)
+        self.assertTrue(policy.should_retry(0))
+        self.assertTrue(policy.should_retry(0, 502))
+        self.assertFalse(policy.should_retry(0, 404))
+        self.assertFalse(policy.should_retry(0, 501))
+        self.assertFalse(policy.should_retry(2, 502))
+
+    def test_backoff_is_jittered_and_bounded(self):
+        policy = RetryPolicy(backoff=1, max_backoff=4)
+        delays = [policy.delay(attempt) for attempt in range(10) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertTrue(all(policy.delay(0) <= 1 for _ in range(20)))
+
+
+class TestHedger(TestCase):
+    def test_requests_are_hedged_after_the_percentile(self):
+        hedger = Hedger(0.9, min_samples=10, ratio=1)
+        for _ in range(9):
+            hedger.observe("users", 0.01)
+        self.assertIsNone(hedger.delay("users"))
+        hedger.observe("users", 0.01)
+        self.assertEqual(hedger.delay("users"), 0.01)
+        self.assertIsNone(hedger.delay("repos"))
+
+    def test_hedges_are_bounded(self):
+        hedger = Hedger(0.9, ratio=0.1)
+        for _ in range(20):
+            hedger.delay("users")
+        self.assertEqual(sum(hedger.take() for _ in range(5)), 2)
+
+
+class TestGithubClientFaults(TestCase):
+    def setUp(self):
+        for patcher in (
+            patch("report.conf._cache", MemoryCache()),
+            # No backoff, so the tests don't sleep.
+            patch("report.retry.RetryPolicy.delay", return_value=0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        metrics.enable()
+        self.addCleanup(metrics.enable, False)
+
+    def _client(self, server, **kwargs):
+        return GithubClient(
+            "AUTH_KEY", base_url=server.url, conditional=False, **kwargs
+        )
+
+    def test_server_errors_are_retried(self):
+        with FakeGithubServer(FakeGithub(), error_every=2) as server:
+            client = self._client(server)
+            users = [client.get_user(f"user{index}").name for index in range(3)]
+        self.assertEqual(users, ["User 0", "User 1", "User 2"])
+        self.assertEqual(server.calls["injected_error"], 2)
+        self.assertEqual(metrics.counters["api.retries.server"], 2)
+        self.assertEqual(client.retry_policy.server, 2)
+
+    def test_retries_are_reported_without_metrics(self):
+        metrics.enable(False)
+        with FakeGithubServer(FakeGithub(), error_every=2, reset_every=3) as server:
+            client = self._client(server)
+            for index in range(3):
+                client.get_user(f"user{index}")
+        with patch("builtins.print") as print_mock:
+            print_retries(client.retry_policy, client.hedger)
+        print_mock.assert_called_once_with(
+            f"{client.retry_policy.network + client.retry_policy.server} requests were "
+            f"retried after {client.retry_policy.network} errors of the network, "
+            f"{client.retry_policy.server} server errors, 0 the rate limit"
+        )
+        self.assertGreater(client.retry_policy.server, 0)
+        self.assertEqual(metrics.counters["api.retries.server"], 0)
+
+    def test_connection_resets_are_retried(self):
+        with FakeGithubServer(FakeGithub(), reset_every=2) as server:
+            client = self._client(server)
+            users = [client.get_user(f"user{index}").name for index in range(3)]
+        self.assertEqual(users, ["User 0", "User 1", "User 2"])
+        self.assertEqual(metrics.counters["api.retries.network"], 2)
+
+    def test_timeouts_are_retried(self):
+        with FakeGithubServer(FakeGithub(), slow_every=2, slow_latency=0.5) as server:
+            client = self._client(server, timeout=0.1)
+            self.assertEqual(client.get_user("user0").name, "User 0")
+            self.assertEqual(client.get_user("user1").name, "User 1")
+        self.assertEqual(metrics.counters["api.retries.network"], 1)
+
+    def test_retries_give_up(self):
+        with FakeGithubServer(FakeGithub(), error_every=1) as server:
+            client = self._client(server, retries=2)
+            with self.assertRaises(GithubException) as error:
+                client.get_user("user0")
+        self.assertEqual(error.exception.status, 502)
+        self.assertEqual(server.calls["user"], 3)
+
+    def test_network_errors_fail_the_service_with_its_exception(self):
+        with FakeGithubServer(FakeGithub(), reset_every=1) as server:
+            client = self._client(server, retries=1)
+            with self.assertRaises(exceptions.ContributorServiceException) as error:
+                UserService(client, "user0").request()
+        self.assertEqual(error.exception.status_code, "")
+        self.assertEqual(server.calls["user"], 2)
+
+    def test_slow_requests_are_hedged(self):
+        with FakeGithubServer(
+            FakeGithub(users=30), slow_every=25, slow_latency=2
+        ) as server:
+            client = self._client(server, hedge_percentile=0.9)
+            client.hedger.ratio = 1
+            start = time.perf_counter()
+            users = [client.get_user(f"user{index}").name for index in range(30)]
+            seconds = time.perf_counter() - start
+        self.assertEqual(users, [f"User {index}" for index in range(30)])
+        # The slow request is answered by its hedge.
+        self.assertLess(seconds, 2)
+        # A fast request that is slow on a loaded host may be hedged too.
+        hedges, won = client.hedger.hedges, client.hedger.won
+        self.assertGreaterEqual(hedges, 1)
+        self.assertGreaterEqual(won, 1)
+        self.assertEqual(metrics.counters["api.hedges"], hedges)
+        # The hedges that lost may not have reached the server yet.
+        self.assertGreaterEqual(server.calls["user"], 30 + won)
+        self.assertLessEqual(server.calls["user"], 30 + hedges)
@@ -1,12 +1,20 @@
 from unittest import TestCase
 from unittest.mock import patch
 
-from report.services import OrganizationService, ContributorService, LanguageService
+from report.client import GithubClient
+from report.services import (
+    ContributorService,
+    GraphQLGithubService,
+    LanguageService,
+    OrganizationService,
+    UserResolver,
+)
 from report import exceptions
 
 from github import GithubException
 
 from .objects import Github, Organization, Repository
+from .server import FakeGithub, FakeGithubServer
 
 
 class TestOrganizationService(TestCase):
@@ -123,3 +131,92 @@ class TestLanguageService(TestCase):
             LanguageService(self.github_object, repo).request()
             self.assertEqual(error.exception.message, "Not Found")
             self.assertEqual(error.exception.status_code, 404)
+
+
+class TestGraphQLGithubService(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=5, contributors=2)).start()
+        self.github_object = GithubClient("AUTH_KEY", base_url=self.server.url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_iter_repositories_pages_with_cursors(self):
+        service = GraphQLGithubService(self.github_object, first=2)
+        pages = list(service.iter_repositories("fake-org"))
+        self.assertEqual(self.server.calls["graphql"], 3)
+        self.assertEqual([len(repos) for repos in pages], [2, 2, 1])
+        repo = pages[0][0]
+        self.assertEqual(service.get_languages(repo), ["Python", "JavaScript"])
+        self.assertEqual(
+            service.get_languages(repo, sizes=True),
+            {"Python": 1000, "JavaScript": 2000},
+        )
+        self.assertEqual(
+            service.get_contributors(repo)[0],
+            {
+                "id": 1000,
+                "login": "user0",
+                "name": "User 0",
+                "email": "user0@example.com",
+                "contributions": 1,
+            },
+        )
+
+    def test_iter_repositories_pages_the_history_with_cursors(self):
+        service = GraphQLGithubService(self.github_object, history=1)
+        repos = [
+            repo for page in service.iter_repositories("fake-org") for repo in page
+        ]
+        # One query for the repositories and one for the second commit of every one.
+        self.assertEqual(self.server.calls["graphql"], 6)
+        self.assertEqual(
+            [len(service.get_contributors(repo)) for repo in repos], [2] * 5
+        )
+
+    def test_get_contributor_stats_is_not_available(self):
+        service = GraphQLGithubService(self.github_object)
+        repo = next(service.iter_repositories("fake-org"))[0]
+        with self.assertRaises(exceptions.ContributorServiceException) as error:
+            service.get_contributor_stats(repo)
+        self.assertIn("REST API", error.exception.message)
+
+    def test_iter_repositories_with_unknown_organization(self):
+        with self.assertRaises(exceptions.OrganizationServiceException) as error:
+            next(GraphQLGithubService(self.github_object).iter_repositories("unknown"))
+        self.assertIn("unknown", error.exception.message)
+
+
+class TestUserResolver(TestCase):
+    def setUp(self):
+        self.server = FakeGithubServer(FakeGithub(repos=3, contributors=2)).start()
+        self.github_object = GithubClient(
+            "AUTH_KEY", base_url=self.server.url, conditional=False
+        )
+
+    def tearDown(self):
+        self.server.stop()
+
+    @patch("report.services.UserResolver.set_many_into_cache")
+    @patch("report.services.UserResolver.get_many_from_cache")
+    def test_resolve_fetches_missing_users_once(self, many_from_cache, set_cache):
+        many_from_cache.return_value = [
+            {"id": "1000", "login": "user0", "name": "Cached", "email": ""},
+            {},
+        ]
+        resolver = UserResolver(self.github_object, concurrency=2)
+        users = resolver.resolve(
+            [
+                {"id": 1000, "login": "user0"},
+                {"id": 1001, "login": "user1"},
+                {"id": 1001, "login": "user1"},
+            ]
+        )
+        self.assertEqual(many_from_cache.call_count, 1)
+        self.assertEqual(many_from_cache.call_args[0][0], ["user-1000", "user-1001"])
+        self.assertEqual(users[1000]["id"], 1000)
+        self.assertEqual(users[1000]["name"], "Cached")
+        self.assertEqual(users[1001]["name"], "User 1")
+        self.assertEqual(resolver.calls, {1001: 1})
+        self.assertEqual(self.server.calls["user"], 1)
+        self.assertEqual(set_cache.call_count, 1)
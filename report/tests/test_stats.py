@@ -0,0 +1,74 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from report.stats import ContributionStats, import_numpy
+
+RESULTS = [
+    {
+        "repo": "first",
+        "users": [
+            {"id": 1, "login": "one", "contributions": 30},
+            {"id": 2, "login": "two", "contributions": 10},
+        ],
+        "languages": ["Python", "Go"],
+        "language_bytes": [3000, 1000],
+        "lines": [[1, 300, 30], [2, 100, 10]],
+    },
+    {
+        "repo": "second",
+        "users": [{"id": 2, "login": "two", "contributions": 25}],
+        "languages": ["Go"],
+        "language_bytes": [1000],
+        "lines": None,
+    },
+    {
+        "repo": "empty",
+        "users": [{"id": 3, "login": "three", "contributions": 0}],
+        "languages": [],
+        "language_bytes": [],
+    },
+]
+
+
+class TestContributionStats(TestCase):
+    def _stats(self):
+        # The repositories are only added once.
+        return ContributionStats().extend(RESULTS + RESULTS[:1])
+
+    def _assert_stats(self, stats):
+        results = stats.to_dict()
+        self.assertEqual(list(results), [2, 1, 3])
+        self.assertEqual(
+            {
+                key: value
+                for key, value in results[2].items()
+                if key not in ("user", "languages")
+            },
+            {
+                "rank": 1,
+                "commits": 35,
+                "additions": 100,
+                "deletions": 10,
+                "repositories": 2,
+            },
+        )
+        # A quarter of the bytes of the first repository and all of the second one.
+        [(first, first_share), (second, second_share)] = results[2]["languages"]
+        self.assertEqual((first, second), ("Go", "Python"))
+        self.assertAlmostEqual(first_share, 1250 / 2000)
+        self.assertAlmostEqual(second_share, 750 / 2000)
+        self.assertEqual(
+            [language for language, _ in results[1]["languages"]], ["Python", "Go"]
+        )
+        self.assertAlmostEqual(results[1]["languages"][0][1], 0.75)
+        self.assertEqual(results[3]["languages"], [])
+        self.assertEqual(list(stats.to_dict(top=1, key="additions")), [1])
+
+    def test_aggregation_without_numpy(self):
+        with patch("report.stats.import_numpy", return_value=None):
+            self._assert_stats(self._stats())
+
+    def test_aggregation_with_numpy(self):
+        if import_numpy() is None:
+            self.skipTest("numpy is not installed")
+        self._assert_stats(self._stats())
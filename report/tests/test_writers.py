@@ -0,0 +1,103 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from report.writers import CSVWriter, NDJSONWriter, ParquetWriter, zstandard
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+COLUMNS = [("Login", str), ("Repositories", list)]
+ROWS = [["user0", ["repo-0", "repo-1"]], ["user1", []]]
+
+
+class TestWriters(TestCase):
+    def setUp(self):
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        self.path = os.path.join(report_dir.name, "report")
+
+    def _write(self, writer_class, compression=None):
+        with writer_class(self.path, COLUMNS, compression=compression) as writer:
+            for row in ROWS:
+                writer.write(row)
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.path)), [os.path.basename(writer.path)]
+        )
+        return writer.path
+
+    def test_csv_joins_the_lists(self):
+        path = self._write(CSVWriter)
+        self.assertTrue(path.endswith("report.csv"))
+        with open(path) as report_file:
+            rows = list(csv.reader(report_file))
+        self.assertEqual(
+            rows,
+            [["Login", "Repositories"], ["user0", "repo-0, repo-1"], ["user1", ""]],
+        )
+
+    def test_gzip_csv(self):
+        path = self._write(CSVWriter, "gzip")
+        self.assertTrue(path.endswith("report.csv.gz"))
+        with gzip.open(path, "rt") as report_file:
+            self.assertEqual(len(list(csv.reader(report_file))), 3)
+
+    @skipUnless(zstandard, "zstandard is not installed")
+    def test_zstd_csv(self):
+        path = self._write(CSVWriter, "zstd")
+        with zstandard.open(path, "rt") as report_file:
+            self.assertEqual(len(list(csv.reader(report_file))), 3)
+
+    def test_ndjson_keeps_the_lists(self):
+        path = self._write(NDJSONWriter)
+        with open(path) as report_file:
+            rows = [json.loads(line) for line in report_file]
+        self.assertEqual(
+            rows,
+            [
+                {"Login": "user0", "Repositories": ["repo-0", "repo-1"]},
+                {"Login": "user1", "Repositories": []},
+            ],
+        )
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_keeps_the_lists(self):
+        path = self._write(ParquetWriter, "zstd")
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(
+            table.column("Repositories").to_pylist(), [["repo-0", "repo-1"], []]
+        )
+
+    def test_a_failed_write_leaves_no_file(self):
+        with open(f"{self.path}.csv", "w") as report_file:
+            report_file.write("previous report")
+        with self.assertRaises(ValueError):
+            with CSVWriter(self.path, COLUMNS) as writer:
+                writer.write(ROWS[0])
+                raise ValueError
+        # The previous file is kept and the temporary file is removed.
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["report.csv"])
+        with open(f"{self.path}.csv") as report_file:
+            self.assertEqual(report_file.read(), "previous report")
+
+    def test_a_failed_close_leaves_no_file(self):
+        with self.assertRaises(OSError):
+            with CSVWriter(self.path, COLUMNS) as writer:
+                writer.write(ROWS[0])
+                # The rows are flushed when the file is closed, like on a full disk.
+                patcher = patch.object(writer, "_close", side_effect=OSError)
+                patcher.start()
+                self.addCleanup(writer._file.close)
+        patcher.stop()
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            CSVWriter(self.path, COLUMNS, compression="bz2")
@@ -0,0 +1,202 @@
+import csv
+import gzip
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The suffix of the file of every compression.
+COMPRESSIONS = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+# Number of rows of every row group of Parquet.
+PARQUET_BATCH_SIZE = 10000
+
+
+def import_pyarrow():
+    # Imported on the first Parquet report, it's slow to import and optional.
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is required to write Parquet files")
+    return pyarrow
+
+
+class BaseWriter:
+    """Write the rows of a report into a file atomically, the rows are written into a
+    temporary file in the same directory which replaces the file only when all the rows
+    were written, so a failed run never leaves a truncated report.
+
+    Args:
+        - path(str): The path of the file, without the extension of the format.
+        - columns(list): Tuples of the name and the type of every column, `str`, `int`,
+            `float` or `list`.
+        - compression(str): `gzip`, `zstd` or None.
+    """
+
+    extension = ""
+
+    def __init__(
+        self, path: str, columns: list, compression: str = None, *args, **kwargs
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.path = f"{path}{self.get_extension(compression)}"
+        self.columns = columns
+        self.compression = compression
+        self._temp_path = None
+
+    @classmethod
+    def get_extension(cls, compression: str = None) -> str:
+        return cls.extension + COMPRESSIONS[compression]
+
+    def _open_text(self, path: str):
+        if self.compression == "gzip":
+            return gzip.open(path, mode="wt", newline="")
+        if self.compression == "zstd":
+            if zstandard is None:
+                raise ImportError("zstandard is required to write zstd files")
+            return zstandard.open(path, mode="wt", newline="")
+        return open(path, mode="w", newline="")
+
+    def _open(self, path: str) -> None:
+        raise NotImplementedError
+
+    def write(self, row: list) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self):
+        # In the same directory, so it's renamed on the same filesystem.
+        directory, basename = os.path.split(self.path)
+        self._temp_path = os.path.join(directory, f".{basename}.{os.getpid()}.tmp")
+        try:
+            self._open(self._temp_path)
+        except BaseException:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            raise
+        return self
+
+    def __exit__(self, exc_type, *args):
+        try:
+            self._close()
+        except BaseException:
+            # The file may be truncated, like the last rows not flushed.
+            exc_type = exc_type or Exception
+            raise
+        finally:
+            if exc_type is None:
+                os.replace(self._temp_path, self.path)
+            elif os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+
+class CSVWriter(BaseWriter):
+    """Write the rows into a CSV file, the values of the list columns are joined by commas."""
+
+    extension = ".csv"
+
+    def _open(self, path: str) -> None:
+        self._file = self._open_text(path)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in self.columns])
+
+    def write(self, row: list) -> None:
+        self._writer.writerow(
+            [
+                ", ".join(value) if kind is list else value
+                for (_, kind), value in zip(self.columns, row)
+            ]
+        )
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class NDJSONWriter(BaseWriter):
+    """Write every row as a JSON object into a line, the list columns stay lists."""
+
+    extension = ".ndjson"
+
+    def _open(self, path: str) -> None:
+        self._file = self._open_text(path)
+
+    def write(self, row: list) -> None:
+        self._file.write(
+            json.dumps({name: value for (name, _), value in zip(self.columns, row)})
+            + "\n"
+        )
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter(BaseWriter):
+    """Write the rows into a Parquet file in row groups, the list columns are lists of
+    strings. The compression is the codec of the columns instead of the whole file.
+    """
+
+    extension = ".parquet"
+
+    def __init__(
+        self, path: str, columns: list, compression: str = None, *args, **kwargs
+    ):
+        pyarrow = import_pyarrow()
+        super().__init__(path, columns, None, *args, **kwargs)
+        self.codec = compression or "snappy"
+        types = {
+            str: pyarrow.string(),
+            int: pyarrow.int64(),
+            float: pyarrow.float64(),
+            list: pyarrow.list_(pyarrow.string()),
+        }
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+
+    def _open(self, path: str) -> None:
+        pyarrow = import_pyarrow()
+        self._writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, compression=self.codec
+        )
+        self._rows = []
+
+    def _flush(self) -> None:
+        if self._rows:
+            pyarrow = import_pyarrow()
+            columns = list(zip(*self._rows))
+            self._writer.write_table(
+                pyarrow.Table.from_arrays(
+                    [
+                        pyarrow.array(column, type=field.type)
+                        for column, field in zip(columns, self.schema)
+                    ],
+                    schema=self.schema,
+                )
+            )
+            self._rows = []
+
+    def write(self, row: list) -> None:
+        self._rows.append(row)
+        if len(self._rows) == PARQUET_BATCH_SIZE:
+            self._flush()
+
+    def _close(self) -> None:
+        try:
+            self._flush()
+        finally:
+            self._writer.close()
+
+
+WRITERS = {
+    "csv": CSVWriter,
+    "ndjson": NDJSONWriter,
+    "parquet": ParquetWriter,
+}